@@ -1,13 +1,16 @@
 import pandas as pd
 import os
+import sys
 import glob
-from PyPDF2 import PdfReader
 import logging
 from tqdm import tqdm  # For progress bar
 #C:\Users\ridah\Desktop\from desktop to new pc\sENIOR rESEARCH pROJECT\pdf Extraction\pdf_extraction\reports_2019
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from crashml import read_form_fields
+
 def process_pdf(file_path):
     """
     Processes a local PDF file and extracts form field data.
@@ -22,17 +25,11 @@ def process_pdf(file_path):
         # Get filename to use as identifier in the output
         filename = os.path.basename(file_path)
         
-        # Process the PDF
-        reader = PdfReader(file_path)
-        
-        # Check if the PDF has form fields
-        if not reader.get_fields():
+        # Extract form field data
+        filtered_text_data = read_form_fields(file_path)
+        if not filtered_text_data:
             logging.warning(f"No form fields found in {filename}")
             return None
-            
-        # Extract form field data
-        filtered_text_data = {k: v["/V"] for k, v in reader.get_fields().items()
-                             if isinstance(v, dict) and "/V" in v.keys()}
         
         # Add filename as a column so we know which file each row came from
         filtered_text_data['source_filename'] = filename
@@ -1,12 +1,14 @@
-from io import BytesIO
-from pypdf import PdfReader
 import pandas as pd
 import os
+import sys
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from crashml import read_form_fields
+
 def process_local_pdf(file_path):
     """
     Processes a local PDF file, extracts form field data, and returns a DataFrame.
@@ -18,15 +20,10 @@ def process_local_pdf(file_path):
         A pandas DataFrame containing the extracted data or None if failed
     """
     try:
-        reader = PdfReader(file_path)
-        
         # Extract form fields
         try:
-            fields = reader.get_fields()
-            if fields:
-                filtered_text_data = {k: v["/V"] for k, v in fields.items() 
-                                    if isinstance(v, dict) and "/V" in v.keys()}
-                
+            filtered_text_data = read_form_fields(file_path)
+            if filtered_text_data:
                 # Add filename as a column to help track the source
                 result_df = pd.DataFrame([filtered_text_data])
                 result_df['source_file'] = os.path.basename(file_path)
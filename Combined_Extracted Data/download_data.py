@@ -1,71 +1,203 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
 import os
 import re
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
 import logging
 from tqdm import tqdm
 import time
+import argparse
+import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def download_file(url, destination_folder, filename=None):
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+MANIFEST_FILENAME = "download_manifest.json"
+
+def create_session(pool_size):
     """
-    Download a file from a URL to a specified folder
+    Create a requests Session with a connection pool sized for the worker count
     
     Args:
-        url: URL of the file to download
-        destination_folder: Folder to save the file to
-        filename: Optional custom filename
+        pool_size: Number of connections to keep alive per host
         
     Returns:
-        Path to the downloaded file or None if download failed
+        Configured requests.Session
     """
-    try:
-        # Create destination folder if it doesn't exist
-        os.makedirs(destination_folder, exist_ok=True)
+    retry = Retry(total=3, backoff_factor=1.5, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=frozenset(['GET', 'HEAD']))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+class HostRateLimiter:
+    """Thread-safe limiter that spaces out request starts to each host"""
+    
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = {}
+    
+    def wait(self, url):
+        if not self.interval:
+            return
         
-        # Get filename from URL if not provided
-        if filename is None:
-            filename = url.split('/')[-1]
+        host = urlparse(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
         
-        file_path = os.path.join(destination_folder, filename)
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+class DownloadManifest:
+    """
+    JSON manifest of downloaded reports (ETag, Content-Length and sha256 per file)
+    
+    Keys are file paths relative to the base directory, so the manifest stays valid
+    if the whole reports tree is moved.
+    """
+    
+    def __init__(self, base_dir):
+        self.base_dir = base_dir
+        self.path = os.path.join(base_dir, MANIFEST_FILENAME)
+        self.lock = threading.Lock()
+        self.entries = {}
         
-        # Check if file already exists
-        if os.path.exists(file_path):
-            logging.info(f"File already exists: {file_path}")
-            return file_path
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Could not read manifest {self.path}, starting fresh: {e}")
+    
+    def key(self, file_path):
+        return os.path.relpath(file_path, self.base_dir).replace(os.sep, '/')
+    
+    def get(self, file_path):
+        with self.lock:
+            return self.entries.get(self.key(file_path))
+    
+    def update(self, file_path, entry):
+        with self.lock:
+            self.entries[self.key(file_path)] = entry
+    
+    def save(self):
+        with self.lock:
+            os.makedirs(self.base_dir, exist_ok=True)
+            tmp_path = self.path + '.part'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+def sha256_of_file(file_path, chunk_size=1024 * 1024):
+    """Compute the sha256 hex digest of a file on disk"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def is_intact(file_path, entry):
+    """Check a file on disk against its manifest entry (size first, then sha256)"""
+    if not entry or not os.path.exists(file_path):
+        return False
+    if os.path.getsize(file_path) != entry.get('size', entry.get('content_length')):
+        return False
+    return sha256_of_file(file_path) == entry.get('sha256')
+
+def sync_file(session, url, file_path, manifest, rate_limiter):
+    """
+    Download a file only if it is new or has changed since the last sync
+    
+    The body is streamed into a temporary ``.part`` file and renamed into place
+    once complete, so an interrupted download never looks like a finished report.
+    
+    Args:
+        session: Pooled requests.Session
+        url: URL of the file to download
+        file_path: Destination path
+        manifest: DownloadManifest recording ETag, Content-Length and sha256
+        rate_limiter: HostRateLimiter shared by all workers
         
-        # Download the file
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, stream=True, timeout=60, headers=headers)
-        response.raise_for_status()
+    Returns:
+        'downloaded', 'unchanged' or 'failed'
+    """
+    entry = manifest.get(file_path)
+    intact = is_intact(file_path, entry)
+    
+    # Content-Length is only comparable to the body when the body is not re-encoded on the way
+    headers = {'Accept-Encoding': 'identity'}
+    if intact and entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    
+    tmp_path = file_path + '.part'
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        rate_limiter.wait(url)
         
-        # Get total file size for progress bar
-        total_size = int(response.headers.get('content-length', 0))
+        with session.get(url, stream=True, timeout=60, headers=headers) as response:
+            if response.status_code == 304:
+                return 'unchanged'
+            response.raise_for_status()
+            
+            etag = response.headers.get('ETag')
+            content_length = response.headers.get('Content-Length')
+            content_length = int(content_length) if content_length and content_length.isdigit() else None
+            
+            # Servers without conditional GET support: compare the headers we have
+            if intact and (etag or content_length is not None):
+                same_etag = etag is None or etag == entry.get('etag')
+                same_length = content_length is None or content_length == entry.get('content_length')
+                if same_etag and same_length:
+                    return 'unchanged'
+            
+            digest = hashlib.sha256()
+            size = 0
+            with open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+            
+            # Bytes received as sent, before any Content-Encoding the server applied anyway is undone
+            received = response.raw.tell()
         
-        # Download with progress
-        with open(file_path, 'wb') as f, tqdm(
-                desc=filename,
-                total=total_size,
-                unit='B',
-                unit_scale=True,
-                unit_divisor=1024,
-        ) as bar:
-            for chunk in response.iter_content(chunk_size=8192):
-                size = f.write(chunk)
-                bar.update(size)
+        if content_length is not None and received != content_length:
+            raise IOError(f"Truncated download: got {received} of {content_length} bytes")
         
-        return file_path
+        os.replace(tmp_path, file_path)
+        manifest.update(file_path, {
+            'url': url,
+            'etag': etag,
+            'content_length': received,
+            'size': size,
+            'sha256': digest.hexdigest(),
+            'downloaded_at': datetime.now().isoformat(timespec='seconds')
+        })
+        return 'downloaded'
     
     except Exception as e:
         logging.error(f"Failed to download {url}: {e}")
-        # Sleep for a moment before returning to avoid hammering the server if there's an issue
-        time.sleep(2)
-        return None
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return 'failed'
 
 def extract_year_from_url_or_text(url, text):
     """Extract year from URL or text content"""
@@ -213,12 +345,87 @@ def get_report_links(url):
         logging.error(f"Failed to get report links: {e}")
         return {year: [] for year in range(2019, 2025)}
 
+def report_filename(link_text, year, index):
+    """Build a descriptive filename for a report from its link text"""
+    # Remove special characters and replace spaces with underscores
+    clean_text = re.sub(r'[^\w\s-]', '', link_text).strip().lower()
+    clean_text = re.sub(r'[\s]+', '_', clean_text)
+    
+    # If the clean text is empty or too short, use a default name
+    if len(clean_text) < 5:
+        return f"report_{year}_{index + 1}.pdf"
+    
+    return f"{clean_text}.pdf"
+
+def sync_reports(reports_by_year, base_dir, workers=8, requests_per_second=4.0):
+    """
+    Concurrently download new or changed reports into base_dir/reports_YYYY
+    
+    Args:
+        reports_by_year: Output of get_report_links
+        base_dir: Base directory for saving reports
+        workers: Number of concurrent download threads
+        requests_per_second: Polite request rate per host
+        
+    Returns:
+        Dictionary with counts of downloaded, unchanged and failed reports, and
+        of duplicate links that were skipped
+    """
+    manifest = DownloadManifest(base_dir)
+    rate_limiter = HostRateLimiter(requests_per_second)
+    counts = {'downloaded': 0, 'unchanged': 0, 'failed': 0, 'duplicate': 0}
+    
+    # One job per file: two threads writing the same .part file would corrupt it
+    jobs = {}
+    seen_urls = set()
+    for year, links in reports_by_year.items():
+        year_dir = os.path.join(base_dir, f"reports_{year}")
+        for i, link_data in enumerate(links):
+            # The fallback scrapes can list the same link more than once
+            if link_data['url'] in seen_urls:
+                counts['duplicate'] += 1
+                continue
+            seen_urls.add(link_data['url'])
+            
+            # Different reports with the same link text get numbered file names
+            file_path = os.path.join(year_dir, report_filename(link_data['text'], year, i))
+            base, extension = os.path.splitext(file_path)
+            copy = 2
+            while file_path in jobs:
+                file_path = f"{base}_{copy}{extension}"
+                copy += 1
+            jobs[file_path] = link_data['url']
+    
+    session = create_session(workers)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(sync_file, session, url, file_path, manifest, rate_limiter)
+                       for file_path, url in jobs.items()]
+            
+            for n, future in enumerate(tqdm(as_completed(futures), total=len(futures), desc="Syncing reports"), 1):
+                counts[future.result()] += 1
+                
+                # Checkpoint the manifest so an interrupted sync can resume
+                if n % 50 == 0:
+                    manifest.save()
+    finally:
+        session.close()
+        manifest.save()
+    
+    return counts
+
 def main():
+    parser = argparse.ArgumentParser(description="Download California DMV autonomous vehicle collision reports")
+    parser.add_argument('base_dir', nargs='?', help="Directory where the reports_YYYY folders are saved")
+    parser.add_argument('--workers', type=int, default=8, help="Number of concurrent downloads (default: 8)")
+    parser.add_argument('--rate', type=float, default=4.0, help="Maximum requests per second per host (default: 4)")
+    args = parser.parse_args()
+    
     # URL of the DMV autonomous vehicle collision reports page
     url = "https://www.dmv.ca.gov/portal/vehicle-industry-services/autonomous-vehicles/autonomous-vehicle-collision-reports/"
     
     # Base directory for saving reports
-    base_dir = input("Enter the directory where you want to save the reports: ").strip()
+    base_dir = args.base_dir or input("Enter the directory where you want to save the reports: ").strip()
     
     # Get all report links
     logging.info("Fetching report links from the DMV website...")
@@ -232,46 +439,14 @@ def main():
         logging.error("No reports found. Please check the website structure or try again later.")
         return
     
-    # Download all reports
-    downloaded_count = 0
-    
-    for year, links in reports_by_year.items():
-        if not links:
-            continue
-            
-        # Create year directory
-        year_dir = os.path.join(base_dir, f"reports_{year}")
-        
-        logging.info(f"Downloading {len(links)} reports for year {year}...")
-        for i, link_data in enumerate(links):
-            link_url = link_data['url']
-            link_text = link_data['text']
-            
-            # Try to create a descriptive filename from the link text
-            # Remove special characters and replace spaces with underscores
-            clean_text = re.sub(r'[^\w\s-]', '', link_text).strip().lower()
-            clean_text = re.sub(r'[\s]+', '_', clean_text)
-            
-            # If the clean text is empty or too short, use a default name
-            if len(clean_text) < 5:
-                filename = f"report_{year}_{i+1}.pdf"
-            else:
-                filename = f"{clean_text}.pdf"
-                
-                # Make sure filename ends with .pdf
-                if not filename.lower().endswith('.pdf'):
-                    filename += '.pdf'
-            
-            # Download the file
-            result = download_file(link_url, year_dir, filename)
-            
-            if result:
-                downloaded_count += 1
-            
-            # Add a small delay to avoid overwhelming the server
-            time.sleep(1)
+    # Download new or changed reports
+    start = time.perf_counter()
+    counts = sync_reports(reports_by_year, base_dir, workers=args.workers, requests_per_second=args.rate)
+    elapsed = time.perf_counter() - start
     
-    logging.info(f"Download complete. Successfully downloaded {downloaded_count} out of {total_reports} reports.")
+    logging.info(f"Sync complete in {elapsed:.1f}s: {counts['downloaded']} downloaded, "
+                 f"{counts['unchanged']} unchanged, {counts['failed']} failed out of {total_reports} reports "
+                 f"({counts['duplicate']} duplicate links skipped).")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
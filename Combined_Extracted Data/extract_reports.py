@@ -0,0 +1,130 @@
+import pandas as pd
+import os
+import re
+import sys
+import time
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from tqdm import tqdm
+
+# Share the form field extraction and its cache with the CrashML UIs
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from crashml import ExtractionCache, load_form_fields
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+REPORT_DIR_PATTERN = re.compile(r'^reports_(\d{4})$')
+
+extraction_cache = ExtractionCache()
+
+def extract_form_fields(file_path):
+    """
+    Extracts form field data from one PDF. Runs inside a worker process.
+
+    Args:
+        file_path: Path to the local PDF file
+
+    Returns:
+        Tuple of (file_path, dict of field values or None, error message or None)
+    """
+    try:
+        values = load_form_fields(file_path, cache=extraction_cache)
+        if not values:
+            return file_path, None, "No form fields found"
+
+        # Plain strings keep the result cheap to send back to the parent process
+        record = {k: str(v) for k, v in values.items()}
+        record['source_file'] = os.path.basename(file_path)
+        return file_path, record, None
+
+    except Exception as e:
+        return file_path, None, str(e)
+
+def find_report_files(base_dir):
+    """
+    Finds every PDF under the reports_YYYY directories of base_dir
+
+    Returns:
+        Dictionary with year as key and sorted list of PDF paths as value
+    """
+    reports_by_year = {}
+
+    for entry in sorted(os.listdir(base_dir)):
+        match = REPORT_DIR_PATTERN.match(entry)
+        year_dir = os.path.join(base_dir, entry)
+        if not match or not os.path.isdir(year_dir):
+            continue
+
+        pdf_files = sorted(os.path.join(year_dir, f) for f in os.listdir(year_dir) if f.lower().endswith('.pdf'))
+        if pdf_files:
+            reports_by_year[int(match.group(1))] = pdf_files
+
+    return reports_by_year
+
+def extract_report_tree(base_dir, workers=None, chunksize=8):
+    """
+    Extracts form fields from every report in base_dir using a process pool
+
+    Args:
+        base_dir: Directory containing the reports_YYYY folders
+        workers: Number of worker processes (defaults to the CPU count)
+        chunksize: Number of PDFs handed to a worker per task
+
+    Returns:
+        Tuple of (dictionary of year -> DataFrame, list of (file_path, error) failures)
+    """
+    reports_by_year = find_report_files(base_dir)
+    all_files = [(year, path) for year, paths in reports_by_year.items() for path in paths]
+
+    records_by_year = {year: [] for year in reports_by_year}
+    failures = []
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(extract_form_fields, [path for _, path in all_files], chunksize=chunksize)
+
+        for (year, _), (file_path, record, error) in tqdm(zip(all_files, results), total=len(all_files), desc="Extracting PDFs"):
+            if record is None:
+                failures.append((file_path, error))
+            else:
+                records_by_year[year].append(record)
+    elapsed = time.perf_counter() - start
+
+    rate = len(all_files) / elapsed if elapsed > 0 else 0.0
+    logging.info(f"Processed {len(all_files)} PDFs in {elapsed:.1f}s ({rate:.1f} files/s), {len(failures)} failures")
+
+    # Build each year's DataFrame once from plain records
+    frames = {year: pd.DataFrame(records) for year, records in records_by_year.items() if records}
+    return frames, failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract form fields from every reports_YYYY directory in parallel")
+    parser.add_argument('base_dir', help="Directory containing the reports_YYYY folders")
+    parser.add_argument('--output-dir', help="Where to write extracted_pdf_data_YYYY.csv (default: base_dir)")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes (default: CPU count)")
+    parser.add_argument('--chunksize', type=int, default=8, help="PDFs per task submitted to a worker (default: 8)")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.base_dir):
+        logging.error(f"Directory not found: {args.base_dir}")
+        return
+
+    frames, failures = extract_report_tree(args.base_dir, workers=args.workers, chunksize=args.chunksize)
+
+    if not frames:
+        logging.error("No data was successfully extracted from any of the PDFs")
+
+    output_dir = args.output_dir or args.base_dir
+    os.makedirs(output_dir, exist_ok=True)
+    for year, df in frames.items():
+        csv_filename = os.path.join(output_dir, f"extracted_pdf_data_{year}.csv")
+        df.to_csv(csv_filename, index=False)
+        logging.info(f"Saved {len(df)} reports for {year} to {csv_filename}")
+
+    for file_path, error in failures:
+        logging.warning(f"Failed: {file_path}: {error}")
+
+if __name__ == "__main__":
+    main()
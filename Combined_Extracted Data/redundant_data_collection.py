@@ -1,12 +1,15 @@
 import pandas as pd
+import os
+import sys
 from urllib.request import urlopen, Request
-from io import BytesIO
-from PyPDF2 import PdfReader
 import logging
 import time
 import requests
 from requests.exceptions import RequestException
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from crashml import read_form_fields
+
 # Configure logging
 logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -18,10 +21,10 @@ def download_and_process_pdf(url, max_retries=3, backoff_factor=1.5):
             response = requests.get(url, timeout=60)
             response.raise_for_status()
             
-            memoryFile = BytesIO(response.content)
-            reader = PdfReader(memoryFile)
-            filtered_text_data = {k: v["/V"] for k, v in reader.get_fields().items()
-                                if isinstance(v, dict) and "/V" in v.keys()}
+            filtered_text_data = read_form_fields(response.content)
+            if not filtered_text_data:
+                logging.error(f"No form fields found in PDF from {url}")
+                return None
 
             return pd.DataFrame([filtered_text_data])
         except RequestException as e:
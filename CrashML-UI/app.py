@@ -1,320 +1,168 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for
-import pandas as pd
-import numpy as np
-import pickle
-import PyPDF2, pdfplumber
-from PyPDF2 import PdfReader
-from io import BytesIO
-import json
+from flask import Flask, render_template, request, jsonify, url_for, Response
 import os
+import sys
+import threading
 from werkzeug.utils import secure_filename
 import hashlib
-import re
+import zipfile
+import tempfile
+import time
 from datetime import datetime
 
+# The crashml package lives at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from crashml import ExtractionCache, PredictionCache, Pipeline, METRICS, summarize_features
+from crashml.model_bundle import load_or_build_bundle
+from crashml.job_queue import JobQueue
+from crashml.metrics import PROMETHEUS_CONTENT_TYPE
+from crashml.search import SearchIndex
+
 app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['MAX_BATCH_CONTENT_LENGTH'] = 512 * 1024 * 1024  # 512MB max batch size
+app.config['UPLOAD_SPOOL_THRESHOLD'] = 4 * 1024 * 1024  # uploads larger than this spill to a temp file
+app.config['FAST_EXTRACTION'] = os.environ.get('CRASHML_FAST_EXTRACTION') == '1'  # skip layout analysis when form fields hold the narrative
+app.config['PREDICTION_CACHE_SIZE'] = int(os.environ.get('CRASHML_PREDICTION_CACHE_SIZE', 4096))  # 0 turns the cache off
+
+# Persistent cache of PDF extraction results, shared with the batch tools
+extraction_cache = ExtractionCache()
 
-# Ensure upload directory exists
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+# Model outputs for feature vectors seen before, emptied whenever the models are (re)loaded
+prediction_cache = PredictionCache(app.config['PREDICTION_CACHE_SIZE']) if app.config['PREDICTION_CACHE_SIZE'] > 0 else None
 
 # Load models globally
+bundle = None
 models = None
-vectorizer = None
 feature_names = None
+pipeline = None
+
+# Models are loaded by __main__, or on the first request under a WSGI server or test client
+models_lock = threading.Lock()
+MODELS_UNAVAILABLE = 'Models are not loaded; check the model files on the server'
+
+# Full-text index of the crash narratives (python -m crashml index), loaded on the first search
+search_index = None
 
 def load_models():
-    global models, vectorizer, feature_names
+    global bundle, models, feature_names, pipeline
     try:
-        models = pickle.load(open('crashml_models.pkl', 'rb'))
-        vectorizer = pickle.load(open('tfidf_vectorizer.pkl', 'rb'))
-        feature_names = pickle.load(open('feature_names.pkl', 'rb'))
+        bundle = load_or_build_bundle()
+        models = bundle.models
+        feature_names = bundle.feature_names
+        if prediction_cache is not None:
+            prediction_cache.clear()
+        pipeline = Pipeline(bundle, cache=extraction_cache, fast=app.config['FAST_EXTRACTION'], prediction_cache=prediction_cache)
         return True
     except FileNotFoundError:
         print("Model files not found")
         return False
+    except ValueError as e:
+        print(f"Model bundle is inconsistent: {e}")
+        return False
 
-def extract_text_from_pdf_bytes(file_bytes):
-    """Enhanced text extraction with better coverage"""
-    try:
-        text = ""
-        
-        # Method 1: Extract all text using pdfplumber
-        with pdfplumber.open(BytesIO(file_bytes)) as pdf:
-            for page_num, page in enumerate(pdf.pages):
-                page_text = page.extract_text()
-                if page_text:
-                    text += f"--- Page {page_num + 1} ---\n{page_text}\n"
-        
-        # Method 2: Try to extract checkbox states
-        try:
-            reader = PdfReader(BytesIO(file_bytes))
-            for page in reader.pages:
-                if '/Annots' in page:
-                    annotations = page['/Annots']
-                    for annotation in annotations:
-                        annot_obj = annotation.get_object()
-                        if '/AS' in annot_obj:
-                            text += f" CHECKBOX_STATE: {annot_obj['/AS']} "
-        except Exception as e:
-            print(f"Could not extract checkbox states: {str(e)}")
-        
-        return text
-        
-    except Exception as e:
-        print(f"Enhanced text extraction failed: {e}")
-        return ""
-
-def extract_form_fields_from_pdf_bytes(file_bytes):
-    """Extract form fields from PDF bytes"""
-    try:
-        reader = PdfReader(BytesIO(file_bytes))
-        fields = reader.get_fields()
-        if not fields:
-            return {}
-        
-        extracted = {k: v["/V"] for k, v in fields.items() if isinstance(v, dict) and "/V" in v}
-        return extracted
-    except Exception as e:
-        print(f"Error extracting form fields: {str(e)}")
-        return {}
+def get_pipeline():
+    """The analysis pipeline, loading the models first if nothing has yet; None when they cannot be loaded"""
+    if pipeline is None:
+        with models_lock:
+            if pipeline is None:
+                load_models()
+    return pipeline
 
-def parse_dmv_report(text, form_fields):
-    """Enhanced DMV report parser to extract key features"""
-    
-    # Initialize data point
-    data_point = {
-        'vehicle_1_moving': 0,
-        'vehicle_2_moving': 0,
-        'autonomous_mode': 0,
-        'impact_front': 0,
-        'impact_rear': 0,
-        'impact_side': 0,
-        'weather_issue': 0,
-        'road_issue': 0,
-        'dark_condition': 0,
-        'description': text
+def analysis_payload(filename, result):
+    """Response fields for one analyzed report"""
+    if 'error' in result:
+        return {'filename': filename, 'error': result['error']}
+    
+    return {
+        'success': True,
+        'filename': filename,
+        'predictions': result['predictions'],
+        'probabilities': result['probabilities'],
+        'feature_summary': summarize_features(result['parsed']),
+        'explanations': result['explanations']
     }
-    
-    # Convert text to lowercase for easier matching
-    text_lower = text.lower()
-    
-    # Debug information
-    debug_info = []
-    debug_info.append(f"Text length: {len(text)} characters")
-    debug_info.append(f"Form fields found: {len(form_fields)}")
-    
-    # 1. AUTONOMOUS MODE DETECTION
-    autonomous_indicators = [
-        'autonomous mode',
-        'autonomous vehicle', 
-        'self-driving',
-        'autopilot',
-        '☑ autonomous mode',
-        'aurora innovation',
-        'waymo llc',
-        'waymo',
-        'cruise',
-        'tesla autopilot',
-        'apple inc'
-    ]
-    
-    if any(indicator in text_lower for indicator in autonomous_indicators):
-        data_point['autonomous_mode'] = 1
-        debug_info.append("✅ Autonomous mode detected")
-    
-    # 2. VEHICLE MOVEMENT DETECTION
-    if '☑ stopped in traffic' in text_lower or 'x stopped in traffic' in text_lower:
-        data_point['vehicle_1_moving'] = 0
-        debug_info.append("✅ Vehicle 1 stopped in traffic (from checkbox)")
-    elif '☑ moving' in text_lower or 'x moving' in text_lower:
-        data_point['vehicle_1_moving'] = 1
-        debug_info.append("✅ Vehicle 1 moving (from checkbox)")
-    elif any(keyword in text_lower for keyword in ['proceeding straight', 'making right turn', 'making left turn', 'changing lanes', 'traveling']):
-        data_point['vehicle_1_moving'] = 1
-        debug_info.append("✅ Vehicle 1 moving (from text description)")
-    elif any(keyword in text_lower for keyword in ['stopped', 'parked', 'stationary']):
-        data_point['vehicle_1_moving'] = 0
-        debug_info.append("✅ Vehicle 1 stationary (from text description)")
-    
-    # 3. DAMAGE/IMPACT DETECTION
-    if '☑ none' in text_lower or 'x none' in text_lower:
-        debug_info.append("✅ No damage reported")
-    elif '☑ minor' in text_lower or 'x minor' in text_lower:
-        debug_info.append("✅ Minor damage reported")
-        # Try to determine impact location from description
-        if any(word in text_lower for word in ['rear', 'back', 'behind']):
-            data_point['impact_rear'] = 1
-        elif any(word in text_lower for word in ['front', 'head-on', 'forward']):
-            data_point['impact_front'] = 1
-        elif any(word in text_lower for word in ['side', 'sideswipe', 'lateral']):
-            data_point['impact_side'] = 1
-        else:
-            # Default to front impact for minor damage
-            data_point['impact_front'] = 1
-    elif '☑ major' in text_lower or 'x major' in text_lower:
-        debug_info.append("✅ Major damage reported")
-        data_point['impact_front'] = 1  # Assume front impact for major damage
-    
-    # 4. COLLISION TYPE DETECTION
-    collision_types = {
-        'rear end': 'impact_rear',
-        'rear-end': 'impact_rear', 
-        'head-on': 'impact_front',
-        'broadside': 'impact_side',
-        'side swipe': 'impact_side',
-        'sideswipe': 'impact_side'
-    }
-    
-    for collision_text, impact_field in collision_types.items():
-        if collision_text in text_lower:
-            data_point[impact_field] = 1
-            debug_info.append(f"✅ {collision_text} collision detected")
-    
-    # 5. WEATHER CONDITIONS
-    weather_conditions = [
-        'raining', 'rain', 'snowing', 'snow', 'fog', 'foggy', 'storm', 'wind'
-    ]
-    
-    for weather in weather_conditions:
-        if weather in text_lower:
-            data_point['weather_issue'] = 1
-            debug_info.append(f"✅ Weather condition detected: {weather}")
-            break
-    
-    # 6. ROAD CONDITIONS
-    road_conditions = [
-        'wet', 'slippery', 'icy', 'snowy', 'construction', 'repair zone', 'obstruction', 'flooded'
-    ]
-    
-    for road in road_conditions:
-        if road in text_lower:
-            data_point['road_issue'] = 1
-            debug_info.append(f"✅ Road condition detected: {road}")
-            break
-    
-    # 7. LIGHTING CONDITIONS
-    lighting_conditions = [
-        'dark', 'night', 'dusk', 'dawn', 'dark – street lights', 'dark – no street lights'
-    ]
-    
-    if any(condition in text_lower for condition in lighting_conditions):
-        if 'daylight' not in text_lower:
-            data_point['dark_condition'] = 1
-            debug_info.append("✅ Dark/poor lighting condition detected")
-    
-    # 8. MANUFACTURER-SPECIFIC LOGIC
-    manufacturers = {
-        'waymo': {'autonomous_mode': 1},
-        'aurora': {'autonomous_mode': 1},
-        'cruise': {'autonomous_mode': 1},
-        'tesla': {'autonomous_mode': 1},
-        'apple': {'autonomous_mode': 1}
-    }
-    
-    for manufacturer, attributes in manufacturers.items():
-        if manufacturer in text_lower:
-            for attr, value in attributes.items():
-                data_point[attr] = value
-            debug_info.append(f"✅ {manufacturer.title()} vehicle detected")
-    
-    # 9. ENHANCED DESCRIPTION ANALYSIS
-    fault_indicators = {
-        'rear ended': {'impact_rear': 1, 'vehicle_1_moving': 0},
-        'struck from behind': {'impact_rear': 1, 'vehicle_1_moving': 0},
-        'hit from behind': {'impact_rear': 1, 'vehicle_1_moving': 0},
-        'ran into': {'impact_front': 1, 'vehicle_1_moving': 1},
-        'collided with': {'vehicle_1_moving': 1},
-        'lane change': {'vehicle_1_moving': 1},
-        'changing lanes': {'vehicle_1_moving': 1},
-        'merging': {'vehicle_1_moving': 1},
-        'turning': {'vehicle_1_moving': 1}
+
+def analyze_pdf(filename, file_bytes, digest=None):
+    """Full analysis of one report PDF (bytes or a seekable file), as returned by /upload and by finished jobs"""
+    active = get_pipeline()
+    if active is None:
+        return {'error': MODELS_UNAVAILABLE}
+    result = active.analyze(file_bytes, digest=digest)
+    
+    if 'error' in result:
+        return {'error': result['error']}
+    
+    text = result['text']
+    return {
+        **analysis_payload(filename, result),
+        'debug_info': result['debug_info'],
+        'text_preview': text[:500] + '...' if len(text) > 500 else text,
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     }
-    
-    for phrase, attributes in fault_indicators.items():
-        if phrase in text_lower:
-            for attr, value in attributes.items():
-                data_point[attr] = value
-            debug_info.append(f"✅ Fault indicator detected: '{phrase}'")
-    
-    # Add debug info to data point
-    data_point['debug_info'] = debug_info
-    
-    return data_point
 
-def predict_fault(data_point):
-    """Make prediction using trained models"""
-    structured_features = [
-        data_point['vehicle_1_moving'],
-        data_point['vehicle_2_moving'],
-        data_point['autonomous_mode'],
-        data_point['impact_front'],
-        data_point['impact_rear'],
-        data_point['impact_side'],
-        data_point['weather_issue'],
-        data_point['road_issue'],
-        data_point['dark_condition']
-    ]
-    
-    text_features = vectorizer.transform([data_point['description']])
-    text_features_array = text_features.toarray()[0]
-    
-    # Pad TF-IDF vector if needed
-    expected_text_features = 216 - len(structured_features)
-    actual_text_features = text_features_array.shape[0]
+def spool_upload(stream, threshold):
+    """
+    Copy an upload stream into a SpooledTemporaryFile, hashing it while copying
 
-    if actual_text_features < expected_text_features:
-        padded_text_features = np.pad(text_features_array, (0, expected_text_features - actual_text_features))
-    elif actual_text_features > expected_text_features:
-        padded_text_features = text_features_array[:expected_text_features]
-    else:
-        padded_text_features = text_features_array
+    The copy stays in memory up to threshold bytes and then spills to an
+    anonymous temp file, so concurrent uploads with the same name never collide.
 
-    all_features = np.concatenate([structured_features, padded_text_features])
-    all_features = all_features.reshape(1, -1)
-    
-    predictions = {}
-    probabilities = {}
-    
-    fault_labels = {0: "Not at Fault", 1: "Partially at Fault", 2: "Fully at Fault"}
-    
-    for model_name, model in models.items():
-        pred = model.predict(all_features)[0]
-        prob = model.predict_proba(all_features)[0]
+    Returns:
+        Tuple of (rewound spooled file, sha256 hex digest)
+    """
+    spooled = tempfile.SpooledTemporaryFile(max_size=threshold)
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(64 * 1024), b''):
+        digest.update(chunk)
+        spooled.write(chunk)
+    spooled.seek(0)
+    return spooled, digest.hexdigest()
+
+def init_job_worker():
+    """Runs in each job worker; forked workers already have the models"""
+    # Start counting from zero; a forked worker inherits the parent's metrics
+    METRICS.drain()
+    get_pipeline()
+
+def analyze_pdf_job(filename, file_bytes):
+    """
+    analyze_pdf inside a job worker, with errors reported in the result like /upload does
+
+    Returns:
+        Tuple of (result, metrics recorded by this job), unpacked by collect_job_result
+    """
+    try:
+        result = analyze_pdf(filename, file_bytes)
+    except Exception as e:
+        METRICS.count('analysis_error')
+        result = {'error': f'Error processing file: {str(e)}'}
+    return result, METRICS.drain()
+
+def collect_job_result(job_output):
+    """Fold a worker's metrics into this process's /metrics and keep the analysis result"""
+    result, worker_metrics = job_output
+    METRICS.merge(worker_metrics)
+    return result
+
+def iter_uploaded_pdfs(uploaded_files):
+    """Yield (filename, pdf_bytes) for every PDF in the upload, expanding zip archives"""
+    for file in uploaded_files:
+        if not file or file.filename == '':
+            continue
         
-        predictions[model_name] = {
-            'prediction': int(pred),
-            'label': fault_labels[pred],
-            'confidence': float(prob[pred])
-        }
-        probabilities[model_name] = prob.tolist()
-    
-    return predictions, probabilities
+        filename = secure_filename(file.filename)
+        if filename.lower().endswith('.pdf'):
+            yield filename, file.read()
+        elif filename.lower().endswith('.zip'):
+            with zipfile.ZipFile(file.stream) as archive:
+                for member in archive.infolist():
+                    if not member.is_dir() and member.filename.lower().endswith('.pdf'):
+                        yield secure_filename(os.path.basename(member.filename)), archive.read(member)
+        else:
+            yield filename, None
 
-def explain_prediction(data_point):
-    """Provide explanation for the prediction"""
-    explanations = []
-    
-    if data_point['vehicle_1_moving'] == 0:
-        explanations.append("✓ Vehicle was stationary (typically not at fault)")
-    
-    if data_point['impact_rear'] == 1:
-        explanations.append("✓ Rear impact detected (typically other vehicle at fault)")
-    
-    if data_point['autonomous_mode'] == 1:
-        explanations.append("⚠ Vehicle was in autonomous mode")
-    
-    if data_point['weather_issue'] == 1:
-        explanations.append("⚠ Adverse weather conditions present")
-    
-    if data_point['road_issue'] == 1:
-        explanations.append("⚠ Adverse road conditions present")
-    
-    if data_point['dark_condition'] == 1:
-        explanations.append("⚠ Dark/poor lighting conditions")
-    
-    return explanations
+# Uploads queued through /jobs are analyzed on a process pool, off the request threads
+job_queue = JobQueue(workers=int(os.environ.get('CRASHML_JOB_WORKERS', 0)) or None, initializer=init_job_worker, on_result=collect_job_result)
 
 @app.route('/')
 def index():
@@ -331,65 +179,135 @@ def upload_file():
     
     if file and file.filename.lower().endswith('.pdf'):
         filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        if get_pipeline() is None:
+            return jsonify({'error': MODELS_UNAVAILABLE}), 503
+        
+        # Keep the upload in memory (unique temp file past the threshold), hashing it on the way
+        upload, digest = spool_upload(file.stream, app.config['UPLOAD_SPOOL_THRESHOLD'])
         
         try:
-            # Read file content
-            with open(filepath, 'rb') as f:
-                file_bytes = f.read()
-            
-            # Extract text and form fields
-            text = extract_text_from_pdf_bytes(file_bytes)
-            form_fields = extract_form_fields_from_pdf_bytes(file_bytes)
-            
-            if not text:
-                return jsonify({'error': 'Could not extract text from PDF'})
-            
-            # Parse and predict
-            parsed_data = parse_dmv_report(text, form_fields)
-            predictions, probabilities = predict_fault(parsed_data)
-            explanations = explain_prediction(parsed_data)
-            
-            # Clean up uploaded file
-            os.remove(filepath)
-            
-            # Prepare extracted features for display
-            feature_summary = {
-                'Vehicle 1 Moving': 'Yes' if parsed_data['vehicle_1_moving'] else 'No',
-                'Vehicle 2 Moving': 'Yes' if parsed_data['vehicle_2_moving'] else 'No',
-                'Autonomous Mode': 'Yes' if parsed_data['autonomous_mode'] else 'No',
-                'Impact Location': 'Front' if parsed_data['impact_front'] else 'Rear' if parsed_data['impact_rear'] else 'Side' if parsed_data['impact_side'] else 'Unknown',
-                'Weather Issues': 'Yes' if parsed_data['weather_issue'] else 'No',
-                'Road Issues': 'Yes' if parsed_data['road_issue'] else 'No',
-                'Dark Conditions': 'Yes' if parsed_data['dark_condition'] else 'No'
-            }
-            
-            return jsonify({
-                'success': True,
-                'filename': filename,
-                'predictions': predictions,
-                'probabilities': probabilities,
-                'feature_summary': feature_summary,
-                'explanations': explanations,
-                'debug_info': parsed_data.get('debug_info', []),
-                'text_preview': text[:500] + '...' if len(text) > 500 else text,
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            })
-            
+            return jsonify(analyze_pdf(filename, upload, digest=digest))
         except Exception as e:
-            # Clean up file if error occurs
-            if os.path.exists(filepath):
-                os.remove(filepath)
+            METRICS.count('analysis_error')
             return jsonify({'error': f'Error processing file: {str(e)}'})
+        finally:
+            upload.close()
     
     return jsonify({'error': 'Invalid file type. Please upload a PDF file.'})
 
+@app.route('/search')
+def search():
+    """Crash narratives ranked for ?q=words "and phrases", optionally filtered by year, make and autonomous_mode"""
+    global search_index
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'No query given (use ?q=...)'}), 400
+    
+    if search_index is None:
+        search_index = SearchIndex()
+    else:
+        search_index.refresh()  # picks up index updates made since it was loaded
+    if not len(search_index):
+        return jsonify({'error': 'Search index is empty; build it with python -m crashml index'}), 503
+    
+    start = time.perf_counter()
+    with METRICS.span('search'):
+        results = search_index.search(
+            query,
+            year=request.args.getlist('year', type=int) or None,
+            make=request.args.getlist('make') or None,
+            autonomous_mode=request.args.get('autonomous_mode') or None,
+            limit=min(request.args.get('limit', 10, type=int), 100)
+        )
+    
+    return jsonify({
+        'query': query,
+        'count': len(results),
+        'results': results,
+        'took_ms': round((time.perf_counter() - start) * 1000, 2)
+    })
+
+@app.route('/jobs', methods=['POST'])
+def submit_jobs():
+    """Queue every uploaded PDF for analysis and return job ids right away"""
+    request.max_content_length = app.config['MAX_BATCH_CONTENT_LENGTH']
+    uploaded_files = request.files.getlist('files') or request.files.getlist('file')
+    if not uploaded_files:
+        return jsonify({'error': 'No files uploaded'})
+    
+    jobs = []
+    errors = []
+    try:
+        for filename, file_bytes in iter_uploaded_pdfs(uploaded_files):
+            if file_bytes is None:
+                errors.append({'filename': filename, 'error': 'Invalid file type. Please upload PDF or zip files.'})
+                continue
+            
+            job_id = job_queue.submit(analyze_pdf_job, filename, file_bytes, filename=filename)
+            jobs.append({'filename': filename, 'job_id': job_id, 'status_url': url_for('job_status', job_id=job_id)})
+    except zipfile.BadZipFile as e:
+        return jsonify({'error': f'Invalid zip archive: {str(e)}'})
+    
+    return jsonify({'success': bool(jobs), 'jobs': jobs, 'errors': errors}), 202 if jobs else 400
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
+
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    # Batches carry many reports, so they get their own size limit
+    request.max_content_length = app.config['MAX_BATCH_CONTENT_LENGTH']
+    uploaded_files = request.files.getlist('files') or request.files.getlist('file')
+    if not uploaded_files:
+        return jsonify({'error': 'No files uploaded'})
+    
+    active = get_pipeline()
+    if active is None:
+        return jsonify({'error': MODELS_UNAVAILABLE}), 503
+    
+    names = []
+    results = []
+    
+    try:
+        for filename, file_bytes in iter_uploaded_pdfs(uploaded_files):
+            names.append(filename)
+            if file_bytes is None:
+                results.append({'error': 'Invalid file type. Please upload PDF or zip files.'})
+            else:
+                results.append(active.parse_source(file_bytes))
+    except zipfile.BadZipFile as e:
+        return jsonify({'error': f'Invalid zip archive: {str(e)}'})
+    
+    # One feature matrix and one call per model for the whole batch
+    active.predict_results(results)
+    processed = sum('error' not in result for result in results)
+    results = [analysis_payload(filename, result) for filename, result in zip(names, results)]
+    
+    return jsonify({
+        'success': True,
+        'count': len(results),
+        'processed': processed,
+        'results': results,
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    })
+
+@app.route('/metrics')
+def metrics():
+    """Per-stage latency histograms and cache/failure counters in Prometheus text format"""
+    if not METRICS.enabled:
+        return jsonify({'error': 'Metrics are disabled (CRASHML_METRICS=0)'}), 404
+    return Response(METRICS.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
 @app.route('/model_info')
 def model_info():
     return jsonify({
         'models': list(models.keys()) if models else [],
         'total_features': len(feature_names) if feature_names else 0,
+        'prediction_cache': prediction_cache.stats() if prediction_cache is not None else None,
         'training_info': {
             'dataset_size': '563 reports',
             'timeframe': '2019-2024',
@@ -0,0 +1,229 @@
+import os
+import sys
+import glob
+import json
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from crash_store import read_crash_store, load_processed_csv, DEFAULT_STORE_DIR
+from crash_datetime import normalize_datetimes, parse_time_band_spec, TIME_BANDS
+
+# crashml lives at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from crashml.form_codes import WEATHER_LABELS, LIGHTING_LABELS, ROAD_LABELS
+
+# Ready-made aggregates for the "AV vs ..." dashboards, rebuilt from the processed data
+DEFAULT_CUBE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'crash_cube')
+
+CUBE_DIMENSIONS = ['year', 'make', 'autonomous_mode', 'weather', 'lighting', 'road', 'impact', 'damage', 'weekday', 'time_band']
+
+# Columns the dimensions are derived from; nothing else is read from the store
+SOURCE_COLUMNS = ['date', 'time', 'am_pm', 'weekday', 'time_band', 'autonomous_mode', 'vehicle_1_make', 'weather_conditions',
+                  'lighting_conditions', 'road_conditions', 'impact_points', 'vehicle_damage', 'year']
+
+# Also read when duplicates are dropped, for fingerprinting (crashml.dedup)
+DEDUP_COLUMNS = ['description', 'location', 'vehicle_1_model']
+
+NOT_SPECIFIED = 'Not Specified'
+UNKNOWN = 'Unknown'
+
+# Spellings of the same manufacturer in the make field
+MAKE_ALIASES = {
+    'Cheverolet': 'Chevrolet',
+    'Mercedes': 'Mercedes-Benz',
+    'Mercedes Benz': 'Mercedes-Benz',
+    'Benz': 'Mercedes-Benz',
+}
+
+# One export per dashboard: the dimensions its chart breaks the counts down by
+DASHBOARDS = {
+    'autonomous_mode': ['year', 'autonomous_mode'],
+    'make_timeline': ['year', 'make'],
+    'weather': ['weather', 'autonomous_mode'],
+    'lighting': ['lighting', 'autonomous_mode'],
+    'road': ['road', 'autonomous_mode'],
+    'impact': ['year', 'impact'],
+    'damage': ['damage', 'autonomous_mode'],
+    'time_of_day': ['weekday', 'time_band'],
+}
+
+def first_code_label(values, labels):
+    """Label of the first vehicle 1 code in each comma-separated checkbox list, Not Specified when there is none"""
+    codes = values.astype('string').str.extract(f"({'|'.join(labels)})")[0]
+    return codes.map(labels).fillna(NOT_SPECIFIED).astype(object)
+
+def normalize_make(makes):
+    """Trimmed make with one spelling per manufacturer (FORD -> Ford, Mercedes -> Mercedes-Benz)"""
+    makes = makes.astype('string').str.strip()
+    makes = makes.where(~makes.str.isupper().fillna(False), makes.str.title())
+    makes = makes.replace(MAKE_ALIASES)
+    return makes.where(makes.notna() & (makes != ''), UNKNOWN).astype(object)
+
+def impact_area(impact_points):
+    """Front, Rear, Front and Rear, Side or Not Specified from the marked impact points"""
+    text = impact_points.astype('string').str.lower().fillna('')
+    front = text.str.contains('front', regex=False).to_numpy()
+    rear = text.str.contains('rear', regex=False).to_numpy()
+    side = text.str.contains('side', regex=False).to_numpy()
+    return pd.Series(np.select(
+        [front & rear, front, rear, side],
+        ['Front and Rear', 'Front', 'Rear', 'Side'],
+        default=NOT_SPECIFIED
+    ), index=impact_points.index, dtype=object)
+
+def cube_dimensions(df, time_bands=TIME_BANDS):
+    """
+    Dimension values of every processed row, computed column-wise
+
+    Args:
+        df: Processed crash data (store or CSV rows, with a year column)
+        time_bands: (start hour, label) pairs for the time_band dimension
+
+    Returns:
+        DataFrame with one column per CUBE_DIMENSIONS entry
+    """
+    # Processed rows carry AM/PM in its own column; as a suffix it settles 12-hour times
+    times = df['time'].astype('string') + ' ' + df['am_pm'].astype('string').fillna('')
+    when = normalize_datetimes(df['date'], times, bands=time_bands)
+
+    # weekday and time_band as preprocessing settled them (from the form's AM/PM checkboxes);
+    # derived here only for rows without them, or when other bands are asked for
+    unsettled = df['time_band'].isna().sum() if 'time_band' in df.columns else len(df)
+    if unsettled:
+        logging.warning(f"{unsettled} rows have no time_band from preprocessing; their time of day follows the stored am_pm, "
+                        "which older processed files took from the written hour alone")
+    for column in ['weekday', 'time_band']:
+        if column in df.columns and (column != 'time_band' or time_bands == TIME_BANDS):
+            stored = df[column].astype('string')
+            when[column] = stored.where(stored.notna() & (stored != ''), when[column]).astype(object)
+
+    return pd.DataFrame({
+        'year': pd.to_numeric(df['year'], errors='coerce').astype('Int64'),
+        'make': normalize_make(df['vehicle_1_make']),
+        'autonomous_mode': df['autonomous_mode'].astype('string').fillna(UNKNOWN).astype(object),
+        'weather': first_code_label(df['weather_conditions'], WEATHER_LABELS),
+        'lighting': first_code_label(df['lighting_conditions'], LIGHTING_LABELS),
+        'road': first_code_label(df['road_conditions'], ROAD_LABELS),
+        'impact': impact_area(df['impact_points']),
+        'damage': df['vehicle_damage'].astype('string').fillna('UNK').astype(object),
+        'weekday': when['weekday'],
+        'time_band': when['time_band'],
+    }, index=df.index)
+
+def build_cube(df, time_bands=TIME_BANDS):
+    """
+    Count cube over CUBE_DIMENSIONS
+
+    Only non-empty cells are kept, one row each, so the cube stays about as
+    small as the data however many dimensions it has. Any breakdown is a
+    sum over cells (see rollup).
+
+    Returns:
+        DataFrame with the dimension columns and 'count'
+    """
+    dims = cube_dimensions(df, time_bands)
+    dims = dims[dims['year'].notna()]
+    return dims.groupby(CUBE_DIMENSIONS, observed=True).size().reset_index(name='count')
+
+def rollup(cube, dimensions, filters=None):
+    """
+    Counts by a subset of the dimensions
+
+    Args:
+        cube: Output of build_cube
+        dimensions: Dimensions to keep; all others are summed out
+        filters: Optional {dimension: value or list of values} to restrict the cells first
+
+    Returns:
+        DataFrame with the kept dimensions and 'count', largest counts first
+    """
+    for dimension, values in (filters or {}).items():
+        values = values if isinstance(values, (list, tuple, set)) else [values]
+        cube = cube[cube[dimension].isin(values)]
+    counts = cube.groupby(list(dimensions), observed=True)['count'].sum().reset_index()
+    return counts.sort_values('count', ascending=False, kind='stable').reset_index(drop=True)
+
+def compact_json(counts):
+    """{'dimensions': [...], 'rows': [[value, ..., count], ...]}, the smallest form a chart can read directly"""
+    rows = counts.astype(object).where(counts.notna(), None).values.tolist()
+    return {'dimensions': list(counts.columns[:-1]), 'rows': [[int(v) if isinstance(v, (np.integer, int)) else v for v in row] for row in rows]}
+
+def export_cube(cube, output_dir=DEFAULT_CUBE_DIR):
+    """
+    Write the cube and one roll-up per dashboard
+
+    Files:
+        cube.parquet        every cell, for notebooks and further roll-ups
+        cube.json           the same cells with dictionary-encoded dimension values
+        <dashboard>.json    DASHBOARDS roll-ups in compact_json form
+
+    Returns:
+        Dictionary of file name -> size in bytes
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    def write_json(name, value):
+        path = os.path.join(output_dir, name)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(value, f, separators=(',', ':'))
+        os.replace(f"{path}.tmp", path)
+
+    parquet_path = os.path.join(output_dir, 'cube.parquet')
+    cube.to_parquet(f"{parquet_path}.tmp", index=False)
+    os.replace(f"{parquet_path}.tmp", parquet_path)
+
+    # Values are listed once per dimension and cells refer to them by index
+    values = {dimension: sorted(cube[dimension].dropna().unique().tolist()) for dimension in CUBE_DIMENSIONS}
+    codes = np.column_stack([pd.Categorical(cube[dimension], categories=values[dimension]).codes for dimension in CUBE_DIMENSIONS])
+    write_json('cube.json', {
+        'dimensions': CUBE_DIMENSIONS,
+        'values': {dimension: [int(v) if isinstance(v, (np.integer, int)) else v for v in dimension_values] for dimension, dimension_values in values.items()},
+        'cells': np.column_stack([codes, cube['count'].to_numpy()]).tolist(),
+    })
+
+    for name, dimensions in DASHBOARDS.items():
+        write_json(f"{name}.json", compact_json(rollup(cube, dimensions)))
+
+    return {name: os.path.getsize(os.path.join(output_dir, name)) for name in sorted(os.listdir(output_dir))}
+
+def load_processed_csvs(csv_files):
+    """processed_crash_data_YYYY.csv rows with a year column, times of day as crash_store.load_processed_csv reads them"""
+    return pd.concat([load_processed_csv(csv_file) for csv_file in csv_files], ignore_index=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the dashboard aggregates from the processed crash data")
+    parser.add_argument('csv_files', nargs='*', help="processed_crash_data_YYYY.csv files (default: read the Parquet store)")
+    parser.add_argument('--store', default=DEFAULT_STORE_DIR, help="Parquet store directory")
+    parser.add_argument('--output', default=DEFAULT_CUBE_DIR, help="Directory to write the aggregates to")
+    parser.add_argument('--dedup', action='store_true', help="Count near-duplicate reports once (see crashml.dedup)")
+    parser.add_argument('--time-bands', default=None, help="Time bands as start hour:label pairs, e.g. '0:Night,6:Day,18:Evening' (default: the time of day chart's bands)")
+    args = parser.parse_args()
+
+    try:
+        time_bands = parse_time_band_spec(args.time_bands) if args.time_bands else TIME_BANDS
+    except ValueError as e:
+        parser.error(f"--time-bands: {e}")
+
+    if args.csv_files:
+        df = load_processed_csvs(args.csv_files)
+    elif os.path.isdir(args.store):
+        df = read_crash_store(args.store, columns=SOURCE_COLUMNS + (DEDUP_COLUMNS if args.dedup else []))
+    else:
+        csv_files = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'processed_crash_data_20[0-9][0-9].csv')))
+        if not csv_files:
+            sys.exit("No Parquet store or processed CSV files found")
+        df = load_processed_csvs(csv_files)
+
+    if args.dedup:
+        from crashml.dedup import deduplicate
+
+        rows = len(df)
+        df, clusters = deduplicate(df)
+        print(f"Dropped {rows - len(df)} near-duplicate reports in {len(clusters)} clusters")
+
+    cube = build_cube(df, time_bands)
+    sizes = export_cube(cube, args.output)
+    print(f"Aggregated {int(cube['count'].sum())} reports into {len(cube)} cells in {args.output}")
+    for name, size in sizes.items():
+        print(f"  {name}: {size / 1024:.1f} KB")
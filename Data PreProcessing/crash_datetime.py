@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+# Start hour of each band, as in the time of day chart; any list of (start hour, label) can be passed instead
+TIME_BANDS = [(0, 'Midnight'), (4, 'Morning'), (12, 'Afternoon'), (16, 'Evening'), (20, 'Night')]
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+UNKNOWN = 'Unknown'
+
+def parse_time_band_spec(spec):
+    """
+    TIME_BANDS-style list from '0:Midnight,4:Morning,...' (command line form)
+
+    Bands are sorted by start hour, and a label may be used for more than one
+    band ('0:Night,6:Day,18:Night' wraps the night around midnight).
+
+    Raises:
+        ValueError: When a part is not hour:label, an hour is outside 0-23 or
+            given twice, or no band starts at 0
+    """
+    bands = []
+    for part in spec.split(','):
+        start, separator, label = part.partition(':')
+        try:
+            start = int(start)
+        except ValueError:
+            start = None
+        if not separator or start is None or not label.strip():
+            raise ValueError(f"Time band '{part.strip()}' is not start hour:label")
+        if not 0 <= start < 24:
+            raise ValueError(f"Time band '{part.strip()}' starts outside 0-23")
+        bands.append((start, label.strip()))
+
+    bands.sort()
+    starts = [start for start, _ in bands]
+    repeated = sorted({start for start in starts if starts.count(start) > 1})
+    if repeated:
+        raise ValueError(f"Time bands start more than once at hour {', '.join(map(str, repeated))}")
+    if starts[0] != 0:
+        raise ValueError(f"Time bands have to cover every hour: the first starts at {starts[0]}, not 0")
+    return bands
+
+def checkbox_checked(values):
+    """Whether each form checkbox cell is ticked: any exported state ('/ ', '/Yes', ...) other than /Off"""
+    text = values.astype('string')
+    return (text.str.startswith('/') & (text.str.strip() != '/Off')).fillna(False).to_numpy()
+
+def parse_dates(dates):
+    """Dates as datetime64, MM/DD/YYYY first and any other format pandas can read after"""
+    text = dates.astype('string').str.strip()
+    parsed = pd.to_datetime(text, format='%m/%d/%Y', errors='coerce')
+    rest = parsed.isna() & text.notna()
+    if rest.any():
+        parsed[rest] = pd.to_datetime(text[rest], format='mixed', errors='coerce')
+    return parsed
+
+def parse_hours(times, am=None, pm=None):
+    """
+    Hour (0-23) and minute of H:MM[:SS] [AM|PM] times
+
+    The AM/PM checkbox columns win over an AM/PM suffix in the time itself;
+    hours after 12 are already on a 24-hour clock. Without either, the hour
+    is taken as written.
+
+    Returns:
+        Tuple of (hours, minutes, am_pm) arrays; hours and minutes are NaN and
+        am_pm 'Unknown' where the time cannot be read
+    """
+    parts = times.astype('string').str.extract(r'^\s*(\d{1,2})[:.](\d{2})(?::\d{2})?\s*([AaPp])?')
+    hours = pd.to_numeric(parts[0], errors='coerce').to_numpy(dtype=float)
+    minutes = pd.to_numeric(parts[1], errors='coerce').to_numpy(dtype=float)
+    suffix = parts[2].str.upper().fillna('').to_numpy()
+
+    is_am = suffix == 'A'
+    is_pm = suffix == 'P'
+    if am is not None and pm is not None:
+        am_checked = checkbox_checked(am)
+        pm_checked = checkbox_checked(pm)
+        # Only one ticked box is an answer; both or neither leave the time text to decide
+        decided = am_checked ^ pm_checked
+        is_am = np.where(decided, am_checked, is_am)
+        is_pm = np.where(decided, pm_checked, is_pm)
+
+    hours = np.where(is_pm & (hours < 12), hours + 12, hours)
+    hours = np.where(is_am & (hours == 12), 0, hours)
+
+    valid = (hours >= 0) & (hours < 24) & (minutes >= 0) & (minutes < 60)
+    hours = np.where(valid, hours, np.nan)
+    minutes = np.where(valid, minutes, np.nan)
+    am_pm = np.where(~valid, UNKNOWN, np.where(hours < 12, 'AM', 'PM'))
+    return hours, minutes, am_pm
+
+def time_bands(hours, bands=TIME_BANDS):
+    """Band label for each hour (0-23), Unknown for missing hours and hours before the first band"""
+    bands = sorted(bands)
+    starts = np.array([start for start, _ in bands])
+    labels = np.array([label for _, label in bands] + [UNKNOWN], dtype=object)
+
+    hours = np.asarray(hours, dtype=float)
+    known = ~np.isnan(hours) & (hours >= starts[0])
+    # Index of the last band starting at or before each hour; the extra label catches the rest
+    band = np.where(known, np.searchsorted(starts, np.where(known, hours, 0), side='right') - 1, len(bands))
+    return labels[band]
+
+def normalize_datetimes(dates, times, am=None, pm=None, bands=TIME_BANDS):
+    """
+    Accident timestamps and the calendar columns derived from them, for whole columns at once
+
+    Args:
+        dates: Accident dates (date_of_accident)
+        times: Accident times (time_of_accident)
+        am, pm: AM and PM checkbox columns of the report form, when available
+        bands: (start hour, label) pairs for the time_band column
+
+    Returns:
+        DataFrame indexed like dates with 'timestamp' (NaT when the date or
+        time is unreadable), 'hour', 'am_pm', 'weekday' and 'time_band'
+    """
+    index = dates.index
+    days = parse_dates(dates)
+    hours, minutes, am_pm = parse_hours(times, am, pm)
+
+    timestamps = days + pd.to_timedelta(hours * 60 + minutes, unit='min')
+
+    return pd.DataFrame({
+        'timestamp': timestamps.to_numpy(),
+        'hour': pd.array(hours, dtype='Int64'),
+        'am_pm': am_pm,
+        'weekday': days.dt.weekday.map(dict(enumerate(WEEKDAYS))).fillna(UNKNOWN).to_numpy(),
+        'time_band': time_bands(hours, bands),
+    }, index=index)
@@ -0,0 +1,250 @@
+import os
+import re
+import sys
+import glob
+import json
+import uuid
+import shutil
+import logging
+import argparse
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# Partitioned Parquet store for processed crash data: one year=YYYY directory per year
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'crash_store')
+
+# Low-cardinality columns stored as dictionary-encoded (categorical) columns
+CATEGORICAL_COLUMNS = [
+    'am_pm', 'weekday', 'time_band', 'autonomous_mode', 'vehicle_1_make', 'vehicle_1_moving', 'vehicle_2_make', 'vehicle_2_moving',
+    'weather_conditions', 'road_conditions', 'lighting_conditions', 'roadway_surface',
+    'associated_factors', 'impact_points', 'vehicle_damage', 'Ground_Truth',
+]
+INTEGER_COLUMNS = ['accident_id', 'vehicle_1_year', 'vehicle_2_year']
+
+# Reports already in the store, kept next to the partitions ('_' files are skipped by the dataset reader)
+WATERMARK_FILENAME = '_watermark.json'
+
+def arrow_type(column):
+    if column in CATEGORICAL_COLUMNS:
+        return pa.dictionary(pa.int32(), pa.string())
+    if column in INTEGER_COLUMNS:
+        return pa.int64()
+    return pa.string()
+
+def accident_years(df, default_year=None):
+    """Year of each accident from the MM/DD/YYYY date, falling back to default_year"""
+    years = pd.to_numeric(df['date'].astype(str).str.extract(r'(\d{4})\s*$')[0], errors='coerce')
+    if default_year is not None:
+        years = years.fillna(default_year)
+    return years.astype('Int64')
+
+def year_from_filename(path):
+    """Year in a ..._YYYY.csv file name, or None"""
+    match = re.search(r'(20\d{2})\.csv$', os.path.basename(path))
+    return int(match.group(1)) if match else None
+
+def normalize_for_store(df):
+    """Give every column a fixed dtype so all partitions share one schema"""
+    df = df.copy()
+    for column in df.columns:
+        if column in INTEGER_COLUMNS:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype('Int64')
+        elif column != 'year':
+            text = df[column].astype('string').replace('', pd.NA)
+            df[column] = text.astype('category') if column in CATEGORICAL_COLUMNS else text
+    return df
+
+def row_years(df, default_year=None):
+    """Partition year of every row: its year column when there is one, else the year of its date"""
+    if 'year' in df.columns:
+        return pd.to_numeric(df['year'], errors='coerce').astype('Int64')
+    return accident_years(df, default_year)
+
+def store_table(df, default_year=None):
+    """Arrow table of df with the store schema and a year column; rows without a year are left out with a warning"""
+    df = normalize_for_store(df)
+    df['year'] = row_years(df, default_year)
+
+    missing = df['year'].isna()
+    if missing.any():
+        ids = df.loc[missing, 'accident_id'].dropna().astype(str).tolist() if 'accident_id' in df.columns else []
+        logging.warning(f"Not storing {int(missing.sum())} rows without an accident year (unreadable date, no default year)"
+                        + (f": accident_id {', '.join(ids)}" if ids else ""))
+        df = df[~missing]
+
+    schema = pa.schema([pa.field(column, arrow_type(column)) for column in df.columns if column != 'year']
+                       + [pa.field('year', pa.int32())])
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+def write_partitions(table, root, existing_data_behavior, basename_template):
+    ds.write_dataset(
+        table, root, format='parquet',
+        partitioning=ds.partitioning(pa.schema([pa.field('year', pa.int32())]), flavor='hive'),
+        existing_data_behavior=existing_data_behavior,
+        basename_template=basename_template
+    )
+
+def replace_partitions(df, root, default_year=None):
+    """Rewrite the partitions of the years present in df with df's rows"""
+    write_partitions(store_table(df, default_year), root, 'delete_matching', 'part-{i}.parquet')
+
+def write_crash_store(df, root=DEFAULT_STORE_DIR, default_year=None, hashes=None):
+    """
+    Write processed crash data into the partitioned Parquet store
+
+    Partitions for the years present in df are replaced; other years are left alone.
+    The watermark follows: reports of the replaced years are forgotten, and with
+    hashes the written reports are recorded, so a later incremental run skips them
+    instead of appending them again.
+
+    Args:
+        df: Output of preprocess_crash_data (optionally with Ground_Truth)
+        root: Store directory
+        default_year: Year for rows whose date cannot be parsed
+        hashes: Content hashes of the raw rows behind df (pre_process.record_hashes), when known
+    """
+    years = row_years(df, default_year)
+    replace_partitions(df.assign(year=years), root)
+
+    replaced = set(years.dropna().astype(int))
+    watermark = {accident_id: entry for accident_id, entry in load_watermark(root).items() if entry['year'] not in replaced}
+    if hashes is not None:
+        for accident_id, digest, year in zip(df['accident_id'], hashes, years):
+            if not pd.isna(year):
+                watermark[str(accident_id)] = {'hash': digest, 'year': int(year)}
+    save_watermark(watermark, root)
+
+def upsert_crash_store(df, root=DEFAULT_STORE_DIR, stale_years=()):
+    """
+    Add new and changed rows to the store without rewriting untouched partitions
+
+    Rows are matched on accident_id. Partitions that hold an older version of one of
+    the rows are rewritten without the old versions; the remaining rows are appended
+    to their year partitions as new files. The watermark is left to the caller.
+
+    Args:
+        df: Processed rows with a year column
+        root: Store directory
+        stale_years: Years known to contain rows being replaced; years the store
+            itself shows holding one of the accident_ids are added
+    """
+    stale_years = {int(year) for year in stale_years}
+
+    # A report written by a full write, or recorded in an outdated watermark, is replaced all the same
+    if os.path.isdir(root) and 'accident_id' in df.columns:
+        stored = read_crash_store(root, columns=['accident_id', 'year'])
+        if 'accident_id' in stored.columns:
+            stale_years |= set(stored.loc[stored['accident_id'].isin(df['accident_id'].dropna()), 'year'].dropna().astype(int))
+
+    if stale_years:
+        existing = read_crash_store(root, years=stale_years) if os.path.isdir(root) else pd.DataFrame()
+        if 'accident_id' in existing.columns:
+            existing = existing[~existing['accident_id'].isin(df['accident_id'])]
+
+        in_stale = df['year'].isin(stale_years)
+        rewritten = pd.concat([existing, df[in_stale].astype(object)], ignore_index=True)
+
+        # Partitions left empty are removed; write_dataset only replaces partitions it writes
+        for year in stale_years - set(rewritten['year'].dropna().astype(int)):
+            shutil.rmtree(os.path.join(root, f"year={year}"), ignore_errors=True)
+        if len(rewritten):
+            replace_partitions(rewritten, root)
+        df = df[~in_stale]
+
+    if len(df):
+        write_partitions(store_table(df), root, 'overwrite_or_ignore', f"part-{uuid.uuid4().hex}-{{i}}.parquet")
+
+def load_watermark(root=DEFAULT_STORE_DIR):
+    """
+    Reports already processed into the store
+
+    Returns:
+        Dictionary of str(accident_id) -> {'hash': content hash, 'year': partition year or None}
+    """
+    path = os.path.join(root, WATERMARK_FILENAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f).get('reports', {})
+
+def save_watermark(watermark, root=DEFAULT_STORE_DIR):
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, WATERMARK_FILENAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'reports': watermark}, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def read_crash_store(root=DEFAULT_STORE_DIR, columns=None, years=None):
+    """
+    Load processed crash data from the store, reading only what is asked for
+
+    Args:
+        root: Store directory
+        columns: Columns to load (default: all)
+        years: Years to load (default: all); other partitions are never opened
+
+    Returns:
+        DataFrame with categorical dtypes for the low-cardinality columns
+    """
+    dataset = ds.dataset(root, format='parquet', partitioning='hive')
+
+    filter_expr = None
+    if years is not None:
+        filter_expr = ds.field('year').isin([int(year) for year in years])
+
+    if columns is not None:
+        columns = [column for column in columns if column in dataset.schema.names]
+
+    table = dataset.to_table(columns=columns, filter=filter_expr)
+    return table.to_pandas()
+
+def load_processed_csv(csv_file):
+    """
+    Rows of a processed_crash_data_YYYY.csv file, with a year column
+
+    Files written before preprocessing read the form's AM/PM checkboxes have no
+    time_band column and an am_pm taken from the written hour alone. Their am_pm,
+    weekday and time_band are read again from the extracts they were made from
+    (pre_process.form_times); files without known extracts are kept as they are,
+    with a warning.
+    """
+    df = pd.read_csv(csv_file)
+    df = df.loc[:, ~df.columns.str.startswith('Unnamed')]
+
+    if 'time_band' not in df.columns and 'date' in df.columns:
+        from pre_process import form_times  # pre_process imports this module
+
+        times = form_times(csv_file, df['date'])
+        if times is None:
+            logging.warning(f"{csv_file}: no extracts to read the AM/PM checkboxes from; times of day follow the stored am_pm")
+        else:
+            position = df.columns.get_loc('am_pm') + 1 if 'am_pm' in df.columns else len(df.columns)
+            df['am_pm'] = times['am_pm'].to_numpy()
+            df.insert(position, 'weekday', times['weekday'].to_numpy())
+            df.insert(position + 1, 'time_band', times['time_band'].to_numpy())
+
+    # Rows with an unreadable date fall back to the year in the file name
+    df['year'] = accident_years(df, year_from_filename(csv_file))
+    return df
+
+def build_store_from_csvs(csv_files, root=DEFAULT_STORE_DIR):
+    """Load processed_crash_data_YYYY.csv files into the store in one write"""
+    frames = [load_processed_csv(csv_file) for csv_file in csv_files]
+
+    combined = pd.concat(frames, ignore_index=True)
+    write_crash_store(combined, root)
+    print(f"Stored {len(combined)} rows from {len(csv_files)} files in {root}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the partitioned Parquet crash store from processed CSVs")
+    parser.add_argument('csv_files', nargs='*', help="processed_crash_data_YYYY.csv files (default: the ones next to this script)")
+    parser.add_argument('--store', default=DEFAULT_STORE_DIR, help="Store directory")
+    args = parser.parse_args()
+
+    csv_files = args.csv_files or sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'processed_crash_data_20[0-9][0-9].csv')))
+    if not csv_files:
+        sys.exit("No processed CSV files found")
+
+    build_store_from_csvs(csv_files, args.store)
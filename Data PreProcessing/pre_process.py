@@ -1,88 +1,280 @@
+import os
 import pandas as pd
+import numpy as np
 import re
+import hashlib
+import argparse
+from crash_store import (write_crash_store, upsert_crash_store, load_watermark, save_watermark,
+                         accident_years, year_from_filename, DEFAULT_STORE_DIR)
+from crash_datetime import normalize_datetimes, parse_dates, TIME_BANDS
 
-def preprocess_crash_data(csv_file):
+DAMAGE_LEVELS = ["MINOR", "MAJOR", "MOD", "NONE", "UNK"]
+
+# Columns naming the report PDF a row was extracted from
+SOURCE_FILE_COLUMNS = ['source_file', 'source_filename']
+
+EXTRACT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Combined_Extracted Data')
+
+# Extracted CSVs each committed processed_crash_data file was made from, concatenated in this order
+PROCESSED_SOURCES = {
+    'processed_crash_data_2019.csv': ['extracted_pdf_data_22019.csv'],
+    'processed_crash_data_2020.csv': ['extracted_pdf_data_22020.csv'],
+    'processed_crash_data_2021.csv': ['extracted_pdf_data_22021.csv'],
+    'processed_crash_data_2022.csv': ['combined_accident_data_2022.csv'],
+    'processed_crash_data_2023.csv': ['combined_accident_data_2023.csv'],
+    'processed_crash_data_2024.csv': ['combined_accident_data_2024.csv', 'extracted_pdf_data.csv'],
+    'processed_crash_data_22024.csv': ['extracted_pdf_data_22024.csv'],
+}
+
+def load_extracted_csv(csv_file):
     # Load the data
     df = pd.read_csv(csv_file)
-    
+
     # Clean column names (remove spaces, standardize case)
     df.columns = [col.strip().lower().replace(' ', '_').replace('.', '_') for col in df.columns]
-    
+    return df
+
+def preprocess_crash_data(csv_file, store_root=None):
+    df = load_extracted_csv(csv_file)
+    hashes = record_hashes(df)
+    processed_df = preprocess_frame(df, accident_ids=stable_ids(df, hashes))
+
+    # Optionally write into the Parquet store (replaces the partitions of the years in this file,
+    # and records its reports in the watermark so --incremental runs skip them)
+    if store_root is not None:
+        write_crash_store(processed_df, store_root, default_year=year_from_filename(csv_file), hashes=hashes)
+
+    return processed_df
+
+def preprocess_frame(df, accident_ids=None, time_bands=TIME_BANDS):
+    # Stable IDs unless the caller already derived them from the full file
+    if accident_ids is None:
+        accident_ids = stable_ids(df, record_hashes(df))
+
+    # Date, time and the AM/PM checkboxes parsed together, for the whole file at once
+    when = normalize_datetimes(df['date_of_accident'], df['time_of_accident'], df.get('am'), df.get('pm'), bands=time_bands)
+
+    # Resolve the column groups once per file, then work on whole columns
+    groups = resolve_column_groups(df.columns)
+    checked = df.eq('/Yes')  # checkbox state of every cell
+
     # Extract key features
     features = {
-        'accident_id': list(range(len(df))),  # Generate unique IDs
+        'accident_id': list(accident_ids),  # Stable across runs (see stable_ids)
         'date': df['date_of_accident'].tolist(),
         'time': df['time_of_accident'].tolist(),
-        'am_pm': df['time_of_accident'].apply(lambda x: 'AM' if pd.notna(x) and int(x.split(':')[0]) < 12 else 'PM' if pd.notna(x) else 'Unknown'),
-        'location': df.apply(lambda row: f"{row.get('section_2__accident_information_1_0', '')}, {row.get('section_2__accident_information_1_1_0', '')}", axis=1).tolist(),
-        'description': df.apply(lambda row: next((str(row[col]) for col in row.index if 'address_2' in col.lower() and pd.notna(row[col]) and len(str(row[col])) > 50), ""), axis=1).tolist(),
-        'autonomous_mode': df.apply(lambda row: 'Yes' if row.get('autonomous_mode') == '/ ' else 'No', axis=1).tolist(),
+        'am_pm': when['am_pm'].tolist(),
+        'weekday': when['weekday'].tolist(),
+        'time_band': when['time_band'].tolist(),
+        'location': (column_as_text(df, 'section_2__accident_information_1_0') + ', ' + column_as_text(df, 'section_2__accident_information_1_1_0')).tolist(),
+        'description': extract_description(df, groups['description']).tolist(),
+        'autonomous_mode': checkbox_yes_no(df, 'autonomous_mode').tolist(),
         'vehicle_1_make': df['make'].tolist(),
         'vehicle_1_model': df['model'].tolist(),
         'vehicle_1_year': df['vehicle_year'].tolist(),
-        'vehicle_1_moving': df.apply(lambda row: 'Yes' if row.get('moving') == '/ ' else 'No', axis=1).tolist(),
+        'vehicle_1_moving': checkbox_yes_no(df, 'moving').tolist(),
         'vehicle_2_make': df['make_2'].tolist() if 'make_2' in df.columns else [''] * len(df),
         'vehicle_2_model': df['model_2'].tolist(),
         'vehicle_2_year': df['vehicle_year_2'].tolist() if 'vehicle_year_2' in df.columns else [''] * len(df),
-        'vehicle_2_moving': df.apply(lambda row: 'Yes' if row.get('moving_2') == '/ ' else 'No', axis=1).tolist(),
-        'weather_conditions': df.apply(lambda row: extract_weather(row), axis=1).tolist(),
-        'road_conditions': df.apply(lambda row: extract_road_conditions(row), axis=1).tolist(),
-        'lighting_conditions': df.apply(lambda row: extract_lighting(row), axis=1).tolist(),
-        'roadway_surface': df.apply(lambda row: extract_roadway_surface(row), axis=1).tolist(),
-        'associated_factors': df.apply(lambda row: extract_associated_factors(row), axis=1).tolist(),
-        'impact_points': df.apply(lambda row: extract_impact_points(row), axis=1).tolist(),
-        'vehicle_damage': df.apply(lambda row: extract_vehicle_damage(row), axis=1).tolist(),
+        'vehicle_2_moving': checkbox_yes_no(df, 'moving_2').tolist(),
+        'weather_conditions': join_checked_columns(checked, groups['weather']).tolist(),
+        'road_conditions': join_checked_columns(checked, groups['road_conditions']).tolist(),
+        'lighting_conditions': join_checked_columns(checked, groups['lighting']).tolist(),
+        'roadway_surface': join_checked_columns(checked, groups['roadway']).tolist(),
+        'associated_factors': join_checked_columns(checked, groups['other']).tolist(),
+        'impact_points': join_checked_columns(checked, groups['impact']).tolist(),
+        'vehicle_damage': extract_vehicle_damage(checked, groups['damage']).tolist(),
     }
-    
+
     return pd.DataFrame(features)
 
-# Extract weather conditions
-def extract_weather(row):
-    weather_cols = [col for col in row.index if 'weather' in col.lower() and pd.notna(row[col]) and row[col] == '/Yes']
-    return ', '.join(weather_cols) if weather_cols else 'Not specified'
-
-# Extract road conditions
-def extract_road_conditions(row):
-    road_cols = [col for col in row.index if 'road_conditions' in col.lower() and pd.notna(row[col]) and row[col] == '/Yes']
-    return ', '.join(road_cols) if road_cols else 'Not specified'
-
-# Extract lighting conditions
-def extract_lighting(row):
-    lighting_cols = [col for col in row.index if 'lighting' in col.lower() and pd.notna(row[col]) and row[col] == '/Yes']
-    return ', '.join(lighting_cols) if lighting_cols else 'Not specified'
-
-# Extract roadway surface conditions
-def extract_roadway_surface(row):
-    surface_cols = [col for col in row.index if col.startswith('roadway') and pd.notna(row[col]) and row[col] == '/Yes']
-    return ', '.join(surface_cols) if surface_cols else 'Not specified'
-
-# Extract associated factors
-def extract_associated_factors(row):
-    factor_cols = [col for col in row.index if col.startswith('other') and pd.notna(row[col]) and row[col] == '/Yes']
-    return ', '.join(factor_cols) if factor_cols else 'Not specified'
-
-# Extract impact points
-def extract_impact_points(row):
-    impact_cols = [col for col in row.index if any(x in col.lower() for x in ['rear', 'front', 'side']) and pd.notna(row[col]) and row[col] == '/Yes']
-    return ', '.join(impact_cols) if impact_cols else 'Not specified'
-
-# Extract vehicle damage based on column names
-def extract_vehicle_damage(row):
-    damage_levels = ["MINOR", "MAJOR", "MOD", "NONE", "UNK"]
-    for level in damage_levels:
-        damage_col = next((col for col in row.index if level.lower() in col.lower()), None)
-        if damage_col and pd.notna(row[damage_col]) and row[damage_col] == '/Yes':
-            return level
-    return 'UNK'  # Default to 'UNKNOWN' if no damage level is found
-
-
-# --- Execution ---
-csv_file = ("C:\\Users\\ridah\\Desktop\\from desktop to new pc\\sENIOR rESEARCH pROJECT\\pdf Extraction\\pdf_extraction\\extracted_pdf_data_22024.csv")
-processed_df = preprocess_crash_data(csv_file)
-
-# Preview processed data
-print(processed_df.head())
-
-# Save the processed data
-#processed_df.to_csv("C:\\Users\\ridah\\Desktop\\processed_crash_data.csv", index=False)
-processed_df.to_csv("C:\\Users\\ridah\\Desktop\\from desktop to new pc\\sENIOR rESEARCH pROJECT\\pdf Extraction\\pdf_extraction\\processed_crash_data_22024.csv", index=False)
+def preprocess_incremental(csv_file, store_root=DEFAULT_STORE_DIR, default_year=None):
+    """
+    Process only the reports in csv_file that are new or changed since the last run
+
+    The store's watermark remembers the content hash and year of every report already
+    processed. Unchanged rows are skipped before any feature extraction, so a refresh
+    costs time in proportion to the new reports rather than the whole history.
+
+    Args:
+        csv_file: Extracted form-field CSV (extracted_pdf_data_YYYY.csv)
+        store_root: Parquet store directory holding the watermark
+        default_year: Year for rows whose date cannot be parsed (default: year in the file name)
+
+    Returns:
+        DataFrame of the rows that were written (empty when nothing changed)
+    """
+    df = load_extracted_csv(csv_file)
+    hashes = record_hashes(df)
+    ids = stable_ids(df, hashes)
+
+    watermark = load_watermark(store_root)
+    previous = [watermark.get(str(accident_id)) for accident_id in ids]
+    pending = np.array([entry is None or entry['hash'] != digest for entry, digest in zip(previous, hashes)], dtype=bool)
+
+    if not pending.any():
+        print(f"{csv_file}: all {len(df)} reports already processed")
+        return preprocess_frame(df.iloc[:0], accident_ids=[])
+
+    delta = preprocess_frame(df[pending], accident_ids=[ids[i] for i in np.flatnonzero(pending)])
+    if default_year is None:
+        default_year = year_from_filename(csv_file)
+    delta['year'] = accident_years(delta, default_year)
+
+    # Partitions still holding the old version of a changed report
+    stale_years = {entry['year'] for entry, is_pending in zip(previous, pending) if is_pending and entry and entry['year'] is not None}
+    upsert_crash_store(delta, store_root, stale_years)
+
+    for i, year in zip(np.flatnonzero(pending), delta['year']):
+        watermark[str(ids[i])] = {'hash': hashes[i], 'year': None if pd.isna(year) else int(year)}
+    save_watermark(watermark, store_root)
+
+    print(f"{csv_file}: {int(pending.sum())} new or changed of {len(df)} reports")
+    return delta
+
+def form_times(processed_csv, dates=None, extract_dir=EXTRACT_DIR, time_bands=TIME_BANDS):
+    """
+    am_pm, weekday and time_band of a processed CSV's rows, read again from the extracts it was made from
+
+    The committed processed CSVs predate reading the form's AM/PM checkboxes: their am_pm
+    says 'AM' whenever the written hour is below 12, so an evening crash written as 7:30
+    reads as morning. The extracts still hold the checkboxes, row for row.
+
+    Args:
+        processed_csv: processed_crash_data_YYYY.csv path (matched by file name)
+        dates: The file's date column, to check that the rows line up (optional)
+        extract_dir: Directory of the extracted CSVs (PROCESSED_SOURCES)
+        time_bands: (start hour, label) pairs for the time_band column
+
+    Returns:
+        DataFrame with 'am_pm', 'weekday' and 'time_band', one row per processed row,
+        or None when the file is not a known one or its extracts are missing or do not line up
+    """
+    sources = PROCESSED_SOURCES.get(os.path.basename(str(processed_csv)))
+    if sources is None or not all(os.path.exists(os.path.join(extract_dir, source)) for source in sources):
+        return None
+
+    # Extracts of one year can name their columns differently, so each is read on its own
+    frames = []
+    for source in sources:
+        raw = load_extracted_csv(os.path.join(extract_dir, source))
+        when = normalize_datetimes(raw['date_of_accident'], raw['time_of_accident'], raw.get('am'), raw.get('pm'), bands=time_bands)
+        frames.append(when.assign(date=parse_dates(raw['date_of_accident'])))
+    when = pd.concat(frames, ignore_index=True)
+
+    if dates is not None:
+        # The processed dates were re-saved (3/4/2023 for 03/04/2023), so compare them parsed
+        ours = parse_dates(pd.Series(list(dates)))
+        if len(ours) != len(when) or ((ours != when['date']) & ours.notna() & when['date'].notna()).any():
+            return None
+    return when[['am_pm', 'weekday', 'time_band']]
+
+# Content hash of each raw row; independent of column order and of columns left empty
+def record_hashes(df):
+    columns = sorted(df.columns)
+    hashes = []
+    for row in df[columns].itertuples(index=False, name=None):
+        digest = hashlib.sha256()
+        for col, value in zip(columns, row):
+            if pd.isna(value):
+                continue
+            if isinstance(value, float) and value.is_integer():
+                value = int(value)  # 2019.0 and 2019 are the same field value
+            digest.update(f"{col}={value}\x1f".encode('utf-8'))
+        hashes.append(digest.hexdigest()[:16])
+    return hashes
+
+# 60-bit IDs from the report's source file name (content hash when the name is missing)
+def stable_ids(df, hashes):
+    keys = pd.Series(hashes, index=df.index, dtype=object)
+    source_col = next((col for col in SOURCE_FILE_COLUMNS if col in df.columns), None)
+    if source_col is not None:
+        keys = df[source_col].astype(str).where(df[source_col].notna(), keys)
+
+    # A file listed twice keeps one ID per occurrence
+    occurrence = keys.groupby(keys).cumcount()
+    keys = keys.where(occurrence == 0, keys + '#' + occurrence.astype(str))
+    return [int(hashlib.sha256(key.encode('utf-8')).hexdigest()[:15], 16) for key in keys]
+
+# Find which columns feed each feature (done once per file, not once per row)
+def resolve_column_groups(columns):
+    columns = list(columns)
+    return {
+        'description': [col for col in columns if 'address_2' in col.lower()],
+        'weather': [col for col in columns if 'weather' in col.lower()],
+        'road_conditions': [col for col in columns if 'road_conditions' in col.lower()],
+        'lighting': [col for col in columns if 'lighting' in col.lower()],
+        'roadway': [col for col in columns if col.startswith('roadway')],
+        'other': [col for col in columns if col.startswith('other')],
+        'impact': [col for col in columns if any(x in col.lower() for x in ['rear', 'front', 'side'])],
+        # First column whose name mentions each damage level
+        'damage': {level: next((col for col in columns if level.lower() in col.lower()), None) for level in DAMAGE_LEVELS},
+    }
+
+# Column values as text, '' when the column is missing (NaN becomes 'nan', as in an f-string)
+def column_as_text(df, col):
+    if col not in df.columns:
+        return pd.Series('', index=df.index, dtype=object)
+    return df[col].astype(str)
+
+# 'Yes' where a checkbox column is marked '/ ', 'No' otherwise or when the column is missing
+def checkbox_yes_no(df, col):
+    if col not in df.columns:
+        return pd.Series('No', index=df.index, dtype=object)
+    return pd.Series(np.where(df[col].eq('/ '), 'Yes', 'No'), index=df.index, dtype=object)
+
+# Narrative: first address_2 column holding more than 50 characters
+def extract_description(df, columns):
+    description = pd.Series('', index=df.index, dtype=object)
+    found = pd.Series(False, index=df.index)
+    for col in columns:
+        text = df[col].astype(str)
+        use = df[col].notna() & (text.str.len() > 50) & ~found
+        description[use] = text[use]
+        found |= use
+    return description
+
+# Comma-separated names of the checked columns in a group, per row
+def join_checked_columns(checked, columns):
+    if not columns:
+        return pd.Series('Not specified', index=checked.index, dtype=object)
+
+    labels = np.array([f"{col}, " for col in columns], dtype=object)
+    joined = checked[columns].to_numpy(dtype=object).dot(labels)  # True * "col, " == "col, "
+    joined = pd.Series(joined, index=checked.index, dtype=object).str[:-2]
+    return joined.where(joined != '', 'Not specified')
+
+# Vehicle damage level based on column names (first checked level wins)
+def extract_vehicle_damage(checked, damage_columns):
+    conditions = []
+    levels = []
+    for level in DAMAGE_LEVELS:
+        col = damage_columns[level]
+        if col is not None:
+            conditions.append(checked[col].to_numpy())
+            levels.append(level)
+    if not conditions:
+        return pd.Series('UNK', index=checked.index, dtype=object)
+    return pd.Series(np.select(conditions, levels, default='UNK'), index=checked.index, dtype=object)
+
+
+if __name__ == "__main__":
+    # --- Execution ---
+    parser = argparse.ArgumentParser(description="Preprocess an extracted crash report CSV")
+    parser.add_argument('csv_file', nargs='?', default="C:\\Users\\ridah\\Desktop\\from desktop to new pc\\sENIOR rESEARCH pROJECT\\pdf Extraction\\pdf_extraction\\extracted_pdf_data_22024.csv")
+    parser.add_argument('--output', default="C:\\Users\\ridah\\Desktop\\from desktop to new pc\\sENIOR rESEARCH pROJECT\\pdf Extraction\\pdf_extraction\\processed_crash_data_22024.csv")
+    parser.add_argument('--incremental', action='store_true', help="Only process new or changed reports into the Parquet store")
+    parser.add_argument('--store', default=DEFAULT_STORE_DIR, help="Parquet store directory")
+    args = parser.parse_args()
+
+    if args.incremental:
+        preprocess_incremental(args.csv_file, args.store)
+    else:
+        processed_df = preprocess_crash_data(args.csv_file)
+
+        # Preview processed data
+        print(processed_df.head())
+
+        # Save the processed data
+        #processed_df.to_csv("C:\\Users\\ridah\\Desktop\\processed_crash_data.csv", index=False)
+        processed_df.to_csv(args.output, index=False)
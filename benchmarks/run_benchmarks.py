@@ -0,0 +1,313 @@
+"""
+Benchmarks for the CrashML pipeline, run against the data committed in this repository
+
+    python benchmarks/run_benchmarks.py                    # run and compare to baseline.json
+    python benchmarks/run_benchmarks.py --update-baseline  # run and store the results as the new baseline
+
+Measures:
+    pdf_parse            PDF parse throughput (pdfplumber + PyPDF2) over reports_20XX PDFs
+    pdf_parse_fast       The same with fast extraction (form fields instead of layout analysis)
+    parse_dmv_report     Cost of parsing one extracted report
+    preprocess           preprocess_crash_data rows per second over the extracted CSVs
+    predict_single       predict_fault latency for one report (p50/p95/p99)
+    predict_batch        predict_fault_batch latency per batch and per report (p50/p95/p99)
+
+Each benchmark runs several rounds and keeps the best one, which is far less
+sensitive to background load than a mean over all rounds. Results are written
+as JSON. Every metric records whether higher or lower is better; a metric that
+is worse than the baseline by more than the tolerance is reported as a
+regression and the script exits with status 1.
+"""
+import os
+import sys
+import json
+import glob
+import time
+import random
+import argparse
+import platform
+import warnings
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PREPROCESSING_DIR = os.path.join(REPO_ROOT, 'Data PreProcessing')
+EXTRACTED_DIR = os.path.join(REPO_ROOT, 'Combined_Extracted Data')
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+DEFAULT_OUTPUT = os.path.join(BENCHMARK_DIR, 'results', 'latest.json')
+
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, PREPROCESSING_DIR)
+
+def percentiles(samples):
+    """p50/p95/p99 and mean of latency samples, in milliseconds"""
+    samples_ms = np.asarray(samples) * 1000
+    return {
+        'p50_ms': float(np.percentile(samples_ms, 50)),
+        'p95_ms': float(np.percentile(samples_ms, 95)),
+        'p99_ms': float(np.percentile(samples_ms, 99)),
+        'mean_ms': float(samples_ms.mean()),
+    }
+
+def best_round(rounds):
+    """Percentiles of the round with the lowest median: the run least disturbed by other load"""
+    return min((percentiles(samples) for samples in rounds), key=lambda stats: stats['p50_ms'])
+
+def metric(value, unit, better, tail=False):
+    """One result; tail latencies (p95/p99) are compared with the looser tail tolerance"""
+    result = {'value': float(value), 'unit': unit, 'better': better}
+    if tail:
+        result['tail'] = True
+    return result
+
+def select_pdfs(limit, seed):
+    """Same PDFs on every run: a seeded sample spread over all reports_YYYY folders"""
+    pdfs = sorted(glob.glob(os.path.join(EXTRACTED_DIR, 'reports_20[0-9][0-9]', '*.pdf')))
+    if limit and len(pdfs) > limit:
+        pdfs = sorted(random.Random(seed).sample(pdfs, limit))
+    return pdfs
+
+def bench_pdf_parse(pdf_bytes, fast):
+    from crashml import parse_pdf_bytes
+
+    reports = []
+    start = time.perf_counter()
+    for file_bytes in pdf_bytes:
+        reports.append(parse_pdf_bytes(file_bytes, fast=fast))
+    elapsed = time.perf_counter() - start
+
+    return reports, {
+        'files_per_s': metric(len(pdf_bytes) / elapsed, 'files/s', 'higher'),
+        'files': len(pdf_bytes),
+    }
+
+def bench_parse_dmv_report(reports, repeat):
+    from crashml import parse_dmv_report
+
+    texts = [(report.text, report.form_fields) for report in reports if report.text]
+
+    # Findings are collected the way the Flask app collects its debug info
+    rounds = [[] for _ in range(repeat)]
+    for samples in rounds:
+        for _ in range(25):
+            for text, form_fields in texts:
+                debug_info = []
+                start = time.perf_counter()
+                parse_dmv_report(text, form_fields, log=debug_info.append)
+                samples.append(time.perf_counter() - start)
+
+    stats = best_round(rounds)
+    return {
+        'p50_ms': metric(stats['p50_ms'], 'ms', 'lower'),
+        'p95_ms': metric(stats['p95_ms'], 'ms', 'lower', tail=True),
+        'reports': len(texts),
+    }
+
+def bench_preprocess(repeat):
+    from pre_process import preprocess_crash_data
+
+    csv_files = sorted(glob.glob(os.path.join(EXTRACTED_DIR, 'extracted_pdf_data*.csv')))
+    best_rate = 0.0
+    for _ in range(repeat):
+        rows = 0
+        start = time.perf_counter()
+        for csv_file in csv_files:
+            rows += len(preprocess_crash_data(csv_file))
+        best_rate = max(best_rate, rows / (time.perf_counter() - start))
+
+    return {
+        'rows_per_s': metric(best_rate, 'rows/s', 'higher'),
+        'rows': rows,
+        'files': len(csv_files),
+    }
+
+def data_points_from_processed_csvs():
+    """Model inputs built from the committed processed_crash_data_YYYY.csv files"""
+    from crashml.training import data_points_from_frame
+
+    frames = [pd.read_csv(path) for path in sorted(glob.glob(os.path.join(PREPROCESSING_DIR, 'processed_crash_data_20[0-9][0-9].csv')))]
+    return data_points_from_frame(pd.concat(frames, ignore_index=True))
+
+def bench_predict(bundle, data_points, batch_size, repeat):
+    from crashml import predict_fault, predict_fault_batch
+
+    # Warm up the vectorizer and every model once
+    predict_fault_batch(data_points[:batch_size], bundle)
+
+    single = [[] for _ in range(repeat)]
+    for samples in single:
+        for data_point in data_points:
+            start = time.perf_counter()
+            predict_fault(data_point, bundle)
+            samples.append(time.perf_counter() - start)
+
+    batches = [[] for _ in range(repeat)]
+    for samples in batches:
+        for i in range(0, len(data_points) - batch_size + 1, batch_size):
+            start = time.perf_counter()
+            predict_fault_batch(data_points[i:i + batch_size], bundle)
+            samples.append(time.perf_counter() - start)
+
+    single_stats = best_round(single)
+    batch_stats = best_round(batches)
+    return {
+        'predict_single': {
+            'p50_ms': metric(single_stats['p50_ms'], 'ms', 'lower'),
+            'p95_ms': metric(single_stats['p95_ms'], 'ms', 'lower', tail=True),
+            'p99_ms': metric(single_stats['p99_ms'], 'ms', 'lower', tail=True),
+            'reports': len(data_points),
+        },
+        'predict_batch': {
+            'batch_size': batch_size,
+            'p50_ms': metric(batch_stats['p50_ms'], 'ms', 'lower'),
+            'p95_ms': metric(batch_stats['p95_ms'], 'ms', 'lower', tail=True),
+            'p99_ms': metric(batch_stats['p99_ms'], 'ms', 'lower', tail=True),
+            'per_report_p50_ms': metric(batch_stats['p50_ms'] / batch_size, 'ms', 'lower'),
+        },
+    }
+
+def run_benchmarks(args):
+    warnings.filterwarnings('ignore')
+    os.environ.setdefault('CRASHML_METRICS', '0')  # measure the pipeline, not the instrumentation
+
+    from crashml.model_bundle import load_or_build_bundle
+    try:
+        bundle = load_or_build_bundle()
+    except (FileNotFoundError, ValueError) as e:
+        sys.exit(f"Could not load the models: {e}")
+
+    pdfs = select_pdfs(args.pdfs, args.seed)
+    pdf_bytes = []
+    for path in pdfs:
+        with open(path, 'rb') as f:
+            pdf_bytes.append(f.read())
+
+    results = {}
+    timings = {}
+
+    def stage(name, fn, *fn_args):
+        print(f"Running {name}...")
+        start = time.perf_counter()
+        output = fn(*fn_args)
+        timings[name] = round(time.perf_counter() - start, 2)
+        return output
+
+    reports, results['pdf_parse'] = stage('pdf_parse', bench_pdf_parse, pdf_bytes, False)
+    _, results['pdf_parse_fast'] = stage('pdf_parse_fast', bench_pdf_parse, pdf_bytes, True)
+    results['parse_dmv_report'] = stage('parse_dmv_report', bench_parse_dmv_report, reports, args.repeat)
+    results['preprocess'] = stage('preprocess', bench_preprocess, args.repeat)
+
+    data_points = data_points_from_processed_csvs()
+    if args.predict_reports:
+        data_points = data_points[:args.predict_reports]
+    results.update(stage('predict', bench_predict, bundle, data_points, args.batch_size, args.repeat))
+
+    import sklearn
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'scikit-learn': sklearn.__version__,
+        },
+        'config': {
+            'pdfs': len(pdfs),
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'batch_size': args.batch_size,
+            'predict_reports': len(data_points),
+        },
+        'stage_seconds': timings,
+        'results': results,
+    }
+
+def iter_metrics(results):
+    """Yield (name, metric) for every metric in a results tree"""
+    for benchmark, values in results.items():
+        for key, value in values.items():
+            if isinstance(value, dict) and 'better' in value:
+                yield f"{benchmark}.{key}", value
+
+def compare(current, baseline, tolerance, tail_tolerance):
+    """
+    Compare results with a baseline
+
+    Returns:
+        List of (name, baseline value, current value, change) for metrics worse than tolerance allows
+    """
+    baseline_metrics = dict(iter_metrics(baseline['results']))
+    regressions = []
+
+    print(f"\n{'metric':<34}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, value in iter_metrics(current['results']):
+        reference = baseline_metrics.get(name)
+        if reference is None or reference['value'] == 0:
+            print(f"{name:<34}{'-':>12}{value['value']:>12.3f}{'new':>10}")
+            continue
+
+        ratio = value['value'] / reference['value']
+        # Slowdown factor: > 1 means worse, whichever direction is better
+        slowdown = 1 / ratio if value['better'] == 'higher' else ratio
+        regressed = slowdown > 1 + (tail_tolerance if value.get('tail') else tolerance)
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{name:<34}{reference['value']:>12.3f}{value['value']:>12.3f}{(ratio - 1) * 100:>+9.1f}%{flag}")
+
+        if regressed:
+            regressions.append((name, reference['value'], value['value'], slowdown))
+
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF extraction, parsing, preprocessing and inference")
+    parser.add_argument('--pdfs', type=int, default=12, help="Number of committed PDFs to parse (0 = all)")
+    parser.add_argument('--repeat', type=int, default=3, help="Rounds of the cheaper benchmarks; the best round is kept")
+    parser.add_argument('--batch-size', type=int, default=32, help="Reports per predict_fault_batch call")
+    parser.add_argument('--predict-reports', type=int, default=0, help="Limit the reports used for prediction (0 = all)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the PDF sample")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Where to write the results JSON")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline results to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.5, help="Allowed slowdown before failing (0.5 = 50%%)")
+    parser.add_argument('--tail-tolerance', type=float, default=1.0, help="Allowed slowdown of p95/p99 latencies (1.0 = 100%%)")
+    parser.add_argument('--update-baseline', action='store_true', help="Store these results as the new baseline")
+    args = parser.parse_args()
+
+    current = run_benchmarks(args)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(current, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+        return
+
+    with open(args.baseline, 'r') as f:
+        baseline = json.load(f)
+
+    if baseline.get('config') != current['config']:
+        print(f"Warning: baseline was recorded with a different configuration: {baseline.get('config')}")
+
+    regressions = compare(current, baseline, args.tolerance, args.tail_tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed beyond tolerance:")
+        for name, reference, value, slowdown in regressions:
+            print(f"  {name}: {reference:.3f} -> {value:.3f} ({slowdown:.2f}x worse)")
+        sys.exit(1)
+
+    print("\nNo regressions")
+
+if __name__ == "__main__":
+    main()
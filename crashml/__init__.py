@@ -0,0 +1,15 @@
+"""
+CrashML: extraction, parsing and fault prediction for California DMV AV collision reports
+
+One implementation of every pipeline stage, shared by the Flask and Streamlit
+UIs and the batch tools. Importing the package is cheap: pdfplumber, PyPDF2,
+scikit-learn and joblib are only imported when PDFs are parsed or models are
+loaded (crashml.model_bundle).
+"""
+from .metrics import METRICS
+from .extraction_cache import ExtractionCache, content_digest
+from .pdf_extraction import ParsedReport, parse_pdf_bytes, load_report, read_form_fields, load_form_fields
+from .parsing import parse_dmv_report, parse_report, summarize_features
+from .inference import FAULT_LABELS, build_feature_matrix, predict_fault, predict_fault_batch, explain_prediction, explain_batch
+from .prediction_cache import PredictionCache
+from .pipeline import Pipeline, extract_report
@@ -0,0 +1,42 @@
+"""
+Command line entry point: python -m crashml <command> ...
+"""
+import sys
+import argparse
+import logging
+from .scoring import add_score_arguments, score_command
+from .training import add_train_arguments, train_command
+from .dedup import add_dedup_arguments, dedup_command
+from .search import add_index_arguments, index_command, add_search_arguments, search_command
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(prog='crashml', description="CrashML batch tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    score_parser = subparsers.add_parser('score', help="Score a directory tree or manifest of report PDFs")
+    add_score_arguments(score_parser)
+    score_parser.set_defaults(run=score_command)
+
+    train_parser = subparsers.add_parser('train', help="Retrain the fault models from the processed crash data")
+    add_train_arguments(train_parser)
+    train_parser.set_defaults(run=train_command)
+
+    dedup_parser = subparsers.add_parser('dedup', help="Find near-duplicate reports in crash data CSVs")
+    add_dedup_arguments(dedup_parser)
+    dedup_parser.set_defaults(run=dedup_command)
+
+    index_parser = subparsers.add_parser('index', help="Build or update the full-text search index of crash narratives")
+    add_index_arguments(index_parser)
+    index_parser.set_defaults(run=index_command)
+
+    search_parser = subparsers.add_parser('search', help="Search the crash narratives")
+    add_search_arguments(search_parser)
+    search_parser.set_defaults(run=search_command)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
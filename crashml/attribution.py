@@ -0,0 +1,185 @@
+"""
+Per-report feature attributions for the fitted models
+
+Tree ensembles are explained with tree-path contributions (Saabas): walking
+from the root to a report's leaf, every split moves the node value, and the
+change is credited to the split's feature. Summed over the path (and over
+the trees of the ensemble), the contributions plus a bias add up exactly to
+the model's output for that report.
+
+The walk is precomputed. When an explainer is built, every leaf of every tree
+gets a sparse row holding the contributions along its path. Explaining a batch
+is then one apply() call to find the leaves and one sparse product to
+sum their rows, whatever the batch size.
+
+Output spaces differ by model: Random Forest contributions are in
+probability, Gradient Boosting and Logistic Regression ones in raw
+(log-odds) scores. Each explainer names its space.
+"""
+import numpy as np
+from scipy import sparse
+
+def tree_parents(tree):
+    """Parent node id of every node of a fitted sklearn Tree (-1 for the root)"""
+    parents = np.full(tree.node_count, -1, dtype=np.intp)
+    nodes = np.arange(tree.node_count)
+    for children in (tree.children_left, tree.children_right):
+        has_child = children >= 0
+        parents[children[has_child]] = nodes[has_child]
+    return parents
+
+def leaf_path_entries(tree, node_values):
+    """
+    Contributions along the path to every leaf of one tree
+
+    Args:
+        tree: Fitted sklearn Tree
+        node_values: Array (node_count, n_outputs) of the value each node predicts
+
+    Returns:
+        Tuple of (leaf ids, feature ids, output ids, contributions), one entry
+        per split on each leaf's path, vectorized over all leaves
+    """
+    parents = tree_parents(tree)
+    leaves = np.flatnonzero(tree.children_left < 0)
+    n_outputs = node_values.shape[1]
+
+    rows, features, outputs, values = [], [], [], []
+    current = leaves
+    owners = leaves
+    # One step up per iteration, for all leaves at once; stops at the root
+    while current.size:
+        parent = parents[current]
+        above_root = parent >= 0
+        current, parent, owners = current[above_root], parent[above_root], owners[above_root]
+        if not current.size:
+            break
+
+        delta = node_values[current] - node_values[parent]
+        rows.append(np.repeat(owners, n_outputs))
+        features.append(np.repeat(tree.feature[parent], n_outputs))
+        outputs.append(np.tile(np.arange(n_outputs), current.size))
+        values.append(delta.ravel())
+        current = parent
+
+    if not rows:
+        empty = np.zeros(0, dtype=np.intp)
+        return empty, empty, empty, np.zeros(0)
+    return np.concatenate(rows), np.concatenate(features), np.concatenate(outputs), np.concatenate(values)
+
+class TreeExplainer:
+    """
+    Tree-path contributions for a fitted RandomForestClassifier or GradientBoostingClassifier
+
+    The leaf table has one row per node of every tree (only leaf rows are
+    filled) and n_features * n_classes columns; a report's contributions are
+    the sum of its leaves' rows.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.n_features = model.n_features_in_
+        self.n_classes = len(model.classes_)
+
+        if hasattr(model, 'learning_rate'):
+            # Gradient boosting: estimators_[stage, k] adds learning_rate * value to class k's raw score
+            self.space = 'raw'
+            self.output = model.decision_function
+            trees = []
+            for stage in model.estimators_:
+                for k, estimator in enumerate(stage):
+                    # Binary boosting has one tree per stage, scoring the positive class
+                    trees.append((estimator, k if len(stage) > 1 else 1, model.learning_rate))
+        else:
+            # Random forest: class probabilities averaged over the trees
+            self.space = 'probability'
+            self.output = model.predict_proba
+            trees = [(estimator, None, 1.0 / len(model.estimators_)) for estimator in model.estimators_]
+
+        self.offsets = np.zeros(len(trees), dtype=np.intp)
+        rows, cols, values = [], [], []
+        offset = 0
+        for i, (estimator, class_index, scale) in enumerate(trees):
+            tree = estimator.tree_
+            # (node_count, n_classes) for classification trees, (node_count, 1) for boosting's regression trees
+            leaf, feature, output, contribution = leaf_path_entries(tree, tree.value[:, 0, :])
+            if class_index is not None:
+                output = np.full_like(output, class_index)
+
+            self.offsets[i] = offset
+            rows.append(leaf + offset)
+            cols.append(feature * self.n_classes + output)
+            values.append(contribution * scale)
+            offset += tree.node_count
+
+        self.leaf_table = sparse.csr_matrix(
+            (np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))),
+            shape=(offset, self.n_features * self.n_classes)
+        )
+
+    def leaves(self, features):
+        """Global row of the leaf each report reaches in every tree: (n_reports, n_trees)"""
+        leaves = self.model.apply(features)
+        return leaves.reshape(leaves.shape[0], -1) + self.offsets
+
+    def contributions(self, features):
+        """
+        Explain a batch of reports in one call
+
+        Args:
+            features: Feature matrix (n_reports, n_features), sparse or dense
+
+        Returns:
+            Tuple of (bias (n_reports, n_classes), contributions (n_reports, n_features, n_classes)),
+            with bias + contributions.sum(axis=1) equal to the model output
+        """
+        leaves = self.leaves(features)
+        n_reports, n_trees = leaves.shape
+        indicator = sparse.csr_matrix(
+            (np.ones(leaves.size), leaves.ravel(), np.arange(0, leaves.size + 1, n_trees)),
+            shape=(n_reports, self.leaf_table.shape[0])
+        )
+        contributions = np.asarray((indicator @ self.leaf_table).todense()).reshape(n_reports, self.n_features, self.n_classes)
+
+        output = np.asarray(self.output(features), dtype=float).reshape(n_reports, -1)
+        if output.shape[1] == 1:
+            # Binary decision_function scores the positive class only
+            output = np.hstack([np.zeros_like(output), output])
+        bias = output - contributions.sum(axis=1)
+        return bias, contributions
+
+class LinearExplainer:
+    """Exact contributions of a linear model: coefficient times feature value, per class, in raw score space"""
+
+    space = 'raw'
+
+    def __init__(self, model):
+        self.model = model
+        self.n_features = model.n_features_in_
+        self.n_classes = len(model.classes_)
+        coef = np.asarray(model.coef_)
+        intercept = np.asarray(model.intercept_)
+        if coef.shape[0] == 1:
+            # Binary models score the positive class only
+            coef = np.vstack([np.zeros_like(coef), coef])
+            intercept = np.concatenate([[0.0], intercept])
+        self.coef = coef
+        self.intercept = intercept
+
+    def contributions(self, features):
+        n_reports = features.shape[0]
+        if sparse.issparse(features):
+            values = features.toarray()
+        else:
+            values = np.asarray(features, dtype=float)
+        contributions = values[:, :, None] * self.coef.T[None, :, :]
+        bias = np.tile(self.intercept, (n_reports, 1))
+        return bias, contributions
+
+def make_explainer(model):
+    """TreeExplainer or LinearExplainer for a fitted model, or None when it cannot be explained"""
+    if hasattr(model, 'estimators_') and hasattr(model, 'apply'):
+        return TreeExplainer(model)
+    if hasattr(model, 'coef_'):
+        return LinearExplainer(model)
+    return None
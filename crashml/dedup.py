@@ -0,0 +1,378 @@
+"""
+Near-duplicate report detection with MinHash and LSH banding
+
+    python -m crashml dedup "Data PreProcessing" --output clusters.jsonl --canonical deduplicated.csv
+
+The same report often appears more than once: in overlapping extractions
+(extracted_pdf_data_2019 and _22019), in the combined_accident_data files,
+and as redacted re-uploads from the same operator. Such copies rarely match
+byte for byte, so every record is reduced to a set of shingles (word n-grams
+of the narrative plus field=value tokens for key form fields) and compared by
+Jaccard similarity.
+
+Comparing every pair is quadratic. A MinHash signature of num_perm values
+estimates the Jaccard similarity of two records from the fraction of equal
+values. The signature is cut into bands of rows values each, and records that
+agree on a whole band land in the same LSH bucket. Only pairs sharing a bucket
+are compared, so the work grows with the number of records plus the number of
+near-duplicates.
+
+Older extractions can lack the narrative altogether, and then no text
+similarity links them to a later re-extraction of the same PDF. Records are
+therefore also bucketed on an exact key: the source PDF name when the data
+has one, else accident date, time, make and model. Records sharing a key are
+duplicates whatever their narratives.
+
+Records linked by either kind of match form a cluster, and each cluster
+keeps one canonical record: the most complete one.
+"""
+import os
+import re
+import json
+import zlib
+import logging
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+
+# Narrative column of processed data; raw extracts fall back to the first address_2 cell over 50 characters
+TEXT_COLUMN = 'description'
+
+# Form fields fingerprinted next to the narrative, by their processed and raw (load_extracted_csv) names
+KEY_FIELDS = {
+    'date': ['date', 'date_of_accident'],
+    'time': ['time', 'time_of_accident'],
+    'make': ['vehicle_1_make', 'make'],
+    'model': ['vehicle_1_model', 'model'],
+    'location': ['location'],
+}
+
+# Columns naming the report PDF a row was extracted from
+SOURCE_FIELDS = ['source_file', 'source_filename']
+
+# Key fields that together identify a report when the source PDF is unknown
+FINGERPRINT_FIELDS = ['date', 'time', 'make', 'model']
+
+DEFAULT_NUM_PERM = 128
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_SHINGLE_SIZE = 3
+
+# Universal hashing (a * x + b) mod p over 32-bit shingle hashes, as in datasketch
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Shingle hashes permuted per chunk, bounding memory at num_perm x chunk values
+SIGNATURE_CHUNK = 1 << 16
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+def normalize_column_name(column):
+    return str(column).strip().lower().replace(' ', '_').replace('.', '_')
+
+def resolve_fields(columns):
+    """KEY_FIELDS name -> the first matching column in columns (compared case- and separator-insensitively)"""
+    normalized = {normalize_column_name(column): column for column in columns}
+    return {field: next((normalized[name] for name in names if name in normalized), None) for field, names in KEY_FIELDS.items()}
+
+def normalize_value(value):
+    """Lowercase words of a field value, numbers without leading zeros ('04/10/2019' == '4/10/2019'); '' when empty"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ''
+    tokens = TOKEN_PATTERN.findall(str(value).lower())
+    return ' '.join(str(int(token)) if token.isdigit() else token for token in tokens)
+
+def narratives(df):
+    """Narrative of every row: the description column, else the first address_2 cell over 50 characters (as pre_process reads raw extracts)"""
+    columns = {normalize_column_name(column): column for column in df.columns}
+    if TEXT_COLUMN in columns:
+        return df[columns[TEXT_COLUMN]].fillna('').astype(str)
+
+    narrative = pd.Series('', index=df.index, dtype=object)
+    for name, column in columns.items():
+        if 'address_2' not in name:
+            continue
+        text = df[column].fillna('').astype(str)
+        use = (text.str.len() > 50) & (narrative == '')
+        narrative[use] = text[use]
+    return narrative
+
+def key_fingerprints(df):
+    """Exact identity of every row: source PDF name, else date|time|make|model when all are filled, else None"""
+    columns = {normalize_column_name(column): column for column in df.columns}
+    fields = resolve_fields(df.columns)
+
+    # Extractions name the source column differently, so a merged frame can have both
+    sources = pd.Series(np.nan, index=df.index, dtype=object)
+    for name in SOURCE_FIELDS:
+        if name in columns:
+            sources = sources.where(sources.notna(), df[columns[name]])
+
+    fingerprints = []
+    for i in range(len(df)):
+        source = sources.iat[i]
+        if isinstance(source, str) and source.strip():
+            # Paths differ between extraction runs; the file name does not
+            fingerprints.append('source=' + re.split(r'[\\/]', source.strip())[-1].lower())
+            continue
+        values = [normalize_value(df[fields[field]].iat[i]) if fields[field] is not None else '' for field in FINGERPRINT_FIELDS]
+        fingerprints.append('fields=' + '|'.join(values) if all(values) else None)
+    return fingerprints
+
+def record_shingles(narrative, fields, k=DEFAULT_SHINGLE_SIZE):
+    """
+    Shingle set of one record
+
+    Args:
+        narrative: Free text of the report
+        fields: {field name: value} of key form fields; empty values are skipped
+        k: Words per narrative shingle
+
+    Returns:
+        Set of shingle strings
+    """
+    tokens = TOKEN_PATTERN.findall(narrative.lower())
+    if len(tokens) < k:
+        shingles = {' '.join(tokens)} if tokens else set()
+    else:
+        shingles = {' '.join(tokens[i:i + k]) for i in range(len(tokens) - k + 1)}
+
+    for field, value in fields.items():
+        value = normalize_value(value)
+        if value:
+            shingles.add(f"{field}={value}")
+    return shingles
+
+def frame_shingles(df, k=DEFAULT_SHINGLE_SIZE):
+    """record_shingles for every row of a processed or raw crash data frame"""
+    fields = resolve_fields(df.columns)
+    texts = narratives(df)
+    values = {field: df[column].tolist() for field, column in fields.items() if column is not None}
+    return [
+        record_shingles(text, {field: column_values[i] for field, column_values in values.items()}, k)
+        for i, text in enumerate(texts)
+    ]
+
+def permutations(num_perm, seed):
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+    b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+    return a, b
+
+def minhash_signatures(shingle_sets, num_perm=DEFAULT_NUM_PERM, seed=1):
+    """
+    MinHash signature of every shingle set
+
+    All shingles are hashed into one array and permuted a chunk at a time;
+    np.minimum.reduceat takes each record's minimum per permutation without a
+    Python loop over records.
+
+    Returns:
+        Array (n_records, num_perm) of uint64; rows of empty sets are all MAX_HASH
+    """
+    a, b = permutations(num_perm, seed)
+    lengths = np.array([len(shingles) for shingles in shingle_sets], dtype=np.intp)
+    signatures = np.full((len(shingle_sets), num_perm), MAX_HASH, dtype=np.uint64)
+    if not lengths.sum():
+        return signatures
+
+    hashes = np.fromiter(
+        (zlib.crc32(shingle.encode('utf-8')) for shingles in shingle_sets for shingle in shingles),
+        dtype=np.uint64, count=int(lengths.sum())
+    )
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+
+    # Records are grouped so each chunk holds whole records
+    start = 0
+    while start < len(shingle_sets):
+        stop = start + 1
+        while stop < len(shingle_sets) and offsets[stop + 1] - offsets[start] <= SIGNATURE_CHUNK:
+            stop += 1
+
+        records = np.arange(start, stop)
+        records = records[lengths[records] > 0]
+        if records.size:
+            chunk = hashes[offsets[start]:offsets[stop]]
+            permuted = ((a[:, None] * chunk[None, :] + b[:, None]) % MERSENNE_PRIME) & MAX_HASH
+            signatures[records] = np.minimum.reduceat(permuted, offsets[records] - offsets[start], axis=1).T
+        start = stop
+    return signatures
+
+def lsh_parameters(num_perm, threshold):
+    """(bands, rows) with bands * rows <= num_perm whose S-curve midpoint (1/bands)^(1/rows) is closest to threshold"""
+    candidates = [(bands, num_perm // bands) for bands in range(1, num_perm + 1)]
+    return min(candidates, key=lambda params: abs((1.0 / params[0]) ** (1.0 / params[1]) - threshold))
+
+def candidate_pairs(signatures, bands, rows, skip=None):
+    """
+    Pairs of records that share at least one LSH bucket
+
+    Args:
+        signatures: Output of minhash_signatures
+        bands, rows: Banding of the signature
+        skip: Boolean mask of records to leave out (e.g. empty ones)
+
+    Returns:
+        Set of (i, j) index pairs with i < j
+    """
+    keep = np.flatnonzero(~skip) if skip is not None else np.arange(len(signatures))
+    pairs = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        band_values = np.ascontiguousarray(signatures[keep, band * rows:(band + 1) * rows])
+        for i, key in zip(keep, band_values):
+            buckets[key.tobytes()].append(i)
+        for members in buckets.values():
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    pairs.add((members[x], members[y]))
+    return pairs
+
+def union_find_clusters(n, pairs):
+    """Connected components of n records linked by pairs, as lists of indices"""
+    parent = list(range(n))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in pairs:
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    components = defaultdict(list)
+    for i in range(n):
+        components[find(i)].append(i)
+    return list(components.values())
+
+def completeness(df):
+    """How complete each row is: having a narrative first, then filled cells, then narrative length"""
+    filled = df.notna() & (df.astype(str).apply(lambda column: column.str.strip()) != '')
+    lengths = narratives(df).str.len().to_numpy()
+    return list(zip(lengths > 0, filled.sum(axis=1).to_numpy(), lengths))
+
+def find_duplicates(df, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM, k=DEFAULT_SHINGLE_SIZE, seed=1):
+    """
+    Clusters of near-duplicate rows
+
+    Args:
+        df: Crash data rows, processed or raw extracted
+        threshold: Minimum estimated Jaccard similarity for two rows to be duplicates
+        num_perm: MinHash signature length (more is more accurate and slower)
+        k: Words per narrative shingle
+        seed: Seed of the MinHash permutations
+
+    Returns:
+        List of clusters with more than one row, largest first. Each is a dict
+        with 'rows' (positions in df), 'canonical' (position of the row kept),
+        'matched_on' ('narrative' and/or 'key') and 'min_similarity' (lowest
+        estimated Jaccard similarity of the pairs that linked it).
+    """
+    shingles = frame_shingles(df, k)
+    signatures = minhash_signatures(shingles, num_perm, seed)
+    bands, rows = lsh_parameters(num_perm, threshold)
+    empty = np.array([not s for s in shingles], dtype=bool)
+
+    # LSH only proposes candidates; the full signature confirms them
+    links = {}
+    for i, j in candidate_pairs(signatures, bands, rows, skip=empty):
+        if np.mean(signatures[i] == signatures[j]) >= threshold:
+            links[(i, j)] = 'narrative'
+
+    # One more band: the exact key, taken as is
+    by_key = defaultdict(list)
+    for i, fingerprint in enumerate(key_fingerprints(df)):
+        if fingerprint is not None:
+            by_key[fingerprint].append(i)
+    for members in by_key.values():
+        for x in range(len(members)):
+            for y in range(x + 1, len(members)):
+                links.setdefault((members[x], members[y]), 'key')
+
+    components = [members for members in union_find_clusters(len(df), links) if len(members) > 1]
+    component_of = {i: c for c, members in enumerate(components) for i in members}
+    min_similarity = [1.0] * len(components)
+    matched_on = [set() for _ in components]
+    for (i, j), kind in links.items():
+        c = component_of[i]
+        min_similarity[c] = min(min_similarity[c], float(np.mean(signatures[i] == signatures[j])))
+        matched_on[c].add(kind)
+
+    scores = completeness(df)
+    clusters = []
+    for c, members in enumerate(components):
+        # Most complete row wins; ties go to the first one seen
+        canonical = max(members, key=lambda i: (scores[i], -i))
+        clusters.append({'rows': sorted(members), 'canonical': canonical, 'matched_on': sorted(matched_on[c]), 'min_similarity': min_similarity[c]})
+
+    clusters.sort(key=lambda cluster: (-len(cluster['rows']), cluster['rows'][0]))
+    return clusters
+
+def deduplicate(df, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM, k=DEFAULT_SHINGLE_SIZE, seed=1):
+    """
+    Keep one row per cluster of near-duplicates
+
+    Returns:
+        Tuple of (df without the non-canonical duplicates, in original order,
+        clusters from find_duplicates)
+    """
+    clusters = find_duplicates(df, threshold, num_perm, k, seed)
+    dropped = {i for cluster in clusters for i in cluster['rows'] if i != cluster['canonical']}
+    keep = np.array([i not in dropped for i in range(len(df))], dtype=bool)
+    return df[keep], clusters
+
+def load_frames(inputs):
+    """Rows of every CSV in inputs (files, or directories searched for *.csv) with source_path and source_row columns"""
+    paths = []
+    for path in inputs:
+        if os.path.isdir(path):
+            paths.extend(sorted(os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith('.csv')))
+        else:
+            paths.append(path)
+
+    frames = []
+    for path in paths:
+        df = pd.read_csv(path, dtype=str)
+        df = df.loc[:, ~df.columns.str.startswith('Unnamed')]
+        df['source_path'] = path
+        df['source_row'] = np.arange(len(df))
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def add_dedup_arguments(parser):
+    parser.add_argument('inputs', nargs='+', help="Crash data CSV files, or directories of them")
+    parser.add_argument('--output', required=True, help="JSON Lines file with one cluster per line")
+    parser.add_argument('--canonical', default=None, help="Also write the deduplicated rows to this CSV")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help=f"Minimum estimated Jaccard similarity (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument('--num-perm', type=int, default=DEFAULT_NUM_PERM, help=f"MinHash signature length (default: {DEFAULT_NUM_PERM})")
+    parser.add_argument('--shingle-size', type=int, default=DEFAULT_SHINGLE_SIZE, help=f"Words per narrative shingle (default: {DEFAULT_SHINGLE_SIZE})")
+
+def dedup_command(args):
+    """Entry point of `python -m crashml dedup`"""
+    df = load_frames(args.inputs)
+    if df.empty:
+        logging.error(f"No CSV rows found in {', '.join(args.inputs)}")
+        return 1
+
+    # Source columns would otherwise count as report text
+    records = df.drop(columns=['source_path', 'source_row'])
+    kept, clusters = deduplicate(records, args.threshold, args.num_perm, args.shingle_size)
+    deduplicated = df.loc[kept.index]
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        for cluster in clusters:
+            f.write(json.dumps({
+                'canonical': {'path': df['source_path'].iat[cluster['canonical']], 'row': int(df['source_row'].iat[cluster['canonical']])},
+                'members': [{'path': df['source_path'].iat[i], 'row': int(df['source_row'].iat[i])} for i in cluster['rows']],
+                'matched_on': cluster['matched_on'],
+                'min_similarity': cluster['min_similarity'],
+            }) + '\n')
+
+    if args.canonical:
+        deduplicated.to_csv(args.canonical, index=False)
+
+    duplicates = len(df) - len(deduplicated)
+    logging.info(f"{len(df)} rows, {len(clusters)} duplicate clusters, {duplicates} duplicates dropped; clusters in {args.output}")
+    return 0
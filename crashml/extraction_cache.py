@@ -0,0 +1,146 @@
+import os
+import json
+import uuid
+import hashlib
+import threading
+
+# Bump whenever the extraction code changes what it returns for the same PDF,
+# so stale cache entries are never served
+EXTRACTOR_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'CRASHML_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'crashml', 'extraction')
+)
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512MB
+
+def content_digest(content):
+    """sha256 hex digest of the raw PDF, given as bytes or a seekable binary file"""
+    if isinstance(content, (bytes, bytearray)):
+        return hashlib.sha256(content).hexdigest()
+
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in iter(lambda: content.read(1024 * 1024), b''):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+class ExtractionCache:
+    """
+    Persistent on-disk cache of PDF extraction results keyed by content hash
+
+    Each entry is a small JSON file named after the PDF's sha256, the kind of
+    result ('text', 'form_fields', ...) and the extractor version. Reads touch
+    the entry's mtime, and once the cache grows past max_bytes the least
+    recently used entries are evicted. Writes are atomic renames, so several
+    processes can share one cache directory.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, version=EXTRACTOR_VERSION):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = version
+        self.lock = threading.Lock()
+        self.total_bytes = None  # computed lazily on the first write
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, digest, kind):
+        return os.path.join(self.directory, digest[:2], f"{digest}-{kind}-v{self.version}.json")
+
+    def get(self, digest, kind):
+        """Return the cached value or None"""
+        path = self.path(digest, kind)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return value
+
+    def put(self, digest, kind, value):
+        """Store a JSON-serializable value (PyPDF2 objects are stored as strings)"""
+        path = self.path(digest, kind)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(value, f, default=str)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write extraction cache entry: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = self._scan_size()
+            else:
+                self.total_bytes += size
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def get_or_compute(self, digest, kind, compute, *args):
+        """Return the cached value, or compute it and cache non-empty results"""
+        value = self.get(digest, kind)
+        if value is None:
+            value = compute(*args)
+            if value:
+                self.put(digest, kind, value)
+        return value
+
+    def clear(self):
+        for path, _, _ in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self.lock:
+            self.total_bytes = 0
+
+    def _entries(self):
+        """(path, size, mtime) for every entry on disk"""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for shard in os.listdir(self.directory):
+            shard_dir = os.path.join(self.directory, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(shard_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """Remove least recently used entries until the cache is back under 90% of max_bytes"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # already evicted by another process
+            total -= size
+
+        self.total_bytes = total
@@ -0,0 +1,50 @@
+"""
+Checkbox codes of the processed crash data and the form labels they stand for
+
+The processed CSVs keep the DMV form's checkbox names: weather_c_1 is box C
+of the weather section for vehicle 1 (the AV). The labels are what the form
+prints next to each box.
+"""
+import re
+
+WEATHER_LABELS = {
+    'weather_a_1': 'Clear',
+    'weather_b_1': 'Cloudy',
+    'weather_c_1': 'Raining',
+    'weather_d_1': 'Snowing',
+    'weather_e_1': 'Fog/Visibility',
+    'weather_f_1': 'Other',
+    'weather_g_1': 'Wind',
+}
+LIGHTING_LABELS = {
+    'lighting_a_1': 'Daylight',
+    'lighting_b_1': 'Dusk-Dawn',
+    'lighting_c_1': 'Dark-Street Lights',
+    'lighting_d_1': 'Dark-No Street Lights',
+    'lighting_e_1': 'Dark-Street Lights Not Functioning',
+}
+ROAD_LABELS = {
+    'road_conditions_a_1': 'Holes, Deep Rut',
+    'road_conditions_b_1': 'Loose Material on Roadway',
+    'road_conditions_c_1': 'Obstruction on Roadway',
+    'road_conditions_d_1': 'Construction-Repair Zone',
+    'road_conditions_e_1': 'Reduced Roadway Width',
+    'road_conditions_f_1': 'Flooded',
+    'road_conditions_g_1': 'Other',
+    'road_conditions_h_1': 'No Unusual Conditions',
+}
+ROADWAY_SURFACE_LABELS = {
+    'roadway_a_1': 'Dry',
+    'roadway_b_1': 'Wet',
+    'roadway_c_1': 'Snowy-Icy',
+    'roadway_d_1': 'Slippery (Muddy, Oily, etc.)',
+}
+
+def codes_matching(labels, phrases):
+    """Codes whose label contains one of phrases (compared in lowercase)"""
+    return [code for code, label in labels.items() if any(phrase in label.lower() for phrase in phrases)]
+
+def has_code(values, codes):
+    """1 where a comma-separated checkbox list holds one of codes, 0 elsewhere"""
+    pattern = r'\b(?:' + '|'.join(re.escape(code) for code in codes) + r')\b'
+    return values.astype('string').str.contains(pattern, regex=True).fillna(False).astype(int)
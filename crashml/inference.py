@@ -0,0 +1,168 @@
+"""
+Fault prediction and explanations over a ModelBundle
+"""
+import numpy as np
+from .metrics import METRICS
+from .prediction_cache import feature_row_keys
+
+FAULT_LABELS = {0: "Not at Fault", 1: "Partially at Fault", 2: "Fully at Fault"}
+
+def build_feature_matrix(data_points, bundle):
+    """Build one feature matrix (n_reports x n_features) for a list of parsed reports"""
+    structured_rows = [[data_point[name] for name in bundle.structured_features] for data_point in data_points]
+    descriptions = [data_point['description'] for data_point in data_points]
+    return bundle.feature_matrix(structured_rows, descriptions)
+
+def predict_fault_batch(data_points, bundle, features=None, cache=None):
+    """
+    Make predictions for many parsed reports, calling each model once per batch
+
+    Args:
+        data_points: Parsed reports from parse_dmv_report
+        bundle: ModelBundle to predict with
+        features: Feature matrix of data_points, when the caller already built it
+        cache: PredictionCache; reports whose feature vector is cached skip the models
+
+    Returns:
+        Tuple of (predictions, probabilities), one dict per report keyed by model name.
+        Predictions hold 'prediction', 'label' and 'confidence'; probabilities are
+        lists in the order of the model's classes.
+    """
+    if features is None:
+        with METRICS.span('features'):
+            features = build_feature_matrix(data_points, bundle)
+
+    predictions = [None] * len(data_points)
+    probabilities = [None] * len(data_points)
+
+    if cache is not None:
+        keys = feature_row_keys(features)
+        for i, cached in enumerate(cache.get_many(bundle.version, keys)):
+            if cached is not None:
+                # Copies, so callers can change their results without touching the cache
+                predictions[i] = {model_name: dict(prediction) for model_name, prediction in cached[0].items()}
+                probabilities[i] = {model_name: list(probability) for model_name, probability in cached[1].items()}
+
+    missing = [i for i, prediction in enumerate(predictions) if prediction is None]
+    if not missing:
+        return predictions, probabilities
+    if len(missing) < len(data_points):
+        features = features[missing]
+
+    for i in missing:
+        predictions[i] = {}
+        probabilities[i] = {}
+
+    for model_name, model, model_input in bundle.model_inputs(features):
+        # Labels come from the probabilities, so each model only runs once
+        with METRICS.span('predict', model=model_name):
+            prob = model.predict_proba(model_input)
+        best = prob.argmax(axis=1)
+        pred = model.classes_[best]
+
+        for row, i in enumerate(missing):
+            predictions[i][model_name] = {
+                'prediction': int(pred[row]),
+                'label': FAULT_LABELS[int(pred[row])],
+                'confidence': float(prob[row, best[row]])
+            }
+            probabilities[i][model_name] = prob[row].tolist()
+
+    if cache is not None:
+        cache.put_many(bundle.version, [
+            (keys[i], ({model_name: dict(prediction) for model_name, prediction in predictions[i].items()},
+                       {model_name: list(probability) for model_name, probability in probabilities[i].items()}))
+            for i in missing
+        ])
+
+    return predictions, probabilities
+
+def predict_fault(data_point, bundle, features=None, cache=None):
+    """Make prediction for one parsed report (see predict_fault_batch)"""
+    predictions, probabilities = predict_fault_batch([data_point], bundle, features=features, cache=cache)
+    return predictions[0], probabilities[0]
+
+def explain_batch(features, bundle, model_name='Gradient Boosting', top_n=5):
+    """
+    Strongest factors behind each report's prediction, for a whole batch in one attribution call
+
+    Args:
+        features: Feature matrix of the reports (from build_feature_matrix)
+        bundle: ModelBundle the features were built for
+        model_name: Model to explain
+        top_n: Factors to return per report
+
+    Returns:
+        One list per report of (feature_name, feature_value, contribution, predicted_class),
+        contributions toward the model's predicted class, largest magnitude
+        first; None if the model cannot be explained
+    """
+    explainer = bundle.explainer(model_name)
+    if explainer is None:
+        return None
+
+    bias, contributions = explainer.contributions(features)
+    predicted = (bias + contributions.sum(axis=1)).argmax(axis=1)
+    classes = bundle.models[model_name].classes_
+
+    explained = []
+    for i, class_index in enumerate(predicted):
+        toward_prediction = contributions[i, :, class_index]
+        top_features = np.argsort(-np.abs(toward_prediction))[:top_n]
+        explained.append([
+            (bundle.feature_names[idx], float(features[i, idx]), float(toward_prediction[idx]), int(classes[class_index]))
+            for idx in top_features if toward_prediction[idx] != 0
+        ])
+    return explained
+
+def explain_prediction(data_point, bundle=None, features=None, model_name='Gradient Boosting', top_n=5):
+    """
+    Provide explanation for the prediction
+
+    Rule-based explanations come from the parsed features alone. Given the
+    bundle and the report's feature row, the top_n globally most important
+    features of model_name are listed with the report's value for each,
+    followed by the features that moved this report's prediction the most.
+    """
+    explanations = []
+
+    if data_point['vehicle_1_moving'] == 0:
+        explanations.append("✓ Vehicle was stationary (typically not at fault)")
+
+    if data_point['impact_rear'] == 1:
+        explanations.append("✓ Rear impact detected (typically other vehicle at fault)")
+
+    if data_point['autonomous_mode'] == 1:
+        explanations.append("⚠ Vehicle was in autonomous mode")
+
+    if data_point['weather_issue'] == 1:
+        explanations.append("⚠ Adverse weather conditions present")
+
+    if data_point['road_issue'] == 1:
+        explanations.append("⚠ Adverse road conditions present")
+
+    if data_point['dark_condition'] == 1:
+        explanations.append("⚠ Dark/poor lighting conditions")
+
+    if bundle is None or features is None:
+        return explanations
+
+    # Feature importance from best model, ranked when the bundle was loaded
+    if model_name in bundle.importance_ranking:
+        importances = bundle.importances[model_name]
+
+        explanations.append("\n**Top Contributing Factors:**")
+        for i, feature_idx in enumerate(bundle.importance_ranking[model_name][:top_n]):
+            feature_name = bundle.feature_names[feature_idx]
+            importance = importances[feature_idx]
+            feature_value = features[0, feature_idx]
+            explanations.append(f"{i+1}. {feature_name}: {feature_value:.3f} (importance: {importance:.3f})")
+
+    # What moved this particular prediction
+    explained = explain_batch(features[:1], bundle, model_name=model_name, top_n=top_n)
+    if explained:
+        explanations.append("\n**Factors Behind This Prediction:**")
+        for i, (feature_name, feature_value, contribution, label) in enumerate(explained[0]):
+            explanations.append(f"{i+1}. {feature_name}: {feature_value:.3f} ({contribution:+.3f} toward {FAULT_LABELS.get(label, label)})")
+
+    return explanations
@@ -0,0 +1,116 @@
+import time
+import uuid
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+class JobQueue:
+    """
+    Runs report analysis on a local process pool and keeps results for polling
+
+    Requests only submit work and return a job id, so parsing and prediction
+    never run on a web request thread. The pool is started on first use, after
+    the models are loaded, so forked workers share the parent's model pages.
+    on_result, if given, turns a worker's return value into the job result in
+    this process; when it raises, the job fails with its error. Finished jobs
+    are forgotten after result_ttl seconds.
+
+    A worker that dies (segfault, OOM kill) breaks the whole pool: its queued
+    and running jobs fail with BrokenProcessPool, and the next submit starts
+    a fresh pool instead of failing too.
+    """
+
+    def __init__(self, workers=None, initializer=None, result_ttl=3600, on_result=None):
+        self.workers = workers
+        self.initializer = initializer
+        self.result_ttl = result_ttl
+        self.on_result = on_result
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **info):
+        """Queue fn(*args) and return its job id; info is reported back with the job"""
+        with self._lock:
+            self._prune()
+            job_id = uuid.uuid4().hex
+            try:
+                future = self._pool().submit(fn, *args)
+            except BrokenProcessPool:
+                self._replace_pool()
+                future = self._pool().submit(fn, *args)
+            self._jobs[job_id] = {'info': info, 'submitted': time.time(), 'finished': None, 'future': future}
+
+        future.add_done_callback(lambda done: self._finish(job_id, done))
+        return job_id
+
+    def get(self, job_id):
+        """Status of a job as a JSON-ready dict, or None for unknown (or expired) jobs"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+
+        future = job['future']
+        status = {'job_id': job_id, **job['info'], 'submitted': job['submitted'], 'finished': job['finished']}
+
+        if not future.done():
+            status['status'] = 'running' if future.running() else 'queued'
+        elif future.cancelled():
+            status['status'] = 'failed'
+            status['error'] = 'Job was cancelled'
+        elif isinstance(future.exception(), BrokenProcessPool):
+            status['status'] = 'failed'
+            status['error'] = 'Worker process crashed while the job was queued or running'
+        elif future.exception() is not None:
+            status['status'] = 'failed'
+            status['error'] = str(future.exception())
+        elif 'error' in job:
+            status['status'] = 'failed'
+            status['error'] = job['error']
+        elif 'result' in job:
+            status['status'] = 'done'
+            status['result'] = job['result']
+        else:
+            # Done, but _finish has not stored the result yet
+            status['status'] = 'running'
+        return status
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=self.initializer)
+        return self._executor
+
+    def _replace_pool(self):
+        # The broken pool's futures have already failed; its surviving workers are stopped
+        broken, self._executor = self._executor, None
+        if broken is not None:
+            broken.shutdown(wait=False, cancel_futures=True)
+
+    def _finish(self, job_id, future):
+        outcome = {}
+        if not future.cancelled() and future.exception() is None:
+            # A failing on_result fails the job; the job is marked finished either way
+            try:
+                result = future.result()
+                outcome['result'] = self.on_result(result) if self.on_result is not None else result
+            except Exception as e:
+                outcome['error'] = f"Could not collect the job result: {e}"
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(outcome)
+                job['finished'] = time.time()
+
+    def _prune(self):
+        cutoff = time.time() - self.result_ttl
+        expired = [job_id for job_id, job in self._jobs.items() if job['finished'] is not None and job['finished'] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
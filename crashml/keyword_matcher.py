@@ -0,0 +1,55 @@
+import re
+
+class KeywordMatcher:
+    """
+    Finds which of many phrases occur in a text with a single scan
+
+    The phrases are compiled once into a trie-shaped regular expression wrapped
+    in a lookahead, so every position of the text is tried against all phrases
+    at once and overlapping matches are not lost. The scan returns the longest
+    phrase starting at each position; every phrase contained in a matched phrase
+    occurs in the text too, and those are added from a table built at compile
+    time. The result is exactly the set of phrases p for which `p in text` holds,
+    but its cost does not grow with the number of phrases.
+    """
+
+    def __init__(self, phrases):
+        self.phrases = list(dict.fromkeys(phrase for phrase in phrases if phrase))
+        self.pattern = re.compile(f"(?=({self._trie_pattern(self.phrases)}))", re.DOTALL)
+
+        # Phrases implied by a match: the phrase itself and every phrase inside it
+        self.implied = {
+            phrase: frozenset(other for other in self.phrases if other in phrase)
+            for phrase in self.phrases
+        }
+
+    def find(self, text):
+        """Return the set of phrases that occur in text"""
+        longest = set(self.pattern.findall(text))
+        hits = set()
+        for phrase in longest:
+            hits |= self.implied[phrase]
+        return hits
+
+    @classmethod
+    def _trie_pattern(cls, phrases):
+        trie = {}
+        for phrase in phrases:
+            node = trie
+            for char in phrase:
+                node = node.setdefault(char, {})
+            node[''] = True
+        return cls._node_pattern(trie)
+
+    @classmethod
+    def _node_pattern(cls, node):
+        # Each branch starts with a distinct character, so at most one can match
+        branches = [re.escape(char) + cls._node_pattern(child) for char, child in node.items() if char]
+        if not branches:
+            return ''
+
+        pattern = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if '' in node:
+            # A phrase ends here; longer phrases are preferred greedily
+            pattern = f"(?:{pattern})?"
+        return pattern
@@ -0,0 +1,156 @@
+import os
+import time
+import bisect
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+class Span:
+    """Times the enclosed block and records it when the block exits"""
+    __slots__ = ('metrics', 'key', 'start')
+
+    def __init__(self, metrics, key):
+        self.metrics = metrics
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics._observe(self.key, time.perf_counter() - self.start)
+        return False
+
+class NoSpan:
+    """Stand-in for Span when metrics are turned off"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NO_SPAN = NoSpan()
+
+class Metrics:
+    """
+    Per-stage latency histograms and event counters for the inference pipeline
+
+    span(stage) times a block of code; count(event) bumps a counter. Both are a
+    lock and a few additions, and a shared no-op when disabled. render() returns
+    everything in the Prometheus text exposition format.
+    """
+
+    def __init__(self, enabled=True, buckets=DEFAULT_BUCKETS, prefix='crashml'):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.histograms = {}  # (stage, labels) -> [bucket counts..., sum, count]
+        self.counters = {}    # (event, labels) -> count
+
+    def span(self, stage, **labels):
+        if not self.enabled:
+            return NO_SPAN
+        return Span(self, (stage, tuple(sorted(labels.items()))))
+
+    def count(self, event, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = (event, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def _observe(self, key, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                histogram[index] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+
+    def drain(self):
+        """Return everything recorded since the last drain and start over (for merging worker metrics)"""
+        with self.lock:
+            snapshot = {'histograms': self.histograms, 'counters': self.counters}
+            self.histograms = {}
+            self.counters = {}
+        return snapshot
+
+    def merge(self, snapshot):
+        """Add a snapshot from drain(), e.g. one taken in a worker process"""
+        if not self.enabled or not snapshot:
+            return
+        with self.lock:
+            for key, values in snapshot['histograms'].items():
+                histogram = self.histograms.setdefault(key, [0] * len(values))
+                for i, value in enumerate(values):
+                    histogram[i] += value
+            for key, value in snapshot['counters'].items():
+                self.counters[key] = self.counters.get(key, 0) + value
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self.lock:
+            histograms = {key: list(values) for key, values in self.histograms.items()}
+            counters = dict(self.counters)
+
+        lines = [
+            f"# HELP {self.prefix}_stage_seconds Time spent in each pipeline stage",
+            f"# TYPE {self.prefix}_stage_seconds histogram",
+        ]
+        for (stage, labels), values in sorted(histograms.items()):
+            label_text = format_labels((('stage', stage),) + labels)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, values):
+                cumulative += bucket_count
+                lines.append(f"{self.prefix}_stage_seconds_bucket{format_labels((('stage', stage),) + labels + (('le', repr(bound)),))} {cumulative}")
+            lines.append(f"{self.prefix}_stage_seconds_bucket{format_labels((('stage', stage),) + labels + (('le', '+Inf'),))} {values[-1]}")
+            lines.append(f"{self.prefix}_stage_seconds_sum{label_text} {values[-2]!r}")
+            lines.append(f"{self.prefix}_stage_seconds_count{label_text} {values[-1]}")
+
+        lines.append(f"# HELP {self.prefix}_events_total Pipeline events such as cache hits and parse failures")
+        lines.append(f"# TYPE {self.prefix}_events_total counter")
+        for (event, labels), value in sorted(counters.items()):
+            lines.append(f"{self.prefix}_events_total{format_labels((('event', event),) + labels)} {value}")
+
+        return '\n'.join(lines) + '\n'
+
+def escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(labels):
+    return '{' + ','.join(f'{name}="{escape_label_value(value)}"' for name, value in labels) + '}'
+
+def serve_metrics(metrics, port, host='0.0.0.0'):
+    """Serve GET /metrics from a daemon thread (for apps without their own HTTP routes)"""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# Shared by the UIs and the extraction layer; CRASHML_METRICS=0 turns it off
+METRICS = Metrics(enabled=os.environ.get('CRASHML_METRICS', '1') != '0')
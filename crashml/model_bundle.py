@@ -0,0 +1,215 @@
+import os
+import pickle
+import argparse
+import hashlib
+import numpy as np
+from scipy import sparse
+import joblib
+import sklearn
+
+# One versioned file holding everything inference needs
+BUNDLE_FILENAME = 'crashml_bundle.joblib'
+BUNDLE_FORMAT_VERSION = 1
+
+# The trained model files live next to the UIs
+DEFAULT_MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'CrashML-UI')
+
+# Files the bundle is built from (the training notebook still writes these)
+LEGACY_FILES = {
+    'models': 'crashml_models.pkl',
+    'vectorizer': 'tfidf_vectorizer.pkl',
+    'feature_names': 'feature_names.pkl',
+    'metadata': 'model_metadata.pkl',
+}
+
+class ModelBundle:
+    """
+    Models, TF-IDF vectorizer and feature layout, validated once at load time
+
+    The feature vector is laid out as [structured features | TF-IDF terms |
+    engineered features]. The column range of each block is resolved here, so
+    callers write values straight into place instead of padding per request.
+    """
+
+    def __init__(self, models, vectorizer, feature_names, metadata, version):
+        self.models = models
+        self.vectorizer = vectorizer
+        self.feature_names = list(feature_names)
+        self.metadata = metadata
+        self.version = version
+
+        self.structured_features = list(metadata.get('structured_features', []))
+        self.num_features = len(self.feature_names)
+        self.text_start = len(self.structured_features)
+        self.text_stop = self.text_start + len(vectorizer.vocabulary_)
+
+        self.validate()
+
+        # Models that take the sparse feature matrix as is; the rest get a dense copy
+        self.sparse_models = {model_name: accepts_sparse(model) for model_name, model in models.items()}
+
+        # Global importances never change for a loaded model, so they are ranked once here
+        self.importances = {model_name: np.asarray(model.feature_importances_) for model_name, model in models.items() if hasattr(model, 'feature_importances_')}
+        self.importance_ranking = {model_name: np.argsort(importances)[::-1] for model_name, importances in self.importances.items()}
+        self.explainers = {}
+
+    def validate(self):
+        """Check that models, vectorizer and feature layout agree; raises ValueError otherwise"""
+        if self.feature_names[:self.text_start] != self.structured_features:
+            raise ValueError("Structured features do not lead the feature layout")
+
+        if self.text_stop > self.num_features:
+            raise ValueError(f"Vectorizer has {self.text_stop - self.text_start} terms but the layout only has {self.num_features - self.text_start} columns after the structured features")
+
+        terms = list(self.vectorizer.get_feature_names_out())
+        if self.feature_names[self.text_start:self.text_stop] != terms:
+            raise ValueError("TF-IDF terms do not match the feature layout")
+
+        expected = self.metadata.get('num_features', self.num_features)
+        if expected != self.num_features:
+            raise ValueError(f"Metadata expects {expected} features, layout has {self.num_features}")
+
+        for model_name, model in self.models.items():
+            n_features = getattr(model, 'n_features_in_', self.num_features)
+            if n_features != self.num_features:
+                raise ValueError(f"{model_name} expects {n_features} features, layout has {self.num_features}")
+
+    @property
+    def engineered_features(self):
+        """Trailing features the models were trained with; left at zero for uploaded reports"""
+        return self.feature_names[self.text_stop:]
+
+    def explainer(self, model_name):
+        """Per-report attributions for one model (see crashml.attribution), built on first use; None if unsupported"""
+        if model_name not in self.explainers:
+            from .attribution import make_explainer
+            self.explainers[model_name] = make_explainer(self.models[model_name])
+        return self.explainers[model_name]
+
+    def feature_matrix(self, structured_rows, descriptions):
+        """
+        Build the model input for a batch of reports, keeping it sparse
+
+        Args:
+            structured_rows: One list of structured feature values per report
+            descriptions: One narrative per report
+
+        Returns:
+            CSR matrix of shape (n_reports, num_features)
+        """
+        n_reports = len(descriptions)
+        structured = sparse.csr_matrix(np.asarray(structured_rows, dtype=float).reshape(n_reports, self.text_start))
+        text = self.vectorizer.transform(descriptions)
+        engineered = sparse.csr_matrix((n_reports, self.num_features - self.text_stop))
+        return sparse.hstack([structured, text, engineered], format='csr')
+
+    def model_inputs(self, features):
+        """Yield (model_name, model, input) with the matrix densified at most once, for models that need it"""
+        dense = None
+        for model_name, model in self.models.items():
+            if self.sparse_models[model_name] or not sparse.issparse(features):
+                yield model_name, model, features
+            else:
+                if dense is None:
+                    dense = features.toarray()
+                yield model_name, model, dense
+
+def accepts_sparse(model):
+    """Whether a fitted estimator accepts scipy sparse input (scikit-learn estimator tags)"""
+    try:
+        return bool(model.__sklearn_tags__().input_tags.sparse)
+    except AttributeError:
+        return False
+
+def file_digest(paths):
+    """Short content hash of the files the bundle was built from"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+def build_bundle(model_dir=DEFAULT_MODEL_DIR, output_path=None):
+    """
+    Combine the legacy pickles into one bundle file
+
+    Args:
+        model_dir: Directory holding the legacy pickle files
+        output_path: Where to write the bundle (default: BUNDLE_FILENAME in model_dir)
+
+    Returns:
+        Path of the written bundle
+    """
+    paths = {key: os.path.join(model_dir, filename) for key, filename in LEGACY_FILES.items()}
+    parts = {}
+    for key, path in paths.items():
+        if key == 'metadata' and not os.path.exists(path):
+            parts[key] = {}
+            continue
+        with open(path, 'rb') as f:
+            parts[key] = pickle.load(f)
+
+    metadata = dict(parts['metadata'])
+    metadata.setdefault('structured_features', parts['feature_names'][:len(parts['feature_names']) - len(parts['vectorizer'].vocabulary_)])
+    version = f"{BUNDLE_FORMAT_VERSION}-{file_digest([path for path in paths.values() if os.path.exists(path)])}"
+
+    # Fail here rather than at serving time if the pieces do not fit together
+    ModelBundle(parts['models'], parts['vectorizer'], parts['feature_names'], metadata, version)
+
+    output_path = output_path or os.path.join(model_dir, BUNDLE_FILENAME)
+    tmp_path = f"{output_path}.tmp"
+    # Uncompressed, so numpy arrays (tree nodes, coefficients, idf weights) can be memory-mapped
+    joblib.dump({
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'version': version,
+        'sklearn_version': sklearn.__version__,
+        'models': parts['models'],
+        'vectorizer': parts['vectorizer'],
+        'feature_names': list(parts['feature_names']),
+        'metadata': metadata,
+    }, tmp_path)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+def load_bundle(path=os.path.join(DEFAULT_MODEL_DIR, BUNDLE_FILENAME), mmap=True):
+    """
+    Load a bundle, memory-mapping its numeric arrays
+
+    Memory-mapped arrays are shared between processes forked from the same
+    server, and pages are only read when a model touches them.
+
+    Raises:
+        FileNotFoundError: if the bundle does not exist
+        ValueError: if the bundle is from another format version or fails validation
+    """
+    data = joblib.load(path, mmap_mode='r' if mmap else None)
+
+    if data.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Bundle format {data.get('format_version')} is not supported (expected {BUNDLE_FORMAT_VERSION})")
+    if data.get('sklearn_version') != sklearn.__version__:
+        print(f"Model bundle was built with scikit-learn {data.get('sklearn_version')}, running {sklearn.__version__}")
+
+    return ModelBundle(data['models'], data['vectorizer'], data['feature_names'], data['metadata'], data['version'])
+
+def load_or_build_bundle(model_dir=DEFAULT_MODEL_DIR, mmap=True):
+    """Load the bundle from model_dir, (re)building it from the legacy pickles when they are newer"""
+    path = os.path.join(model_dir, BUNDLE_FILENAME)
+    legacy_paths = [os.path.join(model_dir, filename) for filename in LEGACY_FILES.values()]
+    legacy_mtime = max((os.path.getmtime(p) for p in legacy_paths if os.path.exists(p)), default=0)
+
+    # Rebuild after retraining replaces the pickles
+    if not os.path.exists(path) or os.path.getmtime(path) < legacy_mtime:
+        print(f"Building {path} from the legacy model files")
+        build_bundle(model_dir, path)
+    return load_bundle(path, mmap=mmap)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the CrashML model bundle from the legacy pickle files")
+    parser.add_argument('--model-dir', default=DEFAULT_MODEL_DIR, help="Directory holding the pickle files (default: CrashML-UI)")
+    parser.add_argument('--output', default=None, help="Bundle path (default: crashml_bundle.joblib in the model directory)")
+    args = parser.parse_args()
+
+    bundle_path = build_bundle(args.model_dir, args.output)
+    bundle = load_bundle(bundle_path)
+    print(f"Wrote {bundle_path} (version {bundle.version}, {bundle.num_features} features, models: {', '.join(bundle.models)})")
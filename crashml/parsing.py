@@ -0,0 +1,260 @@
+"""
+Feature extraction from DMV report text, shared by the UIs and the batch tools
+
+parse_dmv_report turns the text of one report into the structured features
+the models were trained on. Every phrase it looks for is compiled into one
+KeywordMatcher at import time, so a report is scanned once however many
+phrases the tables hold.
+"""
+from .keyword_matcher import KeywordMatcher
+
+AUTONOMOUS_INDICATORS = [
+    'autonomous mode',
+    'autonomous vehicle',
+    'self-driving',
+    'autopilot',
+    '☑ autonomous mode',  # Checked box
+    'aurora innovation',
+    'waymo llc',
+    'waymo',
+    'cruise',
+    'tesla autopilot',
+    'apple inc'
+]
+
+MOVING_KEYWORDS = ['proceeding straight', 'making right turn', 'making left turn', 'changing lanes', 'traveling']
+STATIONARY_KEYWORDS = ['stopped', 'parked', 'stationary']
+
+REAR_WORDS = ['rear', 'back', 'behind']
+FRONT_WORDS = ['front', 'head-on', 'forward']
+SIDE_WORDS = ['side', 'sideswipe', 'lateral']
+
+# Collision type from the form checkboxes
+COLLISION_TYPES = {
+    'rear end': 'impact_rear',
+    'rear-end': 'impact_rear',
+    'head-on': 'impact_front',
+    'broadside': 'impact_side',
+    'side swipe': 'impact_side',
+    'sideswipe': 'impact_side'
+}
+
+# Checked boxes ('☑ raining', '☑ wet', '☑ dark', ...) contain these phrases too
+WEATHER_CONDITIONS = [
+    'raining', 'rain', 'snowing', 'snow', 'fog', 'foggy', 'storm', 'wind'
+]
+
+ROAD_CONDITIONS = [
+    'wet', 'slippery', 'icy', 'snowy', 'construction', 'repair zone', 'obstruction', 'flooded'
+]
+
+LIGHTING_CONDITIONS = [
+    'dark', 'night', 'dusk', 'dawn', 'dark – street lights', 'dark – no street lights'
+]
+
+# Information about the other vehicle
+VEHICLE2_MOVING_INDICATORS = [
+    'other vehicle moving',
+    'other vehicle was moving',
+    'second vehicle moving',
+    'vehicle 2 moving'
+]
+
+VEHICLE2_STOPPED_INDICATORS = [
+    'other vehicle stopped',
+    'other vehicle was stopped',
+    'second vehicle stopped',
+    'vehicle 2 stopped'
+]
+
+MANUFACTURERS = {
+    'waymo': {'autonomous_mode': 1},
+    'aurora': {'autonomous_mode': 1},
+    'cruise': {'autonomous_mode': 1},
+    'tesla': {'autonomous_mode': 1},
+    'apple': {'autonomous_mode': 1}
+}
+
+# Specific phrases that indicate fault scenarios
+FAULT_INDICATORS = {
+    'rear ended': {'impact_rear': 1, 'vehicle_1_moving': 0},
+    'struck from behind': {'impact_rear': 1, 'vehicle_1_moving': 0},
+    'hit from behind': {'impact_rear': 1, 'vehicle_1_moving': 0},
+    'ran into': {'impact_front': 1, 'vehicle_1_moving': 1},
+    'collided with': {'vehicle_1_moving': 1},
+    'lane change': {'vehicle_1_moving': 1},
+    'changing lanes': {'vehicle_1_moving': 1},
+    'merging': {'vehicle_1_moving': 1},
+    'turning': {'vehicle_1_moving': 1}
+}
+
+REPORT_KEYWORDS = KeywordMatcher(
+    AUTONOMOUS_INDICATORS
+    + ['☑ stopped in traffic', 'x stopped in traffic', '☑ moving', 'x moving']
+    + MOVING_KEYWORDS + STATIONARY_KEYWORDS
+    + ['☑ none', 'x none', '☑ minor', 'x minor', '☑ major', 'x major']
+    + REAR_WORDS + FRONT_WORDS + SIDE_WORDS
+    + list(COLLISION_TYPES) + WEATHER_CONDITIONS + ROAD_CONDITIONS
+    + LIGHTING_CONDITIONS + ['daylight']
+    + VEHICLE2_MOVING_INDICATORS + VEHICLE2_STOPPED_INDICATORS
+    + list(MANUFACTURERS) + list(FAULT_INDICATORS)
+)
+
+def no_log(message):
+    pass
+
+def parse_dmv_report(text, form_fields, log=None):
+    """
+    Enhanced DMV report parser to extract key features
+
+    Args:
+        text: Report text from the extraction stage
+        form_fields: Form field values of the report
+        log: Called with a message for every finding (st.write in the Streamlit
+            app, list.append for the Flask debug info); findings are dropped by default
+
+    Returns:
+        Dictionary of structured features plus the report text as 'description'
+    """
+    log = log or no_log
+
+    # Initialize data point
+    data_point = {
+        'vehicle_1_moving': 0,
+        'vehicle_2_moving': 0,
+        'autonomous_mode': 0,
+        'impact_front': 0,
+        'impact_rear': 0,
+        'impact_side': 0,
+        'weather_issue': 0,
+        'road_issue': 0,
+        'dark_condition': 0,
+        'description': text
+    }
+
+    # Convert text to lowercase and find every known phrase in one pass
+    text_lower = text.lower()
+    hits = REPORT_KEYWORDS.find(text_lower)
+
+    log(f"Text length: {len(text)} characters")
+    log(f"Form fields found: {len(form_fields)}")
+
+    # 1. AUTONOMOUS MODE DETECTION
+    if any(indicator in hits for indicator in AUTONOMOUS_INDICATORS):
+        data_point['autonomous_mode'] = 1
+        log("✅ Autonomous mode detected")
+
+    # 2. VEHICLE MOVEMENT DETECTION
+    # Checkboxes take precedence over the description
+    if '☑ stopped in traffic' in hits or 'x stopped in traffic' in hits:
+        data_point['vehicle_1_moving'] = 0
+        log("✅ Vehicle 1 stopped in traffic (from checkbox)")
+    elif '☑ moving' in hits or 'x moving' in hits:
+        data_point['vehicle_1_moving'] = 1
+        log("✅ Vehicle 1 moving (from checkbox)")
+    elif any(keyword in hits for keyword in MOVING_KEYWORDS):
+        data_point['vehicle_1_moving'] = 1
+        log("✅ Vehicle 1 moving (from text description)")
+    elif any(keyword in hits for keyword in STATIONARY_KEYWORDS):
+        data_point['vehicle_1_moving'] = 0
+        log("✅ Vehicle 1 stationary (from text description)")
+
+    # 3. DAMAGE/IMPACT DETECTION
+    if '☑ none' in hits or 'x none' in hits:
+        log("✅ No damage reported")
+    elif '☑ minor' in hits or 'x minor' in hits:
+        log("✅ Minor damage reported")
+        # Try to determine impact location from description
+        if any(word in hits for word in REAR_WORDS):
+            data_point['impact_rear'] = 1
+        elif any(word in hits for word in FRONT_WORDS):
+            data_point['impact_front'] = 1
+        elif any(word in hits for word in SIDE_WORDS):
+            data_point['impact_side'] = 1
+        else:
+            # Default to front impact for minor damage
+            data_point['impact_front'] = 1
+    elif '☑ major' in hits or 'x major' in hits:
+        log("✅ Major damage reported")
+        data_point['impact_front'] = 1  # Assume front impact for major damage
+
+    # 4. COLLISION TYPE DETECTION
+    for collision_text, impact_field in COLLISION_TYPES.items():
+        if collision_text in hits:
+            data_point[impact_field] = 1
+            log(f"✅ {collision_text} collision detected")
+
+    # 5. WEATHER CONDITIONS
+    for weather in WEATHER_CONDITIONS:
+        if weather in hits:
+            data_point['weather_issue'] = 1
+            log(f"✅ Weather condition detected: {weather}")
+
+    # 6. ROAD CONDITIONS
+    for road in ROAD_CONDITIONS:
+        if road in hits:
+            data_point['road_issue'] = 1
+            log(f"✅ Road condition detected: {road}")
+
+    # 7. LIGHTING CONDITIONS
+    if any(condition in hits for condition in LIGHTING_CONDITIONS):
+        # But exclude "daylight"
+        if 'daylight' not in hits:
+            data_point['dark_condition'] = 1
+            log("✅ Dark/poor lighting condition detected")
+
+    # 8. VEHICLE 2 MOVEMENT
+    if any(indicator in hits for indicator in VEHICLE2_MOVING_INDICATORS):
+        data_point['vehicle_2_moving'] = 1
+        log("✅ Vehicle 2 was moving")
+    elif any(indicator in hits for indicator in VEHICLE2_STOPPED_INDICATORS):
+        data_point['vehicle_2_moving'] = 0
+        log("✅ Vehicle 2 was stopped")
+
+    # 9. MANUFACTURER-SPECIFIC LOGIC
+    for manufacturer, attributes in MANUFACTURERS.items():
+        if manufacturer in hits:
+            for attr, value in attributes.items():
+                data_point[attr] = value
+            log(f"✅ {manufacturer.title()} vehicle detected")
+
+    # 10. ENHANCED DESCRIPTION ANALYSIS
+    for phrase, attributes in FAULT_INDICATORS.items():
+        if phrase in hits:
+            for attr, value in attributes.items():
+                data_point[attr] = value
+            log(f"✅ Fault indicator detected: '{phrase}'")
+
+    return data_point
+
+def parse_report(report, parse=parse_dmv_report, log=None):
+    """
+    Parse an extracted report (ParsedReport) the way the models were trained
+
+    The structured features come from the whole report text, but the text
+    features are fit on the narratives typed into the form (crashml.training),
+    so the narrative replaces the text as 'description' whenever the form has
+    one. Reports without a narrative keep the full text.
+
+    Args:
+        report: Output of the extract stage (.text, .form_fields, optionally .narrative)
+        parse: Parser of (text, form_fields, log), parse_dmv_report by default
+        log: As for parse_dmv_report
+    """
+    data_point = parse(report.text, report.form_fields, log=log)
+    narrative = getattr(report, 'narrative', '')
+    if narrative:
+        data_point['description'] = narrative
+    return data_point
+
+def summarize_features(parsed_data):
+    """Human-readable summary of the extracted features"""
+    return {
+        'Vehicle 1 Moving': 'Yes' if parsed_data['vehicle_1_moving'] else 'No',
+        'Vehicle 2 Moving': 'Yes' if parsed_data['vehicle_2_moving'] else 'No',
+        'Autonomous Mode': 'Yes' if parsed_data['autonomous_mode'] else 'No',
+        'Impact Location': 'Front' if parsed_data['impact_front'] else 'Rear' if parsed_data['impact_rear'] else 'Side' if parsed_data['impact_side'] else 'Unknown',
+        'Weather Issues': 'Yes' if parsed_data['weather_issue'] else 'No',
+        'Road Issues': 'Yes' if parsed_data['road_issue'] else 'No',
+        'Dark Conditions': 'Yes' if parsed_data['dark_condition'] else 'No'
+    }
@@ -0,0 +1,225 @@
+from dataclasses import dataclass, field, asdict
+from io import BytesIO
+from .extraction_cache import content_digest
+from .metrics import METRICS
+
+# Form fields holding the accident narrative are named ADDRESS_2.x.y by the DMV form
+NARRATIVE_FIELD_MARKER = 'address_2'
+NARRATIVE_MIN_LENGTH = 50
+
+@dataclass
+class ParsedReport:
+    """Everything the pipeline needs from one DMV report PDF, extracted in a single pass"""
+    text_pages: list = field(default_factory=list)       # [(page_number, page_text), ...]
+    checkbox_states: list = field(default_factory=list)  # appearance states of annotations
+    form_fields: dict = field(default_factory=dict)      # AcroForm field name -> value
+    narrative: str = ""                                  # accident description typed into the form
+    fast: bool = False                                   # text was built from form fields
+
+    @property
+    def text(self):
+        """Report text in the layout the parser expects (pages, then checkbox states)"""
+        parts = [f"--- Page {page_num} ---\n{page_text}\n" for page_num, page_text in self.text_pages]
+        parts.extend(f" CHECKBOX_STATE: {state} " for state in self.checkbox_states)
+        return ''.join(parts)
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            text_pages=[tuple(page) for page in data.get('text_pages', [])],
+            checkbox_states=data.get('checkbox_states', []),
+            form_fields=data.get('form_fields', {}),
+            narrative=data.get('narrative', ""),
+            fast=data.get('fast', False)
+        )
+
+def find_narrative(reader):
+    """
+    Return the accident narrative typed into the form, or '' if it is not filled in
+
+    The narrative sits in nested fields (ADDRESS_2.1.0.1) whose short names collide
+    in PdfReader.get_fields(), so the AcroForm tree is walked with qualified names.
+    """
+    try:
+        stack = [(field_ref, "") for field_ref in reversed(reader.trailer['/Root']['/AcroForm']['/Fields'])]
+    except (KeyError, TypeError):
+        return ""
+
+    while stack:
+        field_ref, parent_name = stack.pop()
+        field_obj = field_ref.get_object()
+        partial_name = field_obj.get('/T')
+        name = f"{parent_name}.{partial_name}" if parent_name and partial_name is not None else (partial_name or parent_name)
+
+        value = field_obj.get('/V')
+        if NARRATIVE_FIELD_MARKER in name.lower() and isinstance(value, str) and len(value) > NARRATIVE_MIN_LENGTH:
+            return str(value)
+
+        stack.extend((kid, name) for kid in reversed(field_obj.get('/Kids', [])))
+
+    return ""
+
+def form_fields_as_text(form_fields):
+    """Render form fields as report text: checked boxes as '☑ name', text fields as 'name: value'"""
+    lines = []
+    for name, value in form_fields.items():
+        value = str(value)
+        if value.startswith('/'):
+            if value != '/Off':
+                lines.append(f"☑ {name}")
+        elif value.strip():
+            lines.append(f"{name}: {value}")
+    return '\n'.join(lines)
+
+def form_field_values(fields):
+    """Values of the filled-in fields, from the dict PdfReader.get_fields() returns (or None)"""
+    if not fields:
+        return {}
+    return {k: v["/V"] for k, v in fields.items() if isinstance(v, dict) and "/V" in v}
+
+def pdf_stream(source):
+    """Seekable binary stream over a PDF given as bytes or as an open binary file (rewound)"""
+    if isinstance(source, (bytes, bytearray)):
+        return BytesIO(source)
+    source.seek(0)
+    return source
+
+def parse_pdf_bytes(file_bytes, fast=False):
+    """
+    Parse a report PDF once and return its text pages, checkbox states and form fields
+
+    file_bytes may also be a seekable binary file (e.g. an upload spooled to
+    memory), which is read in place instead of being copied into bytes.
+
+    A single PdfReader supplies both the annotation checkbox states and the
+    AcroForm fields. With fast=True, pdfplumber layout analysis is skipped
+    whenever the form fields already contain the narrative, and the report
+    text is rendered from the form fields instead.
+    """
+    # Imported here so that importing this module stays cheap for the UIs
+    import pdfplumber
+    from PyPDF2 import PdfReader
+
+    report = ParsedReport()
+
+    try:
+        with METRICS.span('pypdf2_open'):
+            reader = PdfReader(pdf_stream(file_bytes))
+    except Exception as e:
+        print(f"Could not read PDF structure: {str(e)}")
+        METRICS.count('parse_failure', stage='pypdf2_open')
+        reader = None
+
+    if reader is not None:
+        try:
+            with METRICS.span('pypdf2_fields'):
+                fields = reader.get_fields()
+            report.form_fields = form_field_values(fields)
+        except Exception as e:
+            print(f"Error extracting form fields: {str(e)}")
+            METRICS.count('parse_failure', stage='pypdf2_fields')
+
+        try:
+            with METRICS.span('pypdf2_annotations'):
+                for page in reader.pages:
+                    if '/Annots' in page:
+                        for annotation in page['/Annots']:
+                            annot_obj = annotation.get_object()
+                            if '/AS' in annot_obj:
+                                report.checkbox_states.append(annot_obj['/AS'])
+        except Exception as e:
+            print(f"Could not extract checkbox states: {str(e)}")
+            METRICS.count('parse_failure', stage='pypdf2_annotations')
+
+        try:
+            with METRICS.span('narrative'):
+                report.narrative = find_narrative(reader)
+        except Exception as e:
+            print(f"Could not extract narrative: {str(e)}")
+            METRICS.count('parse_failure', stage='narrative')
+
+    if fast and report.narrative:
+        report.text_pages = [(1, f"{form_fields_as_text(report.form_fields)}\n{report.narrative}")]
+        report.fast = True
+        return report
+
+    try:
+        with METRICS.span('pdfplumber'):
+            with pdfplumber.open(pdf_stream(file_bytes)) as pdf:
+                for page_num, page in enumerate(pdf.pages):
+                    page_text = page.extract_text()
+                    if page_text:
+                        report.text_pages.append((page_num + 1, page_text))
+    except Exception as e:
+        print(f"Enhanced text extraction failed: {e}")
+        METRICS.count('parse_failure', stage='pdfplumber')
+        # Without the page text there is nothing for the parser to work with
+        report.text_pages = []
+        report.checkbox_states = []
+
+    return report
+
+def load_report(file_bytes, cache=None, digest=None, fast=False):
+    """
+    parse_pdf_bytes with an optional ExtractionCache in front of it
+
+    Returns:
+        ParsedReport, served from the cache when this PDF was parsed before
+    """
+    if cache is None:
+        return parse_pdf_bytes(file_bytes, fast=fast)
+
+    digest = digest or content_digest(file_bytes)
+    kind = 'report-fast' if fast else 'report'
+
+    cached = cache.get(digest, kind)
+    if cached is not None:
+        METRICS.count('cache_hit', cache='extraction')
+        return ParsedReport.from_dict(cached)
+    METRICS.count('cache_miss', cache='extraction')
+
+    report = parse_pdf_bytes(file_bytes, fast=fast)
+    if report.text:
+        cache.put(digest, kind, report.to_dict())
+    return report
+
+def read_form_fields(source):
+    """
+    AcroForm field values of a PDF given as a path, bytes or a seekable binary file
+
+    Only the PDF structure is read (no layout analysis), which is all the batch
+    extraction scripts need. Errors from PyPDF2 propagate to the caller.
+    """
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(source if isinstance(source, str) else pdf_stream(source))
+    return form_field_values(reader.get_fields())
+
+def load_form_fields(source, cache=None, digest=None):
+    """
+    read_form_fields with an optional ExtractionCache in front of it
+
+    Returns:
+        Dictionary of field values, served from the cache when this PDF was read before
+    """
+    if cache is None:
+        return read_form_fields(source)
+
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            source = f.read()
+    digest = digest or content_digest(source)
+
+    values = cache.get(digest, 'form_fields')
+    if values is not None:
+        METRICS.count('cache_hit', cache='form_fields')
+        return values
+    METRICS.count('cache_miss', cache='form_fields')
+
+    values = read_form_fields(source)
+    if values:
+        cache.put(digest, 'form_fields', values)
+    return values
@@ -0,0 +1,96 @@
+"""
+Report analysis as a chain of replaceable stages: extract -> parse -> predict -> explain
+"""
+from .metrics import METRICS
+from .pdf_extraction import load_report
+from .parsing import parse_dmv_report, parse_report
+from .inference import predict_fault_batch, explain_prediction
+
+def extract_report(source, cache=None, digest=None, fast=False):
+    """Extract text and form fields in one pass, skipping PDF parsing for previously seen files"""
+    with METRICS.span('extract'):
+        return load_report(source, cache=cache, digest=digest, fast=fast)
+
+class Pipeline:
+    """
+    Extraction, parsing and prediction for DMV reports with pluggable stages
+
+    Every stage is a plain function and can be replaced when the pipeline is
+    built, e.g. an OCR extractor for scanned reports or a different parser:
+
+        extract(source, digest) -> ParsedReport (anything with .text and .form_fields)
+        parse(text, form_fields, log) -> data point dict
+        predict(data_points, bundle, cache) -> (predictions, probabilities), one entry per report
+        explain(data_point) -> list of explanation strings
+
+    The parse stage sees the whole report text; parse_report then puts the
+    form's typed narrative in 'description' for the text features.
+
+    Reports are extracted and parsed one at a time (parse_source), and
+    predicted in batches (predict_results), so every model runs once per batch
+    and only parsed text is held in memory, never the PDFs. With a
+    prediction_cache, reports whose feature vector was seen before skip the
+    models altogether.
+    """
+
+    def __init__(self, bundle, cache=None, fast=False, extract=None, parse=parse_dmv_report,
+                 predict=predict_fault_batch, explain=explain_prediction, prediction_cache=None):
+        self.bundle = bundle
+        self.cache = cache
+        self.prediction_cache = prediction_cache
+        self.fast = fast
+        self.extract = extract or self.extract_report
+        self.parse = parse
+        self.predict = predict
+        self.explain = explain
+
+    def extract_report(self, source, digest=None):
+        """Default extract stage: load_report with this pipeline's cache and fast setting"""
+        return extract_report(source, cache=self.cache, digest=digest, fast=self.fast)
+
+    def parse_source(self, source, digest=None):
+        """
+        Run the extract and parse stages for one report (a PDF as bytes or a seekable file)
+
+        Returns:
+            Dictionary with 'text', 'form_fields', 'parsed' and 'debug_info', or
+            with 'error' when no text could be extracted
+        """
+        report = self.extract(source, digest)
+        text = report.text
+
+        if not text:
+            METRICS.count('parse_failure', stage='extract')
+            return {'error': 'Could not extract text from PDF'}
+
+        debug_info = []
+        with METRICS.span('parse_dmv_report'):
+            parsed = parse_report(report, self.parse, log=debug_info.append)
+
+        return {'text': text, 'form_fields': report.form_fields, 'parsed': parsed, 'debug_info': debug_info}
+
+    def predict_results(self, results):
+        """
+        Run the predict and explain stages for results of parse_source, as one batch
+
+        Adds 'predictions', 'probabilities' and 'explanations' to every result
+        without an error, in place, and returns the results.
+        """
+        ready = [result for result in results if 'error' not in result]
+        if not ready:
+            return results
+
+        predictions, probabilities = self.predict([result['parsed'] for result in ready], self.bundle, cache=self.prediction_cache)
+        for result, prediction, probability in zip(ready, predictions, probabilities):
+            result['predictions'] = prediction
+            result['probabilities'] = probability
+            result['explanations'] = self.explain(result['parsed'])
+        return results
+
+    def analyze(self, source, digest=None):
+        """Every stage for one report"""
+        return self.predict_results([self.parse_source(source, digest)])[0]
+
+    def analyze_many(self, sources):
+        """Every stage for many reports, with a single prediction batch"""
+        return self.predict_results([self.parse_source(source) for source in sources])
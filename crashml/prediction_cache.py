@@ -0,0 +1,105 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from scipy import sparse
+from .metrics import METRICS
+
+DEFAULT_MAX_ENTRIES = 4096
+
+def feature_row_keys(features):
+    """
+    Hash of every row of a feature matrix, equal for equal feature vectors
+
+    Sparse rows are hashed from their (column, value) pairs, so explicit
+    zeros and index order do not change the key.
+    """
+    if not sparse.issparse(features):
+        rows = np.ascontiguousarray(features, dtype=float)
+        return [hashlib.blake2b(row.tobytes(), digest_size=16).hexdigest() for row in rows]
+
+    features = features.tocsr(copy=True)
+    features.eliminate_zeros()
+    features.sort_indices()
+    data = features.data.astype(float, copy=False)
+    indices = features.indices.astype(np.int64, copy=False)
+
+    keys = []
+    for start, stop in zip(features.indptr[:-1], features.indptr[1:]):
+        digest = hashlib.blake2b(indices[start:stop].tobytes(), digest_size=16)
+        digest.update(data[start:stop].tobytes())
+        keys.append(digest.hexdigest())
+    return keys
+
+class PredictionCache:
+    """
+    Bounded in-process LRU cache of model outputs keyed by feature vector
+
+    Reports that end up with the same feature vector (same structured flags
+    and the same narrative terms) get the stored predictions back instead of
+    running every model again. Keys include the model bundle version, and the
+    cache empties itself the first time it sees another version, so entries
+    never outlive a model reload.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.version = None
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, version, keys):
+        """Cached (predictions, probabilities) for each key, or None where there is none"""
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.version = version
+
+            values = []
+            for key in keys:
+                value = self.entries.get((version, key))
+                if value is not None:
+                    self.entries.move_to_end((version, key))
+                values.append(value)
+
+            hits = sum(value is not None for value in values)
+            self.hits += hits
+            self.misses += len(values) - hits
+
+        if hits:
+            METRICS.count('cache_hit', hits, cache='prediction')
+        if len(values) > hits:
+            METRICS.count('cache_miss', len(values) - hits, cache='prediction')
+        return values
+
+    def put_many(self, version, items):
+        """Store (key, (predictions, probabilities)) pairs, evicting the least recently used past max_entries"""
+        with self.lock:
+            if version != self.version:
+                return
+            for key, value in items:
+                self.entries[(version, key)] = value
+                self.entries.move_to_end((version, key))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.version = None
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            'entries': len(self.entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+        }
@@ -0,0 +1,348 @@
+"""
+Bulk scoring of report PDFs without the UI
+
+    python -m crashml score "Combined_Extracted Data" --output scores.jsonl
+    python -m crashml score manifest.txt --output scores/ --format parquet
+
+Reports are listed lazily from a directory tree (every *.pdf below it) or a
+manifest (one path per line), handed to a process pool in small chunks and
+run through the usual pipeline: extraction, parse_dmv_report, and one
+predict_fault_batch call per chunk. Only a bounded number of chunks is in
+flight at a time and finished rows go straight to disk, so memory stays flat
+however many reports there are.
+
+Every row is keyed by the report's path. Rerunning with the same output skips
+the reports already written, so an interrupted run picks up where it stopped.
+"""
+import os
+import json
+import time
+import uuid
+import logging
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from .extraction_cache import ExtractionCache
+from .pipeline import Pipeline
+
+OUTPUT_FORMATS = ('jsonl', 'parquet')
+
+# Set in each worker process by init_score_worker
+worker_pipeline = None
+
+def iter_sources(input_path):
+    """
+    Yield (key, path) for every report to score
+
+    A directory is walked recursively for PDFs, keyed by their path relative to
+    it. Any other file is read as a manifest: one PDF path per line, relative
+    paths resolved against the manifest's directory, blank lines and lines
+    starting with '#' ignored. Manifest entries are keyed as written.
+    """
+    if os.path.isdir(input_path):
+        for directory, subdirs, filenames in os.walk(input_path):
+            subdirs.sort()
+            for filename in sorted(filenames):
+                if filename.lower().endswith('.pdf'):
+                    path = os.path.join(directory, filename)
+                    yield os.path.relpath(path, input_path), path
+        return
+
+    base_dir = os.path.dirname(os.path.abspath(input_path))
+    with open(input_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            entry = line.strip()
+            if entry and not entry.startswith('#'):
+                yield entry, os.path.join(base_dir, entry)
+
+def iter_chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def model_slug(model_name):
+    """Column prefix for a model: 'Random Forest' -> 'random_forest'"""
+    return model_name.lower().replace(' ', '_')
+
+def output_columns(bundle):
+    """
+    Column names and types of a score row, in order
+
+    Returns:
+        List of (name, type) with type one of 'string', 'int' and 'float'
+    """
+    columns = [('path', 'string'), ('error', 'string'), ('model_version', 'string')]
+    columns += [(name, 'int') for name in bundle.structured_features]
+    for model_name, model in bundle.models.items():
+        slug = model_slug(model_name)
+        columns.append((f"{slug}_prediction", 'int'))
+        columns += [(f"{slug}_prob_{label}", 'float') for label in model.classes_]
+    return columns
+
+def score_row(key, result, bundle):
+    """Flatten one pipeline result into an output row (features, per-model prediction and probabilities)"""
+    row = {'path': key, 'error': result.get('error'), 'model_version': bundle.version}
+    if 'error' in result:
+        return row
+
+    parsed = result['parsed']
+    for name in bundle.structured_features:
+        row[name] = int(parsed[name])
+    for model_name, model in bundle.models.items():
+        slug = model_slug(model_name)
+        row[f"{slug}_prediction"] = result['predictions'][model_name]['prediction']
+        for label, probability in zip(model.classes_, result['probabilities'][model_name]):
+            row[f"{slug}_prob_{label}"] = probability
+    return row
+
+def init_score_worker(model_dir, cache_dir, fast):
+    """Load the (memory-mapped) bundle once per worker process"""
+    global worker_pipeline
+    from .model_bundle import load_or_build_bundle
+
+    bundle = load_or_build_bundle(model_dir)
+    cache = ExtractionCache(cache_dir) if cache_dir else None
+    worker_pipeline = Pipeline(bundle, cache=cache, fast=fast)
+
+def score_chunk(chunk):
+    """
+    Score a chunk of reports in a worker: extract and parse each, then predict them as one batch
+
+    Args:
+        chunk: List of (key, path)
+
+    Returns:
+        List of output rows, one per report; unreadable reports get an error row
+    """
+    results = []
+    for key, path in chunk:
+        try:
+            with open(path, 'rb') as f:
+                results.append(worker_pipeline.parse_source(f.read()))
+        except Exception as e:
+            results.append({'error': f"{type(e).__name__}: {e}"})
+
+    worker_pipeline.predict_results(results)
+    return [score_row(key, result, worker_pipeline.bundle) for (key, _), result in zip(chunk, results)]
+
+class JsonlOutput:
+    """Score rows appended to a JSON Lines file, flushed after every chunk"""
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = [name for name, _ in columns]
+        self.file = None
+
+    def done_keys(self):
+        """Keys already written; a line cut off by an interruption is dropped from the file"""
+        keys = set()
+        if not os.path.exists(self.path):
+            return keys
+
+        good_bytes = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    keys.add(json.loads(line)['path'])
+                except (ValueError, KeyError):
+                    break
+                good_bytes += len(line)
+
+        if good_bytes < os.path.getsize(self.path):
+            with open(self.path, 'r+b') as f:
+                f.truncate(good_bytes)
+        return keys
+
+    def write(self, rows):
+        if self.file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.file = open(self.path, 'a', encoding='utf-8')
+        for row in rows:
+            self.file.write(json.dumps({name: row.get(name) for name in self.columns}) + '\n')
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+class ParquetOutput:
+    """
+    Score rows written to a directory of Parquet files (read it back with pd.read_parquet)
+
+    Rows are buffered and written as a new part file every rows_per_file rows.
+    Parts are renamed into place once complete, so an interrupted run never
+    leaves a half-written file behind.
+    """
+
+    def __init__(self, directory, columns, rows_per_file=2000):
+        import pyarrow as pa
+
+        types = {'string': pa.string(), 'int': pa.int64(), 'float': pa.float64()}
+        self.schema = pa.schema([(name, types[kind]) for name, kind in columns])
+        self.directory = directory
+        self.rows_per_file = rows_per_file
+        self.buffer = []
+
+    def part_paths(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.parquet'))
+
+    def done_keys(self):
+        import pyarrow.parquet as pq
+
+        keys = set()
+        for path in self.part_paths():
+            keys.update(pq.read_table(path, columns=['path']).column('path').to_pylist())
+        return keys
+
+    def write(self, rows):
+        self.buffer.extend(rows)
+        if len(self.buffer) >= self.rows_per_file:
+            self.flush()
+
+    def flush(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not self.buffer:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"part-{uuid.uuid4().hex}.parquet")
+        table = pa.Table.from_pylist(self.buffer, schema=self.schema)
+        pq.write_table(table, f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+
+def open_output(path, output_format, columns):
+    if output_format == 'jsonl':
+        return JsonlOutput(path, columns)
+    return ParquetOutput(path, columns)
+
+def score_reports(sources, output, model_dir=None, workers=None, chunk_size=8, cache_dir=None, fast=False, log_every=30.0):
+    """
+    Score every report in sources on a process pool and write the rows to output
+
+    At most two chunks per worker are queued at a time, which keeps every core
+    busy while bounding how many reports are held in memory.
+
+    Args:
+        sources: Iterable of (key, path), e.g. from iter_sources
+        output: JsonlOutput or ParquetOutput
+        model_dir: Directory holding the model files (default: CrashML-UI)
+        workers: Number of worker processes (defaults to the CPU count)
+        chunk_size: Reports per task; each task makes one prediction batch
+        cache_dir: ExtractionCache directory, or None to parse every PDF
+        fast: Skip layout analysis when the form fields hold the narrative
+
+    Returns:
+        Dictionary with 'scored', 'failed' and 'seconds'
+    """
+    from .model_bundle import DEFAULT_MODEL_DIR, load_or_build_bundle
+
+    model_dir = model_dir or DEFAULT_MODEL_DIR
+    # Build the bundle here if needed, so workers only ever load it
+    load_or_build_bundle(model_dir)
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * 2
+    stats = {'scored': 0, 'failed': 0}
+    start = last_log = time.perf_counter()
+
+    def collect(futures):
+        nonlocal last_log
+        for future in futures:
+            rows = future.result()
+            output.write(rows)
+            stats['scored'] += len(rows)
+            stats['failed'] += sum(row['error'] is not None for row in rows)
+
+        now = time.perf_counter()
+        if now - last_log >= log_every:
+            last_log = now
+            logging.info(f"Scored {stats['scored']} reports ({stats['scored'] / (now - start):.1f}/s), {stats['failed']} failed")
+
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=init_score_worker, initargs=(model_dir, cache_dir, fast))
+    pending = set()
+    try:
+        for chunk in iter_chunks(sources, chunk_size):
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(executor.submit(score_chunk, chunk))
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    finally:
+        # On interruption, keep what has been scored so far; the rerun resumes from there
+        executor.shutdown(wait=not pending, cancel_futures=True)
+        output.close()
+
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+def add_score_arguments(parser):
+    parser.add_argument('input', help="Directory to search for PDFs, or a manifest file with one PDF path per line")
+    parser.add_argument('--output', required=True, help="JSON Lines file, or directory of Parquet files")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default=None, help="Output format (default: jsonl for *.jsonl/*.json outputs, parquet otherwise)")
+    parser.add_argument('--model-dir', default=None, help="Directory holding the model files (default: CrashML-UI)")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes (default: CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=8, help="Reports per worker task and prediction batch (default: 8)")
+    parser.add_argument('--fast', action='store_true', help="Skip layout analysis when the form fields hold the narrative")
+    parser.add_argument('--no-cache', action='store_true', help="Do not read or fill the shared extraction cache")
+    parser.add_argument('--restart', action='store_true', help="Score every report again instead of resuming")
+
+def score_command(args):
+    """Entry point of `python -m crashml score`"""
+    from .model_bundle import DEFAULT_MODEL_DIR, load_or_build_bundle
+    from .extraction_cache import DEFAULT_CACHE_DIR
+
+    if not os.path.exists(args.input):
+        logging.error(f"Input not found: {args.input}")
+        return 1
+
+    output_format = args.format or ('jsonl' if args.output.lower().endswith(('.jsonl', '.json')) else 'parquet')
+    bundle = load_or_build_bundle(args.model_dir or DEFAULT_MODEL_DIR)
+    output = open_output(args.output, output_format, output_columns(bundle))
+
+    if args.restart:
+        done = set()
+        if os.path.isfile(args.output):
+            os.remove(args.output)
+        elif output_format == 'parquet':
+            for path in output.part_paths():
+                os.remove(path)
+    else:
+        done = output.done_keys()
+        if done:
+            logging.info(f"Resuming: {len(done)} reports already scored in {args.output}")
+
+    sources = ((key, path) for key, path in iter_sources(args.input) if key not in done)
+    try:
+        stats = score_reports(
+            sources, output,
+            model_dir=args.model_dir,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            cache_dir=None if args.no_cache else DEFAULT_CACHE_DIR,
+            fast=args.fast
+        )
+    except KeyboardInterrupt:
+        logging.warning("Interrupted; rerun the same command to resume")
+        return 130
+
+    rate = stats['scored'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+    logging.info(f"Scored {stats['scored']} reports in {stats['seconds']:.1f}s ({rate:.1f}/s), {stats['failed']} failed; results in {args.output}")
+    return 0
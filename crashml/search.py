@@ -0,0 +1,567 @@
+"""
+Full-text search over crash narratives
+
+    python -m crashml index "Data PreProcessing"
+    python -m crashml search '"rear ended" stopped' --year 2023 --autonomous-mode Yes
+
+An inverted index maps every word of the processed narratives (the
+description column) to the reports that use it and the word positions in
+each. Queries are ranked with BM25, and "quoted phrases" must appear word
+for word: their positions have to follow each other. Reports can be
+restricted to accident years, vehicle 1 makes and autonomous_mode.
+
+The index lives in a directory of segments. Each update writes the new and
+changed reports to a fresh segment and lists replaced reports as deleted
+in the manifest, so indexing one new year never rewrites the others. Once
+there are more than MAX_SEGMENTS segments they are merged into one.
+Every report is identified by a key (source file and accident_id) and a
+content hash, so re-indexing unchanged data writes nothing.
+"""
+import os
+import re
+import json
+import uuid
+import math
+import heapq
+import hashlib
+import logging
+import threading
+from collections import defaultdict
+import pandas as pd
+from .dedup import TOKEN_PATTERN, narratives, load_frames
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROCESSED_DIR = os.path.join(REPO_ROOT, 'Data PreProcessing')
+PROCESSED_PATTERN = re.compile(r'^processed_crash_data_\d+\.csv$')
+
+DEFAULT_INDEX_DIR = os.environ.get('CRASHML_SEARCH_INDEX_DIR', os.path.join(PROCESSED_DIR, 'search_index'))
+
+# Bump whenever tokenization or the segment layout changes; older indexes are rebuilt
+INDEX_VERSION = 1
+MANIFEST_FILENAME = 'manifest.json'
+MAX_SEGMENTS = 8
+
+# BM25 term frequency saturation and length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Report fields kept with every document, for filters and result display
+DOCUMENT_FIELDS = ['date', 'location', 'make', 'autonomous_mode']
+
+SNIPPET_CHARS = 200
+
+QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+def tokenize(text):
+    """Lowercase words of text; hyphens and punctuation split words ('rear-ended' -> rear, ended)"""
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+def parse_query(query):
+    """
+    Split a query into words and phrases
+
+    Returns:
+        Tuple of (terms, phrases): terms is a list of words, phrases a list of
+        word lists from the "quoted" parts; a quoted single word is a phrase
+        that has to appear
+    """
+    terms = []
+    phrases = []
+    for phrase, word in QUERY_PATTERN.findall(query):
+        if phrase:
+            tokens = tokenize(phrase)
+            if tokens:
+                phrases.append(tokens)
+        else:
+            terms.extend(tokenize(word))
+    return terms, phrases
+
+def accident_year(date, fallback=None):
+    """Year of a MM/DD/YYYY date, else fallback"""
+    match = re.search(r'(\d{4})\s*$', str(date)) if isinstance(date, str) else None
+    return int(match.group(1)) if match else fallback
+
+def file_year(path):
+    """Year in a ..._YYYY.csv file name, or None (as crash_store.year_from_filename)"""
+    match = re.search(r'(20\d{2})\.csv$', os.path.basename(str(path)))
+    return int(match.group(1)) if match else None
+
+def field_text(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    value = str(value).strip()
+    return value or None
+
+def frame_documents(df, source=None):
+    """
+    Search documents of processed crash data rows
+
+    Args:
+        df: Processed rows, from CSVs (load_frames adds source_path and
+            source_row) or the Parquet store (with a year column)
+        source: Source name for rows without a source_path
+
+    Returns:
+        List of document dictionaries with key, source, hash, year, the
+        DOCUMENT_FIELDS and text; rows without a narrative are skipped
+    """
+    texts = narratives(df)
+    documents = []
+    occurrences = defaultdict(int)
+    for i in range(len(df)):
+        row = df.iloc[i]
+        text = texts.iat[i].strip()
+        if not text or text.lower() == 'nan':
+            continue
+
+        path = row.get('source_path')
+        row_source = os.path.basename(path) if isinstance(path, str) else source
+        accident_id = field_text(row.get('accident_id'))
+        if accident_id is None:
+            accident_id = str(row.get('source_row', i))
+
+        # Stores built from the per-year CSVs repeat their accident_ids; later copies are numbered
+        key = f"{row_source}:{accident_id}"
+        occurrences[key] += 1
+        if occurrences[key] > 1:
+            key = f"{key}#{occurrences[key] - 1}"
+
+        fallback = file_year(path) if isinstance(path, str) else pd.to_numeric(row.get('year'), errors='coerce')
+        fallback = None if fallback is None or pd.isna(fallback) else int(fallback)
+        document = {
+            'key': key,
+            'source': row_source,
+            'year': accident_year(row.get('date'), fallback),
+            'date': field_text(row.get('date')),
+            'location': field_text(row.get('location')),
+            'make': field_text(row.get('vehicle_1_make')),
+            'autonomous_mode': field_text(row.get('autonomous_mode')),
+            'text': text,
+        }
+        content = json.dumps([document[field] for field in ['year'] + DOCUMENT_FIELDS + ['text']])
+        document['hash'] = hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+        documents.append(document)
+    return documents
+
+def matches_filter(value, allowed):
+    """Case-insensitive membership of a document field in a filter (None allows everything)"""
+    if allowed is None:
+        return True
+    if value is None:
+        return False
+    return str(value).strip().lower() in allowed
+
+def filter_values(values):
+    """Normalized set of filter values from one value or a list; True/False become Yes/No"""
+    if values is None:
+        return None
+    if isinstance(values, (str, int, bool)):
+        values = [values]
+    normalized = set()
+    for value in values:
+        if isinstance(value, bool):
+            value = 'Yes' if value else 'No'
+        normalized.add(str(value).strip().lower())
+    return normalized
+
+def phrase_starts(positions):
+    """Positions where a phrase starts, given the position lists of its words in order"""
+    following = [set(word_positions) for word_positions in positions[1:]]
+    return [start for start in positions[0]
+            if all(start + offset + 1 in word_positions for offset, word_positions in enumerate(following))]
+
+def snippet(text, position, width=SNIPPET_CHARS):
+    """About width characters of text around the word at position"""
+    if len(text) <= width:
+        return text
+    start = 0
+    for i, match in enumerate(TOKEN_PATTERN.finditer(text.lower())):
+        if i == position:
+            start = max(0, match.start() - width // 4)
+            break
+    start = min(start, len(text) - width)
+    return ('...' if start > 0 else '') + text[start:start + width] + ('...' if start + width < len(text) else '')
+
+class SearchIndex:
+    """
+    Segmented inverted index with BM25 ranking
+
+    All segments are held in memory once loaded (the 2019-2024 narratives
+    take a few megabytes), so queries never touch the disk. Updates append a
+    segment and rewrite the small manifest with an atomic rename; readers
+    such as the web app pick up a new manifest through refresh().
+    """
+
+    def __init__(self, directory=DEFAULT_INDEX_DIR):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.segments = []
+        self.deleted = set()
+        self.next_id = 0
+        self.documents = {}                  # document id -> document
+        self.keys = {}                       # key -> live document id
+        self.postings = defaultdict(dict)    # word -> {document id: positions}
+        self.lengths = {}                    # document id -> words
+        self.total_length = 0
+        self.manifest_mtime = None
+        self.load()
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, MANIFEST_FILENAME)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def reset(self):
+        self.segments = []
+        self.deleted = set()
+        self.next_id = 0
+        self.documents = {}
+        self.keys = {}
+        self.postings = defaultdict(dict)
+        self.lengths = {}
+        self.total_length = 0
+
+    def load(self):
+        """Read the manifest and its segments; a missing or outdated index loads empty"""
+        self.reset()
+        try:
+            self.manifest_mtime = os.path.getmtime(self.manifest_path)
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest_mtime = None
+            return
+
+        if manifest.get('version') != INDEX_VERSION:
+            logging.warning(f"Search index in {self.directory} has version {manifest.get('version')}, expected {INDEX_VERSION}; it will be rebuilt")
+            return
+
+        self.segments = manifest['segments']
+        self.deleted = set(manifest['deleted'])
+        self.next_id = manifest['next_id']
+        for name in self.segments:
+            with open(os.path.join(self.directory, name), 'r', encoding='utf-8') as f:
+                segment = json.load(f)
+            live = {}
+            for document in segment['documents']:
+                if document['id'] not in self.deleted:
+                    live[document['id']] = dict(document, words=[])
+                    self.add_document(live[document['id']], index_words=False)
+            for word, entries in segment['postings'].items():
+                for doc_id, positions in entries:
+                    if doc_id in live:
+                        self.postings[word][doc_id] = positions
+                        live[doc_id]['words'].append(word)
+
+    def refresh(self):
+        """Reload when another process has updated the index since it was loaded"""
+        try:
+            mtime = os.path.getmtime(self.manifest_path)
+        except OSError:
+            mtime = None
+        if mtime != self.manifest_mtime:
+            with self.lock:
+                self.load()
+
+    def add_document(self, document, index_words=True):
+        """Register a document with an 'id' and a 'length' in memory, and its words unless the caller fills the postings"""
+        doc_id = document['id']
+        self.documents[doc_id] = document
+        self.keys[document['key']] = doc_id
+        self.lengths[doc_id] = document['length']
+        self.total_length += document['length']
+        if index_words:
+            for word, positions in self.word_positions(document['text']).items():
+                self.postings[word][doc_id] = positions
+
+    def remove_document(self, doc_id):
+        document = self.documents.pop(doc_id)
+        del self.keys[document['key']]
+        self.total_length -= self.lengths.pop(doc_id)
+        for word in document['words']:
+            word_postings = self.postings[word]
+            word_postings.pop(doc_id, None)
+            if not word_postings:
+                del self.postings[word]
+        self.deleted.add(doc_id)
+
+    @staticmethod
+    def word_positions(text):
+        positions = defaultdict(list)
+        for position, word in enumerate(tokenize(text)):
+            positions[word].append(position)
+        return positions
+
+    def update(self, documents, replace_sources=True):
+        """
+        Add new and changed documents, as one new segment
+
+        Args:
+            documents: Output of frame_documents
+            replace_sources: Also delete indexed documents of the sources in
+                documents that are no longer among them (rows removed from
+                a re-processed file)
+
+        Returns:
+            Dictionary with the number of 'added', 'updated', 'deleted' and
+            'unchanged' documents
+        """
+        with self.lock:
+            counts = {'added': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+            seen = set()
+            pending = []
+            for document in documents:
+                if document['key'] in seen:
+                    continue
+                seen.add(document['key'])
+                doc_id = self.keys.get(document['key'])
+                if doc_id is not None and self.documents[doc_id]['hash'] == document['hash']:
+                    counts['unchanged'] += 1
+                    continue
+                if doc_id is not None:
+                    self.remove_document(doc_id)
+                    counts['updated'] += 1
+                else:
+                    counts['added'] += 1
+                pending.append(document)
+
+            if replace_sources:
+                sources = {document['source'] for document in documents}
+                stale = [doc_id for doc_id, document in self.documents.items()
+                         if document['source'] in sources and document['key'] not in seen]
+                for doc_id in stale:
+                    self.remove_document(doc_id)
+                counts['deleted'] = len(stale)
+
+            if not pending and not counts['deleted']:
+                return counts
+
+            # 1. Number the new documents and index them in memory
+            segment_documents = []
+            for document in pending:
+                positions = self.word_positions(document['text'])
+                document = dict(document, id=self.next_id, length=sum(len(p) for p in positions.values()), words=sorted(positions))
+                self.next_id += 1
+                self.add_document(document, index_words=False)
+                for word, word_positions in positions.items():
+                    self.postings[word][document['id']] = word_positions
+                segment_documents.append(document)
+
+            # 2. Write them as a new segment, or merge everything once there are too many
+            os.makedirs(self.directory, exist_ok=True)
+            if len(self.segments) + 1 > MAX_SEGMENTS:
+                self.compact()
+            elif segment_documents:
+                self.segments.append(self.write_segment(segment_documents))
+
+            # 3. Publish the new state
+            self.write_manifest()
+            return counts
+
+    def first_match(self, doc_id, terms, phrases):
+        """Word position of the first phrase occurrence in a document, else of its first query word"""
+        for phrase in phrases:
+            starts = phrase_starts([self.postings[word][doc_id] for word in phrase])
+            if starts:
+                return starts[0]
+        positions = [self.postings[term][doc_id][0] for term in terms if doc_id in self.postings.get(term, {})]
+        return min(positions, default=0)
+
+    def write_segment(self, documents):
+        """Write documents and their postings to a new segment file, returning its name"""
+        # Postings as [document id, positions] pairs (JSON object keys would turn the ids into strings)
+        postings = defaultdict(list)
+        for document in documents:
+            for word in document['words']:
+                postings[word].append([document['id'], self.postings[word][document['id']]])
+        documents = [{field: value for field, value in document.items() if field != 'words'} for document in documents]
+
+        name = f"segment-{uuid.uuid4().hex}.json"
+        path = os.path.join(self.directory, name)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump({'documents': documents, 'postings': postings}, f, separators=(',', ':'))
+        os.replace(f"{path}.tmp", path)
+        return name
+
+    def write_manifest(self):
+        manifest = {'version': INDEX_VERSION, 'segments': self.segments, 'deleted': sorted(self.deleted), 'next_id': self.next_id}
+        with open(f"{self.manifest_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(f"{self.manifest_path}.tmp", self.manifest_path)
+        self.manifest_mtime = os.path.getmtime(self.manifest_path)
+
+        # Segments no longer listed are left over from a merge
+        for name in os.listdir(self.directory):
+            if name.startswith('segment-') and name.endswith('.json') and name not in self.segments:
+                os.remove(os.path.join(self.directory, name))
+
+    def compact(self):
+        """Merge all live documents into one segment (the manifest is written by the caller)"""
+        self.segments = [self.write_segment(list(self.documents.values()))] if self.documents else []
+        self.deleted = set()
+
+    def clear(self):
+        """Drop every document, so the next update rebuilds the index"""
+        with self.lock:
+            self.reset()
+            os.makedirs(self.directory, exist_ok=True)
+            self.write_manifest()
+
+    def search(self, query, year=None, make=None, autonomous_mode=None, limit=10):
+        """
+        Reports matching a query, best first
+
+        Args:
+            query: Words and "quoted phrases"; every phrase has to appear, and
+                without phrases at least one word has to
+            year: Accident year or list of years
+            make: Vehicle 1 make or list of makes (case-insensitive)
+            autonomous_mode: 'Yes'/'No' (or True/False)
+            limit: Maximum number of results
+
+        Returns:
+            List of dictionaries with key, score, year, the DOCUMENT_FIELDS and
+            a snippet of the narrative
+        """
+        terms, phrases = parse_query(query)
+        if not terms and not phrases:
+            return []
+
+        years = {int(y) for y in ([year] if isinstance(year, (int, str)) else year)} if year is not None else None
+        makes = filter_values(make)
+        modes = filter_values(autonomous_mode)
+
+        with self.lock:
+            n = len(self.documents)
+            if n == 0:
+                return []
+            average_length = self.total_length / n
+
+            def allowed(doc_id):
+                document = self.documents[doc_id]
+                return ((years is None or document['year'] in years)
+                        and matches_filter(document['make'], makes)
+                        and matches_filter(document['autonomous_mode'], modes))
+
+            # Term frequencies of every word and phrase, in the documents passing the filters
+            frequencies = []
+            for term in terms:
+                frequencies.append({doc_id: len(positions) for doc_id, positions in self.postings.get(term, {}).items()})
+
+            required = None
+            for phrase in phrases:
+                word_postings = [self.postings.get(word, {}) for word in phrase]
+                candidates = set.intersection(*(set(p) for p in word_postings)) if all(word_postings) else set()
+                counts = {}
+                for doc_id in candidates:
+                    starts = phrase_starts([p[doc_id] for p in word_postings])
+                    if starts:
+                        counts[doc_id] = len(starts)
+                frequencies.append(counts)
+                required = set(counts) if required is None else required & set(counts)
+
+            scores = defaultdict(float)
+            for frequency in frequencies:
+                # idf from all documents, so filters do not change the ranking within a slice
+                df = len(frequency)
+                if not df:
+                    continue
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                for doc_id, tf in frequency.items():
+                    if required is not None and doc_id not in required:
+                        continue
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc_id] / average_length)
+                    scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+            ranked = heapq.nlargest(limit, (item for item in scores.items() if allowed(item[0])), key=lambda item: (item[1], -item[0]))
+
+            results = []
+            for doc_id, score in ranked:
+                document = self.documents[doc_id]
+                result = {'key': document['key'], 'score': round(score, 4), 'year': document['year']}
+                result.update({field: document[field] for field in DOCUMENT_FIELDS})
+                result['snippet'] = snippet(document['text'], self.first_match(doc_id, terms, phrases))
+                results.append(result)
+            return results
+
+def is_crash_store(path):
+    return os.path.isdir(path) and any(name.startswith('year=') for name in os.listdir(path))
+
+def default_inputs():
+    """processed_crash_data_*.csv files of Data PreProcessing"""
+    return sorted(os.path.join(PROCESSED_DIR, name) for name in os.listdir(PROCESSED_DIR) if PROCESSED_PATTERN.match(name))
+
+def read_store(path):
+    """Columns of the Parquet store (Data PreProcessing/crash_store.py) that documents are made of"""
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(path, format='parquet', partitioning='hive')
+    columns = [column for column in ['accident_id', 'date', 'location', 'description', 'vehicle_1_make', 'autonomous_mode', 'year']
+               if column in dataset.schema.names]
+    return dataset.to_table(columns=columns).to_pandas()
+
+def load_documents(inputs):
+    """Documents of processed CSV files, directories of them, and Parquet store directories"""
+    documents = []
+    csv_inputs = []
+    for path in inputs:
+        if is_crash_store(path):
+            documents.extend(frame_documents(read_store(path), source=os.path.basename(os.path.normpath(path))))
+        elif os.path.isdir(path):
+            csv_inputs.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if PROCESSED_PATTERN.match(name))
+        else:
+            csv_inputs.append(path)
+    if csv_inputs:
+        documents.extend(frame_documents(load_frames(csv_inputs)))
+    return documents
+
+def add_index_arguments(parser):
+    parser.add_argument('inputs', nargs='*', help="Processed crash data CSVs, directories of them, or the Parquet store (default: Data PreProcessing/processed_crash_data_*.csv)")
+    parser.add_argument('--index', default=DEFAULT_INDEX_DIR, help=f"Index directory (default: {DEFAULT_INDEX_DIR}, or $CRASHML_SEARCH_INDEX_DIR)")
+    parser.add_argument('--rebuild', action='store_true', help="Drop the existing index first")
+
+def index_command(args):
+    """Entry point of `python -m crashml index`"""
+    inputs = args.inputs or default_inputs()
+    documents = load_documents(inputs)
+    if not documents:
+        logging.error(f"No narratives found in {', '.join(inputs) or PROCESSED_DIR}")
+        return 1
+
+    index = SearchIndex(args.index)
+    if args.rebuild:
+        index.clear()
+    counts = index.update(documents)
+    logging.info(f"{len(index)} reports in {args.index} ({counts['added']} added, {counts['updated']} updated, "
+                 f"{counts['deleted']} deleted, {counts['unchanged']} unchanged; {len(index.segments)} segments)")
+    return 0
+
+def add_search_arguments(parser):
+    parser.add_argument('query', help='Words and "quoted phrases"')
+    parser.add_argument('--index', default=DEFAULT_INDEX_DIR, help=f"Index directory (default: {DEFAULT_INDEX_DIR}, or $CRASHML_SEARCH_INDEX_DIR)")
+    parser.add_argument('--year', type=int, action='append', default=None, help="Accident year (repeatable)")
+    parser.add_argument('--make', action='append', default=None, help="Vehicle 1 make (repeatable)")
+    parser.add_argument('--autonomous-mode', choices=['Yes', 'No'], default=None, help="Only reports in or out of autonomous mode")
+    parser.add_argument('--limit', type=int, default=10, help="Maximum number of results (default: 10)")
+    parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+
+def search_command(args):
+    """Entry point of `python -m crashml search`"""
+    index = SearchIndex(args.index)
+    if not len(index):
+        logging.error(f"No search index in {args.index}; build one with `python -m crashml index`")
+        return 1
+
+    results = index.search(args.query, year=args.year, make=args.make, autonomous_mode=args.autonomous_mode, limit=args.limit)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    for result in results:
+        print(f"{result['score']:7.3f}  {result['key']}  {result['date'] or '?'}  {result['make'] or '?'}  autonomous={result['autonomous_mode'] or '?'}")
+        print(f"         {result['snippet']}")
+    if not results:
+        print("No matching reports")
+    return 0
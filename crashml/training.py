@@ -0,0 +1,483 @@
+"""
+Training of the fault models from the processed crash data
+
+    python -m crashml train --output-dir models/retrained      # labeled CSVs in "Ground Truth assigned by Agent Zero"
+    python -m crashml train "Data PreProcessing" --output-dir /tmp/models --jobs 4
+
+Rows of processed_crash_data_*.csv are turned into the same data points
+parse_dmv_report produces, and the feature matrix is built by
+build_feature_matrix over a ModelBundle, the code path predict_fault uses, so
+the models are trained on exactly the features they are served with. Reports
+found in more than one file are dropped first (crashml.dedup), so no copy of
+a test report is trained on.
+
+Random Forest, Gradient Boosting and Logistic Regression are tuned by grid
+search with stratified cross-validation, spread over all cores (n_jobs), and
+scored once on a held-out test split. The output directory gets the pickle
+files the UIs load, a rebuilt model bundle and training_report.json with the
+timings and accuracy of every stage. It has to be named explicitly, so the
+shipped CrashML-UI models are only replaced by copying the new files there.
+
+The text features come from the typed narrative (the description column)
+on both sides: the pipeline serves the form narrative as 'description' too,
+and only falls back to the whole report text when a PDF has none.
+
+The vectorized feature matrix is cached on disk, keyed by the content of the
+input files and the feature settings, so tuning again on unchanged data skips
+straight to the search.
+"""
+import os
+import glob
+import json
+import time
+import pickle
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+from .form_codes import WEATHER_LABELS, LIGHTING_LABELS, ROAD_LABELS, ROADWAY_SURFACE_LABELS, codes_matching, has_code
+from .parsing import WEATHER_CONDITIONS, ROAD_CONDITIONS, LIGHTING_CONDITIONS
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_TRAINING_DIR = os.path.join(REPO_ROOT, 'Ground Truth assigned by Agent Zero')
+TRAINING_PATTERN = 'processed_crash_data_*.csv'
+REPORT_FILENAME = 'training_report.json'
+
+DEFAULT_FEATURE_CACHE_DIR = os.environ.get(
+    'CRASHML_FEATURE_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'crashml', 'features')
+)
+
+# Bump whenever data point or feature construction changes, so stale matrices are never reused
+FEATURE_CACHE_VERSION = 2
+
+STRUCTURED_FEATURES = [
+    'vehicle_1_moving', 'vehicle_2_moving', 'autonomous_mode',
+    'impact_front', 'impact_rear', 'impact_side',
+    'weather_issue', 'road_issue', 'dark_condition',
+]
+
+# Same TF-IDF settings as the shipped vectorizer
+VECTORIZER_PARAMS = {'max_features': 200, 'ngram_range': (1, 2), 'stop_words': 'english'}
+
+# Vehicle 1 checkbox codes whose form label parse_dmv_report would flag in the report text
+WEATHER_ISSUE_CODES = codes_matching(WEATHER_LABELS, WEATHER_CONDITIONS)
+ROAD_ISSUE_CODES = codes_matching(ROAD_LABELS, ROAD_CONDITIONS) + codes_matching(ROADWAY_SURFACE_LABELS, ROAD_CONDITIONS)
+DARK_CONDITION_CODES = codes_matching(LIGHTING_LABELS, LIGHTING_CONDITIONS)
+
+# Ground_Truth (reviewer verdicts) and ground_truth (fault split from the report) to FAULT_LABELS
+GROUND_TRUTH_LABELS = [
+    ('not autonomous', 0),
+    ('not autonmous', 0),
+    ('shared', 1),
+    ('investigation', 1),
+    ('autonomous vehicle', 2),
+    ('vehicle 2: 100%', 0),
+    ('undetermined', 1),
+    ('vehicle 1 (av operator): 100%', 2),
+]
+LABEL_COLUMNS = ['Ground_Truth', 'ground_truth']
+
+# Grids are kept small enough for a full retrain to take minutes on a laptop
+PARAM_GRIDS = {
+    'Random Forest': {
+        'n_estimators': [100, 300],
+        'max_depth': [None, 20],
+        'min_samples_leaf': [1, 2],
+        'class_weight': [None, 'balanced'],
+    },
+    'Gradient Boosting': {
+        'n_estimators': [100, 200],
+        'learning_rate': [0.05, 0.1],
+        'max_depth': [2, 3],
+    },
+    'Logistic Regression': {
+        'C': [0.1, 1.0, 10.0],
+        'class_weight': [None, 'balanced'],
+    },
+}
+
+def make_estimators(seed):
+    """Untuned estimators, in the order the bundle lists them"""
+    from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+    from sklearn.linear_model import LogisticRegression
+
+    return {
+        'Random Forest': RandomForestClassifier(n_estimators=100, random_state=seed),
+        'Gradient Boosting': GradientBoostingClassifier(n_estimators=100, random_state=seed),
+        'Logistic Regression': LogisticRegression(max_iter=1000, random_state=seed),
+    }
+
+def fault_label(value):
+    """FAULT_LABELS key for a ground truth cell, or None when it is empty or names no party"""
+    if not isinstance(value, str):
+        return None
+    value = value.strip().lower()
+    for prefix, label in GROUND_TRUTH_LABELS:
+        if value.startswith(prefix):
+            return label
+    return None
+
+def row_labels(df):
+    """Label of every row, from the first label column that has one"""
+    labels = pd.Series([None] * len(df), index=df.index, dtype=object)
+    for column in LABEL_COLUMNS:
+        if column in df:
+            labels = labels.where(labels.notna(), df[column].map(fault_label))
+    return labels
+
+def data_points_from_frame(df):
+    """
+    Model inputs for processed crash data rows, with the fields parse_dmv_report sets
+
+    Args:
+        df: Rows of processed_crash_data_*.csv
+
+    Returns:
+        List of data point dicts (structured features and 'description')
+    """
+    df = df.fillna('')
+
+    def has(column, *words):
+        text = df[column].astype(str).str.lower()
+        return np.logical_or.reduce([text.str.contains(word, regex=False) for word in words]).astype(int)
+
+    data_points = pd.DataFrame({
+        'vehicle_1_moving': (df['vehicle_1_moving'] == 'Yes').astype(int),
+        'vehicle_2_moving': (df['vehicle_2_moving'] == 'Yes').astype(int),
+        'autonomous_mode': (df['autonomous_mode'] == 'Yes').astype(int),
+        'impact_front': has('impact_points', 'front'),
+        'impact_rear': has('impact_points', 'rear'),
+        'impact_side': has('impact_points', 'side'),
+        'weather_issue': has_code(df['weather_conditions'], WEATHER_ISSUE_CODES),
+        'road_issue': has_code(df['road_conditions'], ROAD_ISSUE_CODES) | has_code(df['roadway_surface'], ROAD_ISSUE_CODES),
+        'dark_condition': has_code(df['lighting_conditions'], DARK_CONDITION_CODES),
+        'description': df['description'].astype(str),
+    })
+    return data_points.to_dict('records')
+
+def training_files(inputs=None):
+    """processed_crash_data_*.csv files from the given files and directories (default: DEFAULT_TRAINING_DIR)"""
+    paths = []
+    for path in inputs or [DEFAULT_TRAINING_DIR]:
+        if os.path.isdir(path):
+            paths.extend(sorted(glob.glob(os.path.join(path, TRAINING_PATTERN))))
+        else:
+            paths.append(path)
+    return paths
+
+def load_training_data(paths, dedup=True):
+    """
+    Labeled data points from processed crash data files
+
+    Args:
+        paths: processed_crash_data_*.csv files
+        dedup: Keep one report per cluster of near-duplicates (see crashml.dedup)
+
+    Returns:
+        Tuple of (data points, labels array, summary dict with row counts per file and class)
+    """
+    frames = []
+    summary = {'files': {}, 'rows': 0, 'labeled': 0}
+    for path in paths:
+        df = pd.read_csv(path)
+        file_labels = row_labels(df)
+        labeled = df[file_labels.notna()].assign(fault_label=file_labels[file_labels.notna()].astype(int))
+        frames.append(labeled)
+
+        summary['files'][os.path.basename(path)] = {'rows': len(df), 'labeled': len(labeled)}
+        summary['rows'] += len(df)
+        summary['labeled'] += len(labeled)
+
+    labeled = pd.concat(frames, ignore_index=True)
+    if dedup:
+        from .dedup import deduplicate
+
+        deduplicated, clusters = deduplicate(labeled.drop(columns=LABEL_COLUMNS + ['fault_label'], errors='ignore'))
+        conflicting = sum(labeled['fault_label'].iloc[cluster['rows']].nunique() > 1 for cluster in clusters)
+        summary['duplicates'] = len(labeled) - len(deduplicated)
+        summary['duplicate_label_conflicts'] = int(conflicting)
+        labeled = labeled.loc[deduplicated.index]
+
+    labels = labeled['fault_label'].to_numpy(dtype=int)
+    summary['classes'] = {int(label): int(count) for label, count in zip(*np.unique(labels, return_counts=True))}
+    return data_points_from_frame(labeled), labels, summary
+
+def feature_cache_key(paths, test_size, seed, dedup=True):
+    """Hash of everything the cached feature matrix depends on"""
+    digest = hashlib.sha256(json.dumps({
+        'version': FEATURE_CACHE_VERSION,
+        'dedup': dedup,
+        'vectorizer': {key: list(value) if isinstance(value, tuple) else value for key, value in VECTORIZER_PARAMS.items()},
+        'structured': STRUCTURED_FEATURES,
+        'test_size': test_size,
+        'seed': seed,
+    }, sort_keys=True).encode())
+    for path in paths:
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+def build_training_features(data_points, labels, test_size, seed):
+    """
+    Split the data, fit the vectorizer on the training part and build both feature matrices
+
+    The vectorizer only sees training narratives, so the test score is not
+    flattered by terms picked from the test reports.
+
+    Returns:
+        Dictionary with the fitted 'vectorizer', 'feature_names', 'X_train',
+        'X_test', 'y_train' and 'y_test'
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.model_selection import train_test_split
+    from .model_bundle import ModelBundle
+    from .inference import build_feature_matrix
+
+    indices = np.arange(len(data_points))
+    train_idx, test_idx = train_test_split(indices, test_size=test_size, random_state=seed, stratify=labels)
+    train_points = [data_points[i] for i in train_idx]
+    test_points = [data_points[i] for i in test_idx]
+
+    vectorizer = TfidfVectorizer(**VECTORIZER_PARAMS)
+    vectorizer.fit([data_point['description'] for data_point in train_points])
+    feature_names = STRUCTURED_FEATURES + list(vectorizer.get_feature_names_out())
+
+    # A model-less bundle, so features come from the serving code
+    layout = ModelBundle({}, vectorizer, feature_names, {'structured_features': STRUCTURED_FEATURES}, version='training')
+
+    return {
+        'vectorizer': vectorizer,
+        'feature_names': feature_names,
+        'X_train': build_feature_matrix(train_points, layout),
+        'X_test': build_feature_matrix(test_points, layout),
+        'y_train': labels[train_idx],
+        'y_test': labels[test_idx],
+    }
+
+def load_or_build_features(paths, data_points, labels, test_size, seed, cache_dir=DEFAULT_FEATURE_CACHE_DIR, dedup=True):
+    """build_training_features, reusing the matrices from cache_dir when the inputs are unchanged (cache_dir=None disables it)"""
+    import joblib
+
+    if cache_dir is None:
+        return build_training_features(data_points, labels, test_size, seed), False
+
+    path = os.path.join(cache_dir, f"features-{feature_cache_key(paths, test_size, seed, dedup)}.joblib")
+    if os.path.exists(path):
+        try:
+            return joblib.load(path), True
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable feature cache {path}: {e}")
+
+    features = build_training_features(data_points, labels, test_size, seed)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    joblib.dump(features, tmp_path)
+    os.replace(tmp_path, path)
+    return features, False
+
+def evaluate(model, X_test, y_test):
+    """Accuracy, macro F1 and confusion matrix on the held-out split"""
+    from sklearn.metrics import accuracy_score, f1_score, confusion_matrix
+
+    predicted = model.predict(X_test)
+    return {
+        'accuracy': float(accuracy_score(y_test, predicted)),
+        'f1_macro': float(f1_score(y_test, predicted, average='macro')),
+        'confusion_matrix': confusion_matrix(y_test, predicted, labels=model.classes_).tolist(),
+    }
+
+def train_models(X_train, y_train, cv=5, jobs=-1, search=True, seed=42):
+    """
+    Tune and fit every model
+
+    Each model's candidates and folds run in parallel over jobs processes; the
+    models themselves are searched one after the other so the cores are never
+    oversubscribed.
+
+    Args:
+        X_train: Training feature matrix
+        y_train: Training labels
+        cv: Cross-validation folds
+        jobs: Parallel jobs for the search (-1: all cores)
+        search: Grid search the PARAM_GRIDS; otherwise only cross-validate the defaults
+        seed: Random state of the estimators and the folds
+
+    Returns:
+        Tuple of (fitted models by name, report dict by name)
+    """
+    from sklearn.model_selection import GridSearchCV, StratifiedKFold
+
+    folds = StratifiedKFold(n_splits=cv, shuffle=True, random_state=seed)
+    models, reports = {}, {}
+    for model_name, estimator in make_estimators(seed).items():
+        start = time.perf_counter()
+        grid = PARAM_GRIDS[model_name] if search else {}
+        searcher = GridSearchCV(estimator, grid, cv=folds, scoring='accuracy', n_jobs=jobs, refit=True)
+        searcher.fit(X_train, y_train)
+        seconds = time.perf_counter() - start
+
+        best = searcher.best_index_
+        models[model_name] = searcher.best_estimator_
+        reports[model_name] = {
+            'best_params': searcher.best_params_,
+            'cv_accuracy_mean': float(searcher.cv_results_['mean_test_score'][best]),
+            'cv_accuracy_std': float(searcher.cv_results_['std_test_score'][best]),
+            'candidates': len(searcher.cv_results_['params']),
+            'seconds': seconds,
+        }
+        logging.info(f"{model_name}: cv accuracy {reports[model_name]['cv_accuracy_mean']:.3f} with {searcher.best_params_} ({seconds:.1f}s)")
+    return models, reports
+
+def write_model_files(output_dir, models, features, metadata):
+    """Write the pickle files the UIs load and rebuild the bundle from them; returns the bundle path"""
+    from .model_bundle import LEGACY_FILES, build_bundle
+
+    os.makedirs(output_dir, exist_ok=True)
+    sample = pd.DataFrame(features['X_train'][:5].toarray(), columns=features['feature_names'])
+    files = {
+        LEGACY_FILES['models']: models,
+        LEGACY_FILES['vectorizer']: features['vectorizer'],
+        LEGACY_FILES['feature_names']: features['feature_names'],
+        LEGACY_FILES['metadata']: metadata,
+        'sample_training_data.pkl': sample,
+    }
+    for filename, value in files.items():
+        path = os.path.join(output_dir, filename)
+        with open(f"{path}.tmp", 'wb') as f:
+            pickle.dump(value, f)
+        os.replace(f"{path}.tmp", path)
+
+    return build_bundle(output_dir)
+
+def train(inputs=None, output_dir=None, cv=5, jobs=-1, search=True, test_size=0.1, seed=42, cache_dir=DEFAULT_FEATURE_CACHE_DIR, dedup=True):
+    """
+    Train, evaluate and write every model
+
+    Args:
+        inputs: processed_crash_data_*.csv files or directories holding them (default: DEFAULT_TRAINING_DIR)
+        output_dir: Where to write the model files and report; required, so the shipped models are never overwritten by accident
+        cv: Cross-validation folds
+        jobs: Parallel jobs for the search (-1: all cores)
+        search: Grid search hyperparameters; otherwise cross-validate the defaults
+        test_size: Fraction of labeled reports held out for the test scores
+        seed: Random state of the split, folds and estimators
+        cache_dir: Feature matrix cache directory (None: always rebuild)
+        dedup: Drop near-duplicate reports before splitting
+
+    Returns:
+        The training report dict (also written to training_report.json)
+    """
+    if not output_dir:
+        raise ValueError("An output directory is required")
+    timings = {}
+    started = time.perf_counter()
+
+    # 1. Labeled data points
+    start = time.perf_counter()
+    paths = training_files(inputs)
+    if not paths:
+        raise ValueError(f"No {TRAINING_PATTERN} files found in {inputs or DEFAULT_TRAINING_DIR}")
+    data_points, labels, data_summary = load_training_data(paths, dedup=dedup)
+    timings['load'] = time.perf_counter() - start
+    logging.info(f"Loaded {data_summary['labeled']} labeled of {data_summary['rows']} reports from {len(paths)} files, {data_summary.get('duplicates', 0)} duplicates dropped, classes {data_summary['classes']}")
+
+    # Stratified folds need every class in every fold
+    smallest_class = min(data_summary['classes'].values())
+    if smallest_class < 2:
+        raise ValueError(f"Every class needs at least 2 labeled reports, got {data_summary['classes']}")
+    folds = min(cv, int(smallest_class * (1 - test_size)))
+    if folds < cv:
+        logging.warning(f"Only {smallest_class} reports in the smallest class; using {folds}-fold cross-validation")
+    folds = max(folds, 2)
+
+    # 2. Feature matrices, through the serving feature code
+    start = time.perf_counter()
+    features, cached = load_or_build_features(paths, data_points, labels, test_size, seed, cache_dir=cache_dir, dedup=dedup)
+    timings['features'] = time.perf_counter() - start
+    logging.info(f"{'Loaded cached' if cached else 'Built'} feature matrices: {features['X_train'].shape[0]} train, {features['X_test'].shape[0]} test, {len(features['feature_names'])} features")
+
+    # 3. Parallel search and cross-validation
+    start = time.perf_counter()
+    models, model_reports = train_models(features['X_train'], features['y_train'], cv=folds, jobs=jobs, search=search, seed=seed)
+    timings['train'] = time.perf_counter() - start
+
+    # 4. Held-out scores
+    start = time.perf_counter()
+    for model_name, model in models.items():
+        model_reports[model_name]['test'] = evaluate(model, features['X_test'], features['y_test'])
+        logging.info(f"{model_name}: test accuracy {model_reports[model_name]['test']['accuracy']:.3f}, macro F1 {model_reports[model_name]['test']['f1_macro']:.3f}")
+    timings['evaluate'] = time.perf_counter() - start
+
+    # 5. Model files and bundle
+    start = time.perf_counter()
+    metadata = {
+        'num_features': len(features['feature_names']),
+        'feature_names': features['feature_names'],
+        'num_samples_trained': int(features['X_train'].shape[0]),
+        'models': list(models),
+        'vectorizer_vocab_size': len(features['vectorizer'].vocabulary_),
+        'vectorizer_max_features': VECTORIZER_PARAMS['max_features'],
+        'structured_features': STRUCTURED_FEATURES,
+        'training_split_info': {
+            'X_train_shape': features['X_train'].shape,
+            'X_test_shape': features['X_test'].shape,
+            'cv_folds': folds,
+        },
+        'best_params': {model_name: report['best_params'] for model_name, report in model_reports.items()},
+    }
+    bundle_path = write_model_files(output_dir, models, features, metadata)
+    timings['write'] = time.perf_counter() - start
+    timings['total'] = time.perf_counter() - started
+
+    report = {
+        'data': data_summary,
+        'inputs': paths,
+        'feature_cache_hit': cached,
+        'num_features': len(features['feature_names']),
+        'train_size': int(features['X_train'].shape[0]),
+        'test_size': int(features['X_test'].shape[0]),
+        'cv_folds': folds,
+        'jobs': jobs,
+        'search': search,
+        'models': model_reports,
+        'timings_s': timings,
+        'bundle': bundle_path,
+    }
+    with open(os.path.join(output_dir, REPORT_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+def add_train_arguments(parser):
+    parser.add_argument('inputs', nargs='*', help="processed_crash_data_*.csv files or directories (default: Ground Truth assigned by Agent Zero)")
+    parser.add_argument('--output-dir', required=True, help="Where to write the model files, bundle and report (copy them to CrashML-UI to serve them)")
+    parser.add_argument('--cv', type=int, default=5, help="Cross-validation folds (default: 5)")
+    parser.add_argument('--jobs', type=int, default=-1, help="Parallel search jobs (default: -1, all cores)")
+    parser.add_argument('--test-size', type=float, default=0.1, help="Fraction of labeled reports held out for testing (default: 0.1)")
+    parser.add_argument('--seed', type=int, default=42, help="Random state of the split, folds and models (default: 42)")
+    parser.add_argument('--no-search', action='store_true', help="Cross-validate the default hyperparameters instead of searching")
+    parser.add_argument('--no-cache', action='store_true', help="Rebuild the feature matrices instead of using the cache")
+    parser.add_argument('--no-dedup', action='store_true', help="Keep near-duplicate reports")
+
+def train_command(args):
+    """Entry point of `python -m crashml train`"""
+    try:
+        report = train(
+            inputs=args.inputs,
+            output_dir=args.output_dir,
+            cv=args.cv,
+            jobs=args.jobs,
+            search=not args.no_search,
+            test_size=args.test_size,
+            seed=args.seed,
+            cache_dir=None if args.no_cache else DEFAULT_FEATURE_CACHE_DIR,
+            dedup=not args.no_dedup
+        )
+    except (OSError, ValueError) as e:
+        logging.error(f"Training failed: {e}")
+        return 1
+
+    logging.info(f"Trained {len(report['models'])} models in {report['timings_s']['total']:.1f}s; bundle {report['bundle']}")
+    return 0
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# crashml lives at the repository root; the preprocessing scripts import each other by module name
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'Data PreProcessing'))
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from scipy.special import expit, softmax
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+from crashml.attribution import LinearExplainer, TreeExplainer, make_explainer
+
+def dataset(n_classes, seed=0):
+    rng = np.random.RandomState(seed)
+    features = rng.rand(120, 6)
+    # Sparse like the TF-IDF + structured feature matrix, with some all-zero cells
+    features[features < 0.3] = 0.0
+    labels = (features[:, 0] * 2 + features[:, 1] + rng.rand(120) * 0.5).astype(int) % n_classes
+    return sparse.csr_matrix(features), labels
+
+def to_probability(model, space, raw):
+    """Model probabilities from the explainer's output space"""
+    if space == 'probability':
+        return raw
+    if raw.shape[1] == 2:
+        # Binary models put the whole score on the positive class, 0 on the other
+        positive = expit(raw[:, 1] - raw[:, 0])
+        return np.column_stack([1 - positive, positive])
+    return softmax(raw, axis=1)
+
+@pytest.mark.parametrize('n_classes', [2, 3])
+@pytest.mark.parametrize('build', [
+    lambda: RandomForestClassifier(n_estimators=15, max_depth=4, random_state=0),
+    lambda: GradientBoostingClassifier(n_estimators=20, max_depth=3, random_state=0),
+    lambda: LogisticRegression(max_iter=1000),
+])
+def test_contributions_add_up_to_predict_proba(build, n_classes):
+    features, labels = dataset(n_classes)
+    model = build().fit(features, labels)
+    explainer = make_explainer(model)
+
+    bias, contributions = explainer.contributions(features[:40])
+    assert bias.shape == (40, n_classes)
+    assert contributions.shape == (40, features.shape[1], n_classes)
+
+    raw = bias + contributions.sum(axis=1)
+    np.testing.assert_allclose(to_probability(model, explainer.space, raw), model.predict_proba(features[:40]), atol=1e-8)
+
+@pytest.mark.parametrize('build', [
+    lambda: RandomForestClassifier(n_estimators=15, max_depth=4, random_state=0),
+    lambda: GradientBoostingClassifier(n_estimators=20, max_depth=3, random_state=0),
+])
+def test_tree_bias_is_the_same_for_every_report(build):
+    # bias is output minus contributions, so it only stays constant when the path walk is right
+    features, labels = dataset(3)
+    model = build().fit(features, labels)
+    bias, _ = TreeExplainer(model).contributions(features)
+    np.testing.assert_allclose(bias, np.broadcast_to(bias[0], bias.shape), atol=1e-8)
+
+def test_forest_bias_is_the_mean_root_value():
+    features, labels = dataset(3)
+    model = RandomForestClassifier(n_estimators=15, max_depth=4, random_state=0).fit(features, labels)
+    bias, _ = TreeExplainer(model).contributions(features[:5])
+
+    roots = np.array([estimator.tree_.value[0, 0] for estimator in model.estimators_])
+    roots = roots / roots.sum(axis=1, keepdims=True)
+    np.testing.assert_allclose(bias[0], roots.mean(axis=0), atol=1e-8)
+
+def test_linear_contributions_are_coefficient_times_value():
+    features, labels = dataset(3)
+    model = LogisticRegression(max_iter=1000).fit(features, labels)
+    bias, contributions = LinearExplainer(model).contributions(features[:3])
+
+    dense = features[:3].toarray()
+    np.testing.assert_allclose(contributions[1, :, 2], dense[1] * model.coef_[2])
+    np.testing.assert_allclose(bias[0], model.intercept_)
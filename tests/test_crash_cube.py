@@ -0,0 +1,49 @@
+import logging
+import os
+import shutil
+
+import pandas as pd
+
+from crash_cube import build_cube, cube_dimensions, load_processed_csvs
+from crash_store import load_processed_csv
+
+PROCESSED_2023 = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Data PreProcessing', 'processed_crash_data_2023.csv')
+
+def test_committed_csv_gets_times_from_the_form_checkboxes():
+    stored = pd.read_csv(PROCESSED_2023)
+    assert 'time_band' not in stored.columns
+    # The committed file took am_pm from the written hour: nothing in the evening
+    assert set(cube_dimensions(stored.assign(year=2023))['time_band']) <= {'Midnight', 'Morning', 'Afternoon', 'Unknown'}
+
+    df = load_processed_csv(PROCESSED_2023)
+    assert list(df.columns[df.columns.get_loc('am_pm'):][:3]) == ['am_pm', 'weekday', 'time_band']
+    assert (df['am_pm'] != stored['am_pm']).sum() == 81
+    # Every other column is read as committed
+    pd.testing.assert_frame_equal(df.drop(columns=['am_pm', 'weekday', 'time_band', 'year']),
+                                  stored.loc[:, ~stored.columns.str.startswith('Unnamed')].drop(columns=['am_pm']))
+
+    bands = cube_dimensions(df)['time_band'].value_counts()
+    assert bands['Evening'] > 0 and bands['Night'] > 0
+
+def test_custom_bands_use_the_corrected_am_pm():
+    df = load_processed_csvs([PROCESSED_2023])
+    default = build_cube(df).groupby('time_band')['count'].sum()
+    halves = build_cube(df, [(0, 'AM'), (12, 'PM')]).groupby('time_band')['count'].sum()
+    assert halves['PM'] == default[['Afternoon', 'Evening', 'Night']].sum()
+
+def test_unknown_csv_is_kept_as_is_with_a_warning(tmp_path, caplog):
+    path = tmp_path / 'processed_crash_data_2023.csv'
+    shutil.copy(PROCESSED_2023, path)
+    other = tmp_path / 'my_crashes_2023.csv'
+    shutil.copy(PROCESSED_2023, other)
+
+    with caplog.at_level(logging.WARNING):
+        df = load_processed_csv(str(other))
+        cube_dimensions(df)
+    assert 'time_band' not in df.columns
+    assert 'no extracts to read the AM/PM checkboxes from' in caplog.text
+    assert '131 rows have no time_band' in caplog.text
+
+    # Same name, but rows that do not line up with the extracts
+    pd.read_csv(path).iloc[::-1].to_csv(path, index=False)
+    assert 'time_band' not in load_processed_csv(str(path)).columns
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from crash_datetime import parse_time_band_spec, time_bands
+
+def test_default_bands():
+    hours = np.array([0, 3, 4, 11, 12, 15, 16, 19, 20, 23, np.nan])
+    assert list(time_bands(hours)) == ['Midnight', 'Midnight', 'Morning', 'Morning', 'Afternoon', 'Afternoon',
+                                       'Evening', 'Evening', 'Night', 'Night', 'Unknown']
+
+def test_wrap_around_band_reuses_its_label():
+    bands = parse_time_band_spec('18:Night, 0:Night,6:Day')
+    assert bands == [(0, 'Night'), (6, 'Day'), (18, 'Night')]
+    assert list(time_bands(np.array([2, 6, 17, 18, 23]), bands)) == ['Night', 'Day', 'Day', 'Night', 'Night']
+
+@pytest.mark.parametrize('spec, message', [
+    ('6:Day,18:Night', 'first starts at 6'),
+    ('0:Night,6:Day,6:Morning', 'more than once at hour 6'),
+    ('0:Night,Day', "'Day' is not start hour:label"),
+    ('0:Night,24:Late', 'outside 0-23'),
+])
+def test_invalid_specs_are_rejected(spec, message):
+    with pytest.raises(ValueError, match=message):
+        parse_time_band_spec(spec)
@@ -0,0 +1,70 @@
+import logging
+import os
+
+import pandas as pd
+import pytest
+
+from crash_store import WATERMARK_FILENAME, load_watermark, read_crash_store, store_table
+from pre_process import preprocess_crash_data, preprocess_incremental
+
+RAW_EXTRACT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Combined_Extracted Data', 'extracted_pdf_data_22019.csv')
+
+@pytest.fixture
+def extract(tmp_path):
+    """First reports of a real extraction, under a name carrying the year"""
+    df = pd.read_csv(RAW_EXTRACT).head(8)
+    path = tmp_path / 'extracted_pdf_data_2019.csv'
+    df.to_csv(path, index=False)
+    return df, str(path)
+
+def stored_ids(root):
+    return read_crash_store(root, columns=['accident_id'])['accident_id'].tolist()
+
+def assert_each_report_once(root, expected):
+    ids = stored_ids(root)
+    assert len(ids) == len(set(ids))
+    assert set(ids) == set(expected)
+
+def test_full_write_then_incremental_keeps_each_report_once(extract, tmp_path, capsys):
+    df, path = extract
+    root = str(tmp_path / 'store')
+
+    full = preprocess_crash_data(path, store_root=root)
+    assert_each_report_once(root, full['accident_id'])
+    assert len(load_watermark(root)) == len(df)
+
+    # The full write recorded every report, so nothing is pending
+    delta = preprocess_incremental(path, store_root=root)
+    assert len(delta) == 0
+    assert 'all 8 reports already processed' in capsys.readouterr().out
+    assert_each_report_once(root, full['accident_id'])
+
+    # One changed report and one new one
+    df.loc[2, 'MODEL'] = 'Changed Model'
+    extra = df.iloc[[0]].assign(source_file='new_report.pdf')
+    pd.concat([df, extra], ignore_index=True).to_csv(path, index=False)
+    delta = preprocess_incremental(path, store_root=root)
+    assert len(delta) == 2
+
+    assert_each_report_once(root, list(full['accident_id']) + [delta['accident_id'].iloc[-1]])
+    stored = read_crash_store(root)
+    changed = stored.loc[stored['accident_id'] == full['accident_id'].iloc[2], 'vehicle_1_model']
+    assert changed.tolist() == ['Changed Model']
+
+def test_upsert_replaces_reports_missing_from_the_watermark(extract, tmp_path):
+    _, path = extract
+    root = str(tmp_path / 'store')
+    full = preprocess_crash_data(path, store_root=root)
+
+    # A store from before full writes kept the watermark: every report looks new
+    os.remove(os.path.join(root, WATERMARK_FILENAME))
+    assert len(preprocess_incremental(path, store_root=root)) == len(full)
+    assert_each_report_once(root, full['accident_id'])
+
+def test_rows_without_a_year_are_logged(caplog):
+    df = pd.DataFrame({'accident_id': [1, 2], 'date': ['3/4/2019', '']})
+    with caplog.at_level(logging.WARNING):
+        table = store_table(df)
+    assert table.num_rows == 1
+    assert 'Not storing 1 rows' in caplog.text
+    assert 'accident_id 2' in caplog.text
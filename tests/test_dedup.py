@@ -0,0 +1,66 @@
+import pandas as pd
+
+from crashml.dedup import deduplicate, find_duplicates, narratives
+
+STORY = (
+    'A Waymo Autonomous Vehicle was traveling northbound on Valencia Street in autonomous mode '
+    'when a passenger vehicle traveling in the adjacent lane changed lanes and made contact with '
+    'the rear bumper of the Waymo AV. There were no injuries and police were not called to the scene.'
+)
+OTHER_STORIES = [
+    'A Cruise AV was stopped at a red light on Market Street when a cyclist struck the left side mirror while passing between lanes of traffic.',
+    'A Zoox test vehicle in conventional mode was reversing out of a parking space and contacted a parked sedan at low speed causing minor damage.',
+    'A Pony.ai vehicle operating autonomously was making a right turn onto Fremont Boulevard when a pickup truck ran the stop sign and hit its front.',
+]
+
+def fixture():
+    rows = [
+        {'date': '3/4/2023', 'time': '10:15', 'vehicle_1_make': 'Waymo', 'vehicle_1_model': 'Jaguar I-Pace', 'location': 'Valencia St', 'description': STORY},
+        {'date': '5/1/2023', 'time': '14:00', 'vehicle_1_make': 'Cruise', 'vehicle_1_model': 'Bolt', 'location': 'Market St', 'description': OTHER_STORIES[0]},
+        # Redacted re-upload of row 0: one word changed, location left blank
+        {'date': '3/4/2023', 'time': '10:15', 'vehicle_1_make': 'Waymo', 'vehicle_1_model': 'Jaguar I-Pace', 'location': '', 'description': STORY.replace('Valencia Street', '[REDACTED] Street')},
+        {'date': '6/9/2023', 'time': '09:30', 'vehicle_1_make': 'Zoox', 'vehicle_1_model': 'Highlander', 'location': 'Foster City', 'description': OTHER_STORIES[1]},
+        {'date': '7/2/2023', 'time': '16:45', 'vehicle_1_make': 'Pony.ai', 'vehicle_1_model': 'Lexus RX', 'location': 'Fremont Blvd', 'description': OTHER_STORIES[2]},
+        # Same report as row 1 without a narrative: only the exact key links it
+        {'date': '5/1/2023', 'time': '14:00', 'vehicle_1_make': 'CRUISE', 'vehicle_1_model': 'Bolt', 'location': 'Market St', 'description': ''},
+        # Same date and make as row 3 but a different report
+        {'date': '6/9/2023', 'time': '11:30', 'vehicle_1_make': 'Zoox', 'vehicle_1_model': 'Highlander', 'location': 'Foster City', 'description': OTHER_STORIES[1].replace('parked sedan', 'bicycle rack').replace('reversing out of a parking space', 'pulling over to the curb')},
+    ]
+    return pd.DataFrame(rows)
+
+def test_finds_the_known_duplicates():
+    clusters = find_duplicates(fixture())
+    by_rows = {tuple(cluster['rows']): cluster for cluster in clusters}
+    assert set(by_rows) == {(0, 2), (1, 5)}
+
+    # A pair linked by its narrative is not recounted as a key match
+    assert by_rows[(0, 2)]['matched_on'] == ['narrative']
+    assert by_rows[(0, 2)]['min_similarity'] >= 0.8
+    assert by_rows[(1, 5)]['matched_on'] == ['key']
+
+def test_canonical_row_is_the_most_complete():
+    clusters = {tuple(cluster['rows']): cluster['canonical'] for cluster in find_duplicates(fixture())}
+    # Row 0 has the location, row 1 the narrative
+    assert clusters == {(0, 2): 0, (1, 5): 1}
+
+def test_deduplicate_keeps_one_row_per_cluster_in_order():
+    kept, clusters = deduplicate(fixture())
+    assert list(kept.index) == [0, 1, 3, 4, 6]
+    assert len(clusters) == 2
+
+def test_source_file_links_re_extractions_across_paths():
+    df = pd.DataFrame([
+        {'source_file': 'reports_2019/Waymo_031219.pdf', 'date_of_accident': '', 'address_2': ''},
+        {'source_file': 'C:\\extract\\waymo_031219.PDF', 'date_of_accident': '3/12/2019', 'address_2': ''},
+        {'source_file': 'reports_2019/Cruise_040119.pdf', 'date_of_accident': '', 'address_2': ''},
+    ])
+    clusters = find_duplicates(df)
+    assert [cluster['rows'] for cluster in clusters] == [[0, 1]]
+    assert clusters[0]['canonical'] == 1
+
+def test_raw_narrative_is_the_first_long_address_2_cell():
+    df = pd.DataFrame({
+        'Address_2': ['short', 'x' * 60],
+        'Address_2.1': [STORY, STORY],
+    })
+    assert list(narratives(df)) == [STORY, 'x' * 60]
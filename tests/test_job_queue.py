@@ -0,0 +1,45 @@
+import time
+
+from crashml.job_queue import JobQueue
+
+def double(value):
+    return value * 2
+
+def wait_for(queue, job_id, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = queue.get(job_id)
+        if status['status'] in ('done', 'failed'):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} still {status['status']}")
+
+def test_result_passes_through_on_result():
+    queue = JobQueue(workers=1, on_result=lambda result: {'value': result})
+    try:
+        status = wait_for(queue, queue.submit(double, 21, filename='a.pdf'))
+        assert status['status'] == 'done'
+        assert status['result'] == {'value': 42}
+        assert status['filename'] == 'a.pdf'
+        assert status['finished'] is not None
+    finally:
+        queue.shutdown()
+
+def test_failing_on_result_fails_the_job_and_finishes_it():
+    def broken(result):
+        raise KeyError('metrics')
+
+    queue = JobQueue(workers=1, on_result=broken, result_ttl=0)
+    try:
+        job_id = queue.submit(double, 1)
+        status = wait_for(queue, job_id)
+        assert status['status'] == 'failed'
+        assert 'metrics' in status['error']
+        assert status['finished'] is not None
+
+        # Finished jobs expire, so it is dropped on the next submit
+        time.sleep(0.01)
+        wait_for(queue, queue.submit(double, 2))
+        assert queue.get(job_id) is None
+    finally:
+        queue.shutdown()
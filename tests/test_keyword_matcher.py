@@ -0,0 +1,39 @@
+import random
+
+import pytest
+
+from crashml.keyword_matcher import KeywordMatcher
+from crashml.parsing import REPORT_KEYWORDS
+
+def per_keyword(phrases, text):
+    """The loop KeywordMatcher replaced: one substring test per phrase"""
+    return {phrase for phrase in phrases if phrase in text}
+
+@pytest.mark.parametrize('phrases, text', [
+    (['she', 'he', 'hers', 'his'], 'ushers'),
+    (['rain', 'raining', 'ain'], 'it was raining, then rain'),
+    (['a', 'aa', 'aaa'], 'aaaa'),
+    (['dark', 'dark-street lights', 'street'], 'dark-street lights not functioning'),
+    (['x.y', '(z)'], 'x.y and (z) but not xzy'),
+    (['stop', 'stopped'], 'nothing here'),
+    (['line\nbreak'], 'a line\nbreak in the form'),
+    (['turn'], ''),
+])
+def test_matches_substring_tests(phrases, text):
+    assert KeywordMatcher(phrases).find(text) == per_keyword(phrases, text)
+
+def test_report_keywords_on_random_texts():
+    phrases = REPORT_KEYWORDS.phrases
+    rng = random.Random(0)
+    filler = ['the', 'av', 'was', 'in', 'autonomous', 'mode', ',', '.', 'lane', 'rear']
+    for _ in range(300):
+        words = rng.choices(phrases, k=rng.randint(0, 6)) + rng.choices(filler, k=rng.randint(0, 20))
+        rng.shuffle(words)
+        # Joining without separators too, so phrases run into each other and overlap
+        text = rng.choice([' ', '']).join(words)
+        assert REPORT_KEYWORDS.find(text) == per_keyword(phrases, text)
+
+def test_empty_and_duplicate_phrases_are_ignored():
+    matcher = KeywordMatcher(['', 'wet', 'wet'])
+    assert matcher.phrases == ['wet']
+    assert matcher.find('wet road') == {'wet'}
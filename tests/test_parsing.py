@@ -0,0 +1,22 @@
+from crashml.pdf_extraction import ParsedReport
+from crashml.parsing import parse_dmv_report, parse_report
+
+FORM_TEXT = 'Weather: raining. Section 5: the Waymo AV was stopped when it was rear ended.'
+PAGES = [(1, FORM_TEXT)]
+
+def test_narrative_is_served_as_description():
+    report = ParsedReport(text_pages=PAGES, form_fields={}, narrative='The AV was rear ended while stopped.')
+    parsed = parse_report(report)
+    assert parsed['description'] == 'The AV was rear ended while stopped.'
+    # The structured features still come from the whole report
+    expected = parse_dmv_report(report.text, {})
+    assert {key: value for key, value in parsed.items() if key != 'description'} == \
+        {key: value for key, value in expected.items() if key != 'description'}
+
+def test_report_without_narrative_keeps_the_text():
+    assert parse_report(ParsedReport(text_pages=PAGES, form_fields={}))['description'] == '--- Page 1 ---\n' + FORM_TEXT + '\n'
+
+def test_custom_parse_stage():
+    report = ParsedReport(text_pages=PAGES, form_fields={}, narrative='typed')
+    parsed = parse_report(report, parse=lambda text, form_fields, log=None: {'description': text, 'length': len(text)})
+    assert parsed == {'description': 'typed', 'length': len(report.text)}
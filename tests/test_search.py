@@ -0,0 +1,89 @@
+import math
+import os
+
+import pandas as pd
+import pytest
+
+from crashml import search
+from crashml.search import SearchIndex, frame_documents
+
+REPORTS = [
+    ('1', '3/4/2023', 'Waymo', 'Yes', 'The AV was stopped at a light and was rear ended by a sedan.'),
+    ('2', '5/1/2023', 'Cruise', 'No', 'A sedan ended its turn in the rear lane and struck the AV.'),
+    ('3', '6/9/2022', 'Zoox', 'Yes', 'Rear-ended while stopped. The rear bumper and rear sensor were damaged.'),
+    ('4', '7/2/2022', 'waymo', 'Yes', 'A cyclist contacted the left mirror while passing between lanes of traffic near the intersection.'),
+]
+
+def documents(reports=REPORTS, path='processed_crash_data_2023.csv'):
+    df = pd.DataFrame(reports, columns=['accident_id', 'date', 'vehicle_1_make', 'autonomous_mode', 'description'])
+    df['source_path'] = path
+    return frame_documents(df)
+
+@pytest.fixture
+def index(tmp_path):
+    index = SearchIndex(str(tmp_path / 'index'))
+    index.update(documents())
+    return index
+
+def keys(results):
+    return [result['key'] for result in results]
+
+def test_bm25_ranks_by_frequency_and_length(index):
+    results = index.search('rear')
+    # Report 3 uses the word three times; 1 and 2 once, and 2 is the shorter one (13 words to 14)
+    assert keys(results) == ['processed_crash_data_2023.csv:3', 'processed_crash_data_2023.csv:2', 'processed_crash_data_2023.csv:1']
+
+    # Score of report 2 worked out by hand: idf of a word in 3 of 4 documents, 13 words against an average of 13.5
+    idf = math.log(1 + (4 - 3 + 0.5) / (3 + 0.5))
+    norm = search.BM25_K1 * (1 - search.BM25_B + search.BM25_B * 13 / 13.5)
+    assert results[1]['score'] == round(idf * (search.BM25_K1 + 1) / (1 + norm), 4)
+
+def test_phrase_words_must_follow_each_other(index):
+    # Report 2 has both words, but not as 'rear ended'; hyphens split words, so report 3 matches
+    assert sorted(keys(index.search('"rear ended"'))) == ['processed_crash_data_2023.csv:1', 'processed_crash_data_2023.csv:3']
+    assert index.search('"ended rear"') == []
+    # A phrase is required, the other words only rank
+    assert keys(index.search('cyclist "rear bumper"')) == ['processed_crash_data_2023.csv:3']
+
+def test_filters(index):
+    assert sorted(keys(index.search('the', year=2022))) == ['processed_crash_data_2023.csv:3', 'processed_crash_data_2023.csv:4']
+    assert sorted(keys(index.search('the', make='WAYMO'))) == ['processed_crash_data_2023.csv:1', 'processed_crash_data_2023.csv:4']
+    assert keys(index.search('the', autonomous_mode=False)) == ['processed_crash_data_2023.csv:2']
+    assert keys(index.search('rear', year=[2022, 2023], make=['zoox', 'cruise'], autonomous_mode='yes')) == ['processed_crash_data_2023.csv:3']
+
+def test_filters_do_not_change_scores(index):
+    unfiltered = {result['key']: result['score'] for result in index.search('rear')}
+    for result in index.search('rear', make='cruise'):
+        assert result['score'] == unfiltered[result['key']]
+
+def test_unchanged_documents_are_not_rewritten(index):
+    assert index.update(documents()) == {'added': 0, 'updated': 0, 'deleted': 0, 'unchanged': 4}
+    assert len(index.segments) == 1
+
+def test_updates_and_deletions_survive_a_reload(index):
+    changed = [REPORTS[0], REPORTS[1][:4] + ('A sedan struck the AV from behind at low speed.',), REPORTS[3]]
+    assert index.update(documents(changed)) == {'added': 0, 'updated': 1, 'deleted': 1, 'unchanged': 2}
+
+    reloaded = SearchIndex(index.directory)
+    assert len(reloaded) == 3
+    assert sorted(keys(reloaded.search('rear'))) == ['processed_crash_data_2023.csv:1']
+    assert keys(reloaded.search('"low speed"')) == ['processed_crash_data_2023.csv:2']
+
+def test_compaction_keeps_live_documents_only(tmp_path, monkeypatch):
+    monkeypatch.setattr(search, 'MAX_SEGMENTS', 2)
+    index = SearchIndex(str(tmp_path / 'index'))
+    index.update(documents(REPORTS[:2]))
+    index.update(documents(REPORTS[2:], path='processed_crash_data_2022.csv'))
+    # Replaces report 1 and deletes report 2 of the 2023 file, in a third segment: merged
+    index.update(documents([REPORTS[0][:4] + ('Stopped and rear ended by a pickup truck.',)]))
+
+    assert len(index.segments) == 1
+    assert index.deleted == set()
+    assert sorted(name for name in os.listdir(index.directory) if name.startswith('segment-')) == index.segments
+
+    reloaded = SearchIndex(index.directory)
+    assert len(reloaded) == 3
+    assert sorted(keys(reloaded.search('rear'))) == ['processed_crash_data_2022.csv:3', 'processed_crash_data_2023.csv:1']
+    assert keys(reloaded.search('pickup')) == ['processed_crash_data_2023.csv:1']
+    assert reloaded.search('"rear lane"') == []
+    assert reloaded.search('pickup', year=2023)[0]['make'] == 'Waymo'